@@ -1,12 +1,12 @@
 
 import os
 import json
+import hashlib
 from datetime import datetime
 import re
-from google import genai
-from google.genai import types
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -16,6 +16,35 @@ logger = logging.getLogger('email_processor')
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-pro")
 
+# Parse result cache: identical notices uploaded by several people are parsed once.
+# Bump PROMPT_VERSION whenever the prompt or post-processing changes so stale results are not reused.
+PROMPT_VERSION = "3"
+PARSE_CACHE_PREFIX = "ai_parse_cache:"
+PARSE_CACHE_INDEX_KEY = "ai_parse_cache_index"
+PARSE_CACHE_TTL = int(os.environ.get("AI_PARSE_CACHE_TTL", 86400))  # seconds
+PARSE_CACHE_MAX_ENTRIES = int(os.environ.get("AI_PARSE_CACHE_MAX_ENTRIES", 500))
+PARSE_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("AI_PARSE_CACHE_MAX_ENTRY_BYTES", 256 * 1024))
+
+# Large bodies are cleaned and split into chunks that are parsed concurrently.
+# Token counts are estimated at ~4 characters per token.
+CHUNK_MAX_TOKENS = int(os.environ.get("AI_CHUNK_MAX_TOKENS", 6000))
+CHUNK_MAX_PARALLEL = int(os.environ.get("AI_CHUNK_MAX_PARALLEL", 4))
+CHARS_PER_TOKEN = 4
+
+# Lines that start the previous message in a reply thread
+REPLY_HEADER_PATTERNS = [
+    re.compile(r'^-{2,}\s*Original Message\s*-{2,}\s*$', re.IGNORECASE),
+    re.compile(r'^On .{1,200}wrote:\s*$', re.IGNORECASE),
+]
+SIGNATURE_DELIMITER = re.compile(r'^--\s?$')
+# Paragraphs that are legal/environmental boilerplate rather than content
+BOILERPLATE_PATTERNS = [
+    re.compile(r'this (e-?mail|message)( and any (files|attachments)[^.]*)? (is|are|may be) (strictly )?(confidential|privileged)', re.IGNORECASE),
+    re.compile(r'confidentiality notice', re.IGNORECASE),
+    re.compile(r'if you (are not|have received this)[^.]*(intended recipient|in error)', re.IGNORECASE),
+    re.compile(r'please consider the environment before printing', re.IGNORECASE),
+]
+
 # Remove hardcoded services - let AI extract services dynamically from content
 SERVICES = {}
 SERVICE_NAMES = []
@@ -25,16 +54,13 @@ def check_gemini_connection():
     if not GEMINI_API_KEY:
         return {'connected': False, 'error': 'GEMINI_API_KEY environment variable not set'}
     
+    import requests
     try:
-        # Use the REST API to test connection instead of client.list_models()
-        import requests
+        # Use the REST API to test connection instead of client.list_models(),
+        # through the shared keep-alive session
+        from app.services.ai_client import get_http_session, gemini_api_url
         
-        url = "https://generativelanguage.googleapis.com/v1beta/models"
-        headers = {
-            'X-goog-api-key': GEMINI_API_KEY
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_http_session().get(gemini_api_url('models'), timeout=10)
         
         if response.status_code == 200:
             return {'connected': True, 'error': None}
@@ -58,14 +84,9 @@ def check_model_availability(model_name):
         return False
     
     try:
-        import requests
-        
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}"
-        headers = {
-            'X-goog-api-key': GEMINI_API_KEY
-        }
+        from app.services.ai_client import get_http_session, gemini_api_url
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_http_session().get(gemini_api_url(f"models/{model_name}"), timeout=10)
         return response.status_code == 200
         
     except Exception:
@@ -77,16 +98,76 @@ def generate_services_info_for_prompt():
     # No hardcoded services - AI will extract services dynamically
     return "No predefined services - extract all services mentioned in the content."
 
-def process_email_content(email_data):
+def _normalize_cache_text(text):
+    """Normalize text for cache keying: unify line endings, trim lines, collapse blank runs"""
+    lines = [line.rstrip() for line in (text or '').replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+def get_parse_cache_key(email_data):
+    """Content-addressed cache key: normalized subject and body plus model and prompt version"""
+    digest = hashlib.sha256()
+    for part in (GEMINI_MODEL, PROMPT_VERSION,
+                 _normalize_cache_text(email_data.get('subject', '')),
+                 _normalize_cache_text(email_data.get('body', ''))):
+        digest.update(part.encode('utf-8', errors='ignore'))
+        digest.update(b'\0')
+    return f"{PARSE_CACHE_PREFIX}{digest.hexdigest()}"
+
+def get_cached_parse(cache_key):
+    """Return a cached parse result or None (cache errors never fail the parse)"""
+    try:
+        from app.utils.redis_client import redis_client
+        cached = redis_client.get(cache_key)
+        if cached:
+            # Refresh recency so frequently uploaded notices survive trimming
+            redis_client.zadd(PARSE_CACHE_INDEX_KEY, {cache_key: time.time()})
+            return json.loads(cached)
+    except Exception as e:
+        logger.warning(f"Parse cache lookup failed: {str(e)}")
+    return None
+
+def store_cached_parse(cache_key, parsed_data):
+    """Store a parse result with TTL, skipping oversized entries and trimming to the max entry count"""
+    try:
+        from app.utils.redis_client import redis_client
+        # The original content is re-attached on a hit, so it is not stored twice
+        cacheable = {k: v for k, v in parsed_data.items() if k not in ('original_subject', 'original_body')}
+        payload = json.dumps(cacheable)
+        if len(payload) > PARSE_CACHE_MAX_ENTRY_BYTES:
+            logger.info(f"Parse result too large to cache ({len(payload)} bytes)")
+            return
+        with redis_client.pipeline() as pipe:
+            pipe.setex(cache_key, PARSE_CACHE_TTL, payload)
+            pipe.zadd(PARSE_CACHE_INDEX_KEY, {cache_key: time.time()})
+            # Drop index entries whose keys have already expired
+            pipe.zremrangebyscore(PARSE_CACHE_INDEX_KEY, '-inf', time.time() - PARSE_CACHE_TTL)
+            pipe.zcard(PARSE_CACHE_INDEX_KEY)
+            entry_count = pipe.execute()[-1]
+        if entry_count > PARSE_CACHE_MAX_ENTRIES:
+            # Evict least recently used entries
+            evicted = redis_client.zrange(PARSE_CACHE_INDEX_KEY, 0, entry_count - PARSE_CACHE_MAX_ENTRIES - 1)
+            if evicted:
+                with redis_client.pipeline() as pipe:
+                    pipe.delete(*evicted)
+                    pipe.zrem(PARSE_CACHE_INDEX_KEY, *evicted)
+                    pipe.execute()
+    except Exception as e:
+        logger.warning(f"Parse cache store failed: {str(e)}")
+
+def process_email_content(email_data, bypass_cache=False):
     """
     Process email content using Gemini API and return structured data
     
+    Results are cached by content hash, model and prompt version, so repeat uploads
+    of the same notice return without an API call.
+    
     Args:
         email_data: Dictionary containing email data with keys:
                     - subject: Email subject
                     - body: Email body
                     - sender: Email sender (optional)
                     - date: Email date (optional)
+        bypass_cache: Force a fresh parse (the new result still replaces the cached one)
                     
     Returns:
         Dictionary with parsed change management information
@@ -95,8 +176,121 @@ def process_email_content(email_data):
         logger.error("GEMINI_API_KEY environment variable not set")
         return generate_error_response("GEMINI_API_KEY environment variable not set", email_data)
     
-    # Initialize Gemini client
-    client = genai.Client(api_key=GEMINI_API_KEY)
+    cache_key = get_parse_cache_key(email_data)
+    if not bypass_cache:
+        cached = get_cached_parse(cache_key)
+        if cached:
+            logger.info("Returning cached parse result")
+            cached['original_subject'] = email_data.get('subject', '')
+            cached['original_body'] = email_data.get('body', '')
+            cached['from_cache'] = True
+            return cached
+    
+    parsed_data = _process_email_with_gemini(email_data)
+    # Only clean AI results are cached, never errors, fallback or partial output
+    if not parsed_data.get('error') and not parsed_data.get('fallback') and not parsed_data.get('incomplete'):
+        store_cached_parse(cache_key, parsed_data)
+    return parsed_data
+
+def preprocess_email_body(body):
+    """
+    Strip quoted replies, signatures and boilerplate from an email body
+    
+    Reply history after an "Original Message" / "On ... wrote:" header is only
+    dropped when there is content above it, so a bare forwarded notice is kept.
+    """
+    lines = (body or '').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    kept = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('>'):
+            continue
+        if any(pattern.match(stripped) for pattern in REPLY_HEADER_PATTERNS):
+            if any(kept_line.strip() for kept_line in kept):
+                break
+            continue
+        if SIGNATURE_DELIMITER.match(line) and any(kept_line.strip() for kept_line in kept):
+            break
+        kept.append(line.rstrip())
+    
+    paragraphs = re.split(r'\n\s*\n', '\n'.join(kept))
+    paragraphs = [p.strip('\n') for p in paragraphs
+                  if p.strip() and not any(pattern.search(p) for pattern in BOILERPLATE_PATTERNS)]
+    return '\n\n'.join(paragraphs)
+
+def split_into_chunks(text, max_tokens=None):
+    """Split text into chunks under the token budget, breaking on paragraphs, then lines"""
+    max_chars = (max_tokens or CHUNK_MAX_TOKENS) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+    
+    pieces = []
+    for paragraph in text.split('\n\n'):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.split('\n'):
+            if not line.strip():
+                continue
+            # A single overlong line is cut hard at the budget
+            pieces.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+    
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _process_email_with_gemini(email_data):
+    """
+    Clean the body, parse it chunk by chunk and merge the results
+    
+    Chunks are parsed concurrently and their services merged with merge_services.
+    If some chunks fail the merged result is marked incomplete (and not cached);
+    if all fail the first chunk's error or fallback result is returned.
+    """
+    body = preprocess_email_body(email_data.get('body', ''))
+    chunks = split_into_chunks(body)
+    
+    if len(chunks) == 1:
+        result = _parse_chunk_with_gemini(dict(email_data, body=chunks[0]))
+    else:
+        logger.info(f"Parsing email body in {len(chunks)} chunks ({len(body)} characters)")
+        with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_MAX_PARALLEL, len(chunks)))) as pool:
+            chunk_results = list(pool.map(
+                lambda chunk: _parse_chunk_with_gemini(dict(email_data, body=chunk)), chunks))
+        
+        parsed = [r for r in chunk_results if not r.get('error') and not r.get('fallback')]
+        if not parsed:
+            result = chunk_results[0]
+        else:
+            result = {
+                'date': parsed[0]['date'],
+                'services': merge_services(r['services'] for r in parsed)
+            }
+            if len(parsed) < len(chunk_results):
+                logger.warning(f"{len(chunk_results) - len(parsed)} of {len(chunk_results)} chunks failed to parse")
+                result['incomplete'] = True
+    
+    # Always hand back the original content, not the cleaned chunk
+    result['original_subject'] = email_data.get('subject', '')
+    result['original_body'] = email_data.get('body', '')
+    return result
+
+def _parse_chunk_with_gemini(email_data):
+    """Send the email content to Gemini and return the validated structured result"""
+    # Shared Gemini client (pooled connections, created once per process)
+    from app.services.ai_client import get_genai_client
+    from app.services.ai_rate_limiter import call_gemini, AIRateLimitError
+    from app.utils.lazy_imports import lazy_import
+    types = lazy_import('google.genai.types')
+    client = get_genai_client()
     
     subject = email_data.get('subject', '')
     body = email_data.get('body', '')
@@ -222,107 +416,85 @@ OUTPUT JSON:
         response_mime_type="application/json"
     )
     
-    # Send request to the model with retry logic
-    max_retries = 3
-    retry_count = 0
-    retry_delay = 5  # Start with 5 seconds delay
+    # Queue behind the shared rate limiter; 429s are retried there, honoring Retry-After
+    try:
+        logger.info("Sending request to Gemini API")
+        response = call_gemini(lambda: client.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=contents,
+            config=generate_config
+        ))
+        logger.info("Successfully received response from Gemini API")
+    except AIRateLimitError as e:
+        return generate_error_response(str(e), email_data)
+    except Exception as e:
+        return generate_error_response(f"Error processing content with Gemini: {str(e)}", email_data)
+    
+    # Extract the result text
+    result = response.text
+    
+    # Find JSON content in the response
+    json_start = result.find('{')
+    json_end = result.rfind('}') + 1
     
-    while retry_count < max_retries:
+    if json_start >= 0 and json_end > json_start:
+        json_content = result[json_start:json_end]
         try:
-            logger.info(f"Sending request to Gemini API (attempt {retry_count + 1})")
-            response = client.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=contents,
-                config=generate_config
-            )
-            logger.info("Successfully received response from Gemini API")
+            parsed_data = json.loads(json_content)
             
-            # Extract the result text
-            result = response.text
+            # Normalize the document date and every service ("2 PM" -> "14:00"; unreadable values become "-")
+            from app.utils.validators import normalize_date, normalize_services
+            parsed_data['date'], _ = normalize_date(parsed_data.get('date'))
+            if parsed_data['date'] == '-':
+                parsed_data['date'] = datetime.now().strftime("%Y-%m-%d")
             
-            # Find JSON content in the response
-            json_start = result.find('{')
-            json_end = result.rfind('}') + 1
+            services, validation_errors = normalize_services(
+                parsed_data.get('services') or [], default_comments="Activity or task from content")
+            if validation_errors:
+                logger.warning(f"Normalized AI output with {len(validation_errors)} field errors: " + '; '.join(
+                    f"{error['service'] or '#' + str(error['index'])}.{error['field']}: {error['message']}"
+                    for error in validation_errors[:5]))
+                parsed_data['validation_errors'] = validation_errors
             
-            if json_start >= 0 and json_end > json_start:
-                json_content = result[json_start:json_end]
-                try:
-                    parsed_data = json.loads(json_content)
-                    
-                    # Ensure all required fields are present
-                    if 'date' not in parsed_data:
-                        parsed_data['date'] = datetime.now().strftime("%Y-%m-%d")
-                    
-                    if 'services' not in parsed_data:
-                        parsed_data['services'] = []
-                    
-                    # Validate and clean up service data with strict format enforcement
-                    for service in parsed_data['services']:
-                        # Ensure all required fields exist, but don't force dates if AI returned "-"
-                        if 'start_date' not in service:
-                            service['start_date'] = "-"
-                        if 'end_date' not in service:
-                            service['end_date'] = "-"
-                        if 'start_time' not in service or not service['start_time']:
-                            service['start_time'] = "-"
-                        if 'end_time' not in service or not service['end_time']:
-                            service['end_time'] = "-"
-                        if 'comments' not in service or not service['comments']:
-                            service['comments'] = "Activity or task from content"
-                        if 'priority' not in service or not service['priority']:
-                            service['priority'] = "medium"
-                        
-                        # Enforce strict format rules
-                        if service['priority'] not in ['low', 'medium', 'high']:
-                            service['priority'] = "medium"
-                        
-                        # Validate time format (HH:MM or "-")
-                        if service['start_time'] != "-" and not re.match(r'^\d{2}:\d{2}$', service['start_time']):
-                            service['start_time'] = "-"
-                        if service['end_time'] != "-" and not re.match(r'^\d{2}:\d{2}$', service['end_time']):
-                            service['end_time'] = "-"
-                        
-                        # Only validate that dates are in correct format if they're not "-"
-                        if service['start_date'] != "-" and not re.match(r'^\d{4}-\d{2}-\d{2}$', service['start_date']):
-                            # If AI returned invalid format, set to "-" instead of guessing
-                            service['start_date'] = "-"
-                        
-                        if service['end_date'] != "-" and not re.match(r'^\d{4}-\d{2}-\d{2}$', service['end_date']):
-                            # If AI returned invalid format, set to "-" instead of guessing
-                            service['end_date'] = "-"
-                    
-                    # Add the original email content
-                    parsed_data['original_subject'] = email_data.get('subject', '')
-                    parsed_data['original_body'] = email_data.get('body', '')
-                    
-                    # Sort services by name to ensure consistent output
-                    parsed_data['services'] = sorted(parsed_data['services'], key=lambda x: x['name'])
-                    
-                    return parsed_data
-                    
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse AI response as JSON: {str(e)}")
-                    return process_email_fallback(email_data, result)
-            else:
-                logger.warning("Could not find valid JSON in the response")
-                return process_email_fallback(email_data, result)
-                
-        except Exception as e:
-            retry_count += 1
-            logger.warning(f"Error processing content with Gemini (attempt {retry_count}): {str(e)}")
+            # Add the original email content
+            parsed_data['original_subject'] = email_data.get('subject', '')
+            parsed_data['original_body'] = email_data.get('body', '')
+            
+            # Sort services by name to ensure consistent output
+            parsed_data['services'] = sorted(services, key=lambda x: x['name'])
             
-            if "429 Too Many Requests" in str(e):
-                if retry_count < max_retries:
-                    logger.info(f"Rate limit hit. Waiting {retry_delay} seconds before retry...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    return generate_error_response("Gemini API rate limit exceeded after multiple retries", email_data)
-            else:
-                return generate_error_response(f"Error processing content with Gemini: {str(e)}", email_data)
+            return parsed_data
+            
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse AI response as JSON: {str(e)}")
+            return process_email_fallback(email_data, result)
+    else:
+        logger.warning("Could not find valid JSON in the response")
+        return process_email_fallback(email_data, result)
+
+PRIORITY_RANK = {'low': 0, 'medium': 1, 'high': 2}
+
+def merge_services(service_lists):
+    """
+    Merge service lists from several parses, de-duplicating by name and start date
     
-    # If we exit the retry loop without returning, it means all retries failed
-    return generate_error_response("All retries failed when communicating with Gemini API", email_data)
+    For duplicates the first occurrence is kept, fields it left as "-" are filled
+    from later occurrences, and the highest priority wins.
+    """
+    merged = {}
+    for services in service_lists:
+        for service in services:
+            key = ((service.get('name') or '').strip().lower(), service.get('start_date', '-'))
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(service)
+                continue
+            for field, value in service.items():
+                if existing.get(field) in (None, '', '-') and value not in (None, '', '-'):
+                    existing[field] = value
+            if PRIORITY_RANK.get(service.get('priority'), 1) > PRIORITY_RANK.get(existing.get('priority'), 1):
+                existing['priority'] = service['priority']
+    return sorted(merged.values(), key=lambda x: x.get('name', ''))
 
 def process_email_fallback(email_data, ai_response):
     """Fallback method for extracting data when JSON parsing fails"""
@@ -332,6 +504,7 @@ def process_email_fallback(email_data, ai_response):
         result = {
             'date': datetime.now().strftime("%Y-%m-%d"),
             'services': [],
+            'fallback': True,
             'original_subject': email_data.get('subject', ''),
             'original_body': email_data.get('body', '')
         }
@@ -387,11 +560,7 @@ def email_parser(email_content):
     Returns:
         Dictionary with parsed change management information
     """
-    # Check connection first
-    connection_status = check_gemini_connection()
-    if not connection_status['connected']:
-        return generate_error_response(f"Cannot connect to Gemini API: {connection_status['error']}", email_content)
-    
-    # Process the email content
+    # No connectivity probe here: the background AI health monitor tracks reachability,
+    # and API failures surface from the parse call itself
     return process_email_content(email_content)
 
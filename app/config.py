@@ -33,8 +33,40 @@ logger = logging.getLogger(__name__)
 # RATE_WINDOW: Rate limit window (seconds)
 # HISTORY_LIMIT: Max history entries
 # TEMP_DIR: Temp file directory
+# IMPORT_PROFILE: Import the lazily loaded parser/AI modules at startup and log the cost of each
+# UPLOAD_SPOOL_MAX_MEMORY: Uploads up to this many bytes are parsed in memory, larger ones spool to TEMP_DIR
+# TEMP_FILE_MAX_AGE: Seconds after which leftover files in TEMP_DIR are removed at startup
+# EXTRACT_MAX_TEXT_CHARS: Max characters of body text extracted from an uploaded file
+# EXTRACT_MAX_SCAN_BYTES: Max bytes of an HTML or .eml file read while extracting text
+# CALENDAR_TIMEZONE: IANA zone .ics event times are converted to (empty = keep each event's own time)
+# CALENDAR_MAX_OCCURRENCES: Max rows one recurring .ics event expands to
+# CALENDAR_EXPANSION_DAYS: Days after an event's first start within which recurrences are expanded
+# PARSE_POOL_WORKERS: Processes per web worker that parse uploaded files (0 = parse inline)
+# PARSE_POOL_TIMEOUT: Max seconds to parse one file before its process is killed
+# PARSE_POOL_MEMORY_LIMIT_MB: Address-space limit per parse process
+# PARSE_POOL_MAX_TASKS_PER_CHILD: Files a parse process handles before it is replaced
 # GEMINI_API_KEY: Google Gemini API key
 # GEMINI_MODEL: Google Gemini model name
+# GEMINI_BASE_URL: Gemini API root; point at tools/mock_gemini.py for offline load tests
+# AI_HTTP_POOL_SIZE: Keep-alive connections per host for AI HTTP calls
+# AI_HEALTH_CHECK_INTERVAL: Seconds between background AI connectivity probes
+# AI_HEALTH_MAX_BACKOFF: Max seconds between probes while the AI API is failing
+# PARSE_WORKER_THREADS: Background upload parse workers per web worker (0 = use run_worker.py)
+# PARSE_WORKER_PROCESS_THREADS: Parse worker threads in a dedicated run_worker.py process
+# PARSE_JOB_TTL: Seconds an upload parse job and its result are kept
+# AI_MAX_CONCURRENT_REQUESTS: Max in-flight Gemini calls per worker process
+# BATCH_UPLOAD_MAX_FILES: Max files accepted by one batch upload
+# BATCH_EXTRACT_WORKERS: Threads used to extract files in a batch upload
+# AI_RATE_LIMIT_PER_MINUTE: Gemini calls per minute shared by all workers (0 = no limit)
+# AI_RATE_LIMIT_BURST: Gemini calls allowed in a burst above the steady rate
+# AI_RATE_LIMIT_WAIT_TIMEOUT: Max seconds a call waits in the shared queue
+# AI_MAX_RETRIES: Attempts per Gemini call when rate limited
+# AI_CONTEXT_TTL: Seconds a compacted /ask-ai page context is kept
+# AI_CONTEXT_MAX_EMAIL_CHARS: Max original email characters included in chat context
+# AI_ANSWER_CACHE_TTL: Seconds a cached /ask-ai answer is reused (0 disables the answer cache)
+# AI_ANSWER_CACHE_MAX_ENTRIES: Max cached /ask-ai answers; least recently used ones are evicted
+# RULE_EXTRACTOR_ENABLED: Parse templated notices with rules before calling Gemini (true/false)
+# RULE_EXTRACTOR_MIN_CONFIDENCE: Min confidence (0-1, share of fully parsed rows) for the rules result to be used
 # SIGNUP_ENABLED: Enable sign-up feature (true/false)
 # GUEST_ACCESS_ENABLED: Enable guest skip-login feature (true/false)
 
@@ -59,8 +91,42 @@ RATE_WINDOW = int(os.environ.get('RATE_WINDOW', 60))
 
 HISTORY_LIMIT = int(os.environ.get('HISTORY_LIMIT', 1000))
 TEMP_DIR = os.environ.get('TEMP_DIR', '/app/temp')
+IMPORT_PROFILE = os.environ.get('IMPORT_PROFILE', 'false').lower() == 'true'
+UPLOAD_SPOOL_MAX_MEMORY = int(os.environ.get('UPLOAD_SPOOL_MAX_MEMORY', 2 * 1024 * 1024))
+TEMP_FILE_MAX_AGE = int(os.environ.get('TEMP_FILE_MAX_AGE', 3600))
+EXTRACT_MAX_TEXT_CHARS = int(os.environ.get('EXTRACT_MAX_TEXT_CHARS', 200000))
+EXTRACT_MAX_SCAN_BYTES = int(os.environ.get('EXTRACT_MAX_SCAN_BYTES', 10 * 1024 * 1024))
+CALENDAR_TIMEZONE = os.environ.get('CALENDAR_TIMEZONE', '')
+CALENDAR_MAX_OCCURRENCES = int(os.environ.get('CALENDAR_MAX_OCCURRENCES', 52))
+CALENDAR_EXPANSION_DAYS = int(os.environ.get('CALENDAR_EXPANSION_DAYS', 366))
+PARSE_POOL_WORKERS = int(os.environ.get('PARSE_POOL_WORKERS', 2))
+PARSE_POOL_TIMEOUT = int(os.environ.get('PARSE_POOL_TIMEOUT', 30))
+PARSE_POOL_MEMORY_LIMIT_MB = int(os.environ.get('PARSE_POOL_MEMORY_LIMIT_MB', 1024))
+PARSE_POOL_MAX_TASKS_PER_CHILD = int(os.environ.get('PARSE_POOL_MAX_TASKS_PER_CHILD', 100))
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.0-flash')
+GEMINI_DEFAULT_BASE_URL = 'https://generativelanguage.googleapis.com'
+GEMINI_BASE_URL = os.environ.get('GEMINI_BASE_URL', GEMINI_DEFAULT_BASE_URL).rstrip('/')
+GEMINI_API_BASE_URL = f"{GEMINI_BASE_URL}/v1beta"
+AI_HTTP_POOL_SIZE = int(os.environ.get('AI_HTTP_POOL_SIZE', 10))
+AI_HEALTH_CHECK_INTERVAL = int(os.environ.get('AI_HEALTH_CHECK_INTERVAL', 60))
+AI_HEALTH_MAX_BACKOFF = int(os.environ.get('AI_HEALTH_MAX_BACKOFF', 900))
+PARSE_WORKER_THREADS = int(os.environ.get('PARSE_WORKER_THREADS', 2))
+PARSE_WORKER_PROCESS_THREADS = int(os.environ.get('PARSE_WORKER_PROCESS_THREADS', 4))
+PARSE_JOB_TTL = int(os.environ.get('PARSE_JOB_TTL', 3600))
+AI_MAX_CONCURRENT_REQUESTS = int(os.environ.get('AI_MAX_CONCURRENT_REQUESTS', 4))
+BATCH_UPLOAD_MAX_FILES = int(os.environ.get('BATCH_UPLOAD_MAX_FILES', 50))
+BATCH_EXTRACT_WORKERS = int(os.environ.get('BATCH_EXTRACT_WORKERS', 4))
+AI_RATE_LIMIT_PER_MINUTE = int(os.environ.get('AI_RATE_LIMIT_PER_MINUTE', 60))
+AI_RATE_LIMIT_BURST = int(os.environ.get('AI_RATE_LIMIT_BURST', 10))
+AI_RATE_LIMIT_WAIT_TIMEOUT = int(os.environ.get('AI_RATE_LIMIT_WAIT_TIMEOUT', 120))
+AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 3))
+AI_CONTEXT_TTL = int(os.environ.get('AI_CONTEXT_TTL', 3600))
+AI_CONTEXT_MAX_EMAIL_CHARS = int(os.environ.get('AI_CONTEXT_MAX_EMAIL_CHARS', 8000))
+AI_ANSWER_CACHE_TTL = int(os.environ.get('AI_ANSWER_CACHE_TTL', 3600))
+AI_ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('AI_ANSWER_CACHE_MAX_ENTRIES', 1000))
+RULE_EXTRACTOR_ENABLED = os.environ.get('RULE_EXTRACTOR_ENABLED', 'true').lower() == 'true'
+RULE_EXTRACTOR_MIN_CONFIDENCE = float(os.environ.get('RULE_EXTRACTOR_MIN_CONFIDENCE', 0.9))
 SIGNUP_ENABLED = os.environ.get('SIGNUP_ENABLED', 'false').lower() == 'true'
 SIGNUP_REDIS_KEY = 'signup_enabled'
 GUEST_ACCESS_ENABLED = os.environ.get('GUEST_ACCESS_ENABLED', 'false').lower() == 'true'
@@ -13,7 +13,7 @@ from werkzeug.exceptions import HTTPException
 # Import configuration
 from .config import (
     PERMANENT_SESSION_LIFETIME_DAYS, RATE_LIMIT_ENABLED, RATE_LIMIT, RATE_WINDOW,
-    SESSION_TIMEOUT_SECONDS, LOGOUT_VERSION_HASH_KEY
+    SESSION_TIMEOUT_SECONDS, LOGOUT_VERSION_HASH_KEY, IMPORT_PROFILE
 )
 
 # Import Redis clients
@@ -79,6 +79,12 @@ def create_app():
     def inject_user():
         return dict(current_user=session.get('username'), current_role=session.get('role'))
     
+    @app.context_processor
+    def inject_upload_formats():
+        # The upload picker and client-side checks use the parsers that are actually available
+        from .services.email_processor import FileProcessor
+        return dict(supported_extensions=FileProcessor.get_supported_extensions())
+    
     # Before request handler
     @app.before_request
     def require_login():
@@ -319,15 +325,32 @@ def initialize_app():
     # Start search index initialization
     start_search_index_initialization()
     
+    # Start background AI health monitor (serves /ai-status without inline probes)
+    from .services.ai_service import start_ai_health_monitor
+    start_ai_health_monitor()
+    
+    # Remove upload temp files left behind by killed workers
+    from .services.upload_service import cleanup_temp_dir
+    cleanup_temp_dir()
+    
+    # Start background upload parse workers
+    from .services.job_service import start_parse_workers
+    start_parse_workers()
+    
     # Run history migration
-    from .services.history_service import migrate_history_to_redis
+    from .services.history_service import migrate_history_to_redis, migrate_history_index
     migrate_history_to_redis()
+    migrate_history_index()
     
     # Log rate limiting status
     if RATE_LIMIT_ENABLED:
         logger.info(f"Rate limiting ENABLED: {RATE_LIMIT} requests per {RATE_WINDOW} seconds")
     else:
         logger.info("Rate limiting DISABLED")
+    
+    # Report which heavy parser/AI modules this worker loaded at boot
+    from .utils.lazy_imports import log_import_report
+    log_import_report(preload=IMPORT_PROFILE)
 
 # Create the app instance
 app = create_app()
@@ -2,20 +2,27 @@
 API routes
 This file contains all API-related routes from app.py
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import os
 import json
+import time
 import logging
-from datetime import datetime
-from google import genai
-from google.genai import types
 
 from ..config import GEMINI_API_KEY, GEMINI_MODEL
 from ..utils.redis_client import redis_client, history_redis
 from ..services.ai_service import (
-    calculate_performance_metrics, save_ai_performance_stats, track_ai_request
+    calculate_performance_metrics, reset_ai_performance_stats, track_ai_request,
+    get_ai_health_snapshot
 )
 from ..services.search_service import is_search_index_busy, search_index_last_rebuild
+from ..services.ai_client import get_genai_client
+from ..services.ai_context_service import store_context, get_context
+from ..services.ai_rate_limiter import call_gemini, get_rate_limiter_metrics, AIRateLimitError
+from ..services.parser_registry import get_parser_metrics
+from ..services.ai_answer_cache import (
+    get_cached_answer, store_cached_answer, get_answer_cache_metrics, reset_answer_cache_stats
+)
+from ..utils.lazy_imports import lazy_import
 
 logger = logging.getLogger(__name__)
 
@@ -52,8 +59,6 @@ def health_check():
 def ai_status():
     """Get AI processing status information"""
     try:
-        import ai_processor
-        
         # Check if API key is configured
         api_key_configured = bool(GEMINI_API_KEY)
         
@@ -72,20 +77,23 @@ def ai_status():
                 }
             })
         
-        # Check API connection
-        connection_status = ai_processor.check_gemini_connection()
-        
-        # Determine statuses
-        api_key_status = 'connected' if connection_status['connected'] else 'disconnected'
-        connection_status_value = 'connected' if connection_status['connected'] else 'error'
-        
-        # Get model information
+        # Served from the background monitor's snapshot; no probe on the request path
+        snapshot = get_ai_health_snapshot()
         model_name = GEMINI_MODEL
         
-        # Check if the specific model is available
-        model_available = False
-        if connection_status['connected']:
-            model_available = ai_processor.check_model_availability(model_name)
+        if snapshot is None:
+            # First probe hasn't completed yet
+            api_key_status = 'checking'
+            connection_status_value = 'checking'
+            model_available = None
+            error = None
+            checked_at = None
+        else:
+            api_key_status = 'connected' if snapshot['connected'] else 'disconnected'
+            connection_status_value = 'connected' if snapshot['connected'] else 'error'
+            model_available = snapshot.get('model_available', False)
+            error = snapshot.get('error')
+            checked_at = snapshot.get('checked_at')
         
         # Calculate performance metrics
         performance_metrics = calculate_performance_metrics()
@@ -95,10 +103,13 @@ def ai_status():
             'modelAvailable': model_available,
             'apiKeyStatus': api_key_status,
             'connectionStatus': connection_status_value,
-            'error': connection_status.get('error'),
+            'error': error,
+            'checkedAt': checked_at,
             'provider': 'Google Gemini',
             'apiKeyConfigured': api_key_configured,
-            'performance': performance_metrics
+            'performance': performance_metrics,
+            'rateLimiter': get_rate_limiter_metrics(),
+            'answerCache': get_answer_cache_metrics()
         })
     except Exception as e:
         logger.error(f"Error getting AI status: {str(e)}")
@@ -121,19 +132,8 @@ def ai_status():
 def clear_ai_stats():
     """Clear all AI performance statistics"""
     try:
-        # Reset to default stats
-        default_stats = {
-            'requests_today': 0,
-            'total_requests': 0,
-            'response_times': [],
-            'last_request_time': None,
-            'success_count': 0,
-            'error_count': 0,
-            'daily_reset_date': datetime.now().date()
-        }
-        
-        # Save to Redis
-        save_ai_performance_stats(default_stats)
+        reset_ai_performance_stats()
+        reset_answer_cache_stats()
         
         logger.info("AI performance statistics cleared successfully")
         
@@ -148,46 +148,56 @@ def clear_ai_stats():
             'message': f'Error clearing AI statistics: {str(e)}'
         }), 500
 
-@api_bp.route('/ask-ai', methods=['POST'])
-def ask_ai():
-    """Handle AI questions about the page content"""
-    try:
-        data = request.json
-        if not data:
-            return jsonify({
-                'status': 'error',
-                'message': 'Invalid request data'
-            }), 400
-            
-        question = data.get('question', '').strip()
-        context = data.get('context', {})
-        
-        if not question:
-            return jsonify({
-                'status': 'error',
-                'message': 'Question is required'
-            }), 400
-        
-        # Check if Gemini API is available
-        if not GEMINI_API_KEY:
-            return jsonify({
+def validate_ask_ai_request(data):
+    """
+    Return (question, context_id, compact_context, error_response) for an /ask-ai request
+    
+    The body carries either the full page context, which is compacted and stored
+    once per document version, or the context_id of an already stored one.
+    """
+    if not data:
+        return None, None, None, (jsonify({
+            'status': 'error',
+            'message': 'Invalid request data'
+        }), 400)
+    
+    question = data.get('question', '').strip()
+    
+    if not question:
+        return None, None, None, (jsonify({
+            'status': 'error',
+            'message': 'Question is required'
+        }), 400)
+    
+    # Check if Gemini API is available
+    if not GEMINI_API_KEY:
+        return None, None, None, (jsonify({
+            'status': 'error',
+            'message': 'AI service is not configured'
+        }), 503)
+    
+    if data.get('context') is not None:
+        context_id, compact = store_context(data['context'])
+    else:
+        context_id = data.get('context_id')
+        compact = get_context(context_id) if context_id else None
+        if compact is None:
+            # Expired or unknown: the client resends the full context
+            return None, None, None, (jsonify({
                 'status': 'error',
-                'message': 'AI service is not configured'
-            }), 503
-        
-        # Import AI processor
-        import ai_processor
-        
-        # Create context prompt
-        context_prompt = f"""
+                'code': 'context_expired',
+                'message': 'Page context expired, please resend it'
+            }), 409)
+    
+    return question, context_id, compact, None
+
+def build_ask_ai_request(question, compact_context):
+    """Build the Gemini contents and generation config for a chat question"""
+    context_prompt = f"""
 You are a friendly and helpful AI assistant. You can answer questions about change management data, services, or the current page, but you can also chat about anything else in a casual, friendly way.
 
 Here is the current page context (for reference only):
-- Page Title: {context.get('pageTitle', 'Change Management')}
-- Header: {context.get('headerTitle', 'Change Weekend')}
-- Date: {context.get('date', 'Not specified')}
-- Services Data: {json.dumps(context.get('services', []), indent=2)}
-- Original Email Content: {context.get('originalEmail', 'No email content available')}
+{compact_context}
 
 User Question: {question}
 
@@ -200,47 +210,171 @@ User Question: {question}
 - Be concise, warm, and engaging.
 - If a user asks to send them the data that was used to generate the response, politely refuse and let the user know you can't do that.
 """
+    
+    types = lazy_import('google.genai.types')
+    contents = [
+        types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=context_prompt)]
+        ),
+    ]
+    
+    generate_config = types.GenerateContentConfig(
+        temperature=0.3,
+        top_p=0.95,
+        top_k=64,
+        max_output_tokens=1024,
+    )
+    return contents, generate_config
+
+def rate_limited_response(e):
+    """429 JSON response for a chat question that couldn't get an AI slot"""
+    logger.warning(f"AI question rate limited: {str(e)}")
+    error_response = jsonify({
+        'status': 'error',
+        'message': 'The AI service is busy right now. Please try again shortly.'
+    })
+    if e.retry_after:
+        error_response.headers['Retry-After'] = str(e.retry_after)
+    return error_response, 429
+
+@api_bp.route('/ask-ai', methods=['POST'])
+def ask_ai():
+    """Handle AI questions about the page content"""
+    start_time = time.time()
+    try:
+        question, context_id, compact_context, error_response = validate_ask_ai_request(request.json)
+        if error_response:
+            return error_response
+        
+        # Same question about the same document version: answer without calling Gemini
+        cached_answer = get_cached_answer(question, context_id)
+        if cached_answer is not None:
+            return jsonify({
+                'status': 'success',
+                'response': cached_answer,
+                'context_id': context_id,
+                'cached': True
+            })
         
-        # Use the existing AI processor to get response
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        
-        contents = [
-            types.Content(
-                role="user",
-                parts=[types.Part.from_text(text=context_prompt)]
-            ),
-        ]
-        
-        generate_config = types.GenerateContentConfig(
-            temperature=0.3,
-            top_p=0.95,
-            top_k=64,
-            max_output_tokens=1024,
-        )
-        
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=contents,
-            config=generate_config
-        )
+        contents, generate_config = build_ask_ai_request(question, compact_context)
+        
+        # Use the shared Gemini client (pooled connections)
+        client = get_genai_client()
+        
+        try:
+            response = call_gemini(lambda: client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=contents,
+                config=generate_config
+            ))
+        except AIRateLimitError as e:
+            return rate_limited_response(e)
         
         ai_response = response.text.strip()
         
         # Track the AI request for performance metrics
-        track_ai_request(0.5, True)  # Approximate response time
+        track_ai_request(time.time() - start_time, True)
+        store_cached_answer(question, context_id, ai_response)
         
         return jsonify({
             'status': 'success',
-            'response': ai_response
+            'response': ai_response,
+            'context_id': context_id
         })
         
     except Exception as e:
         logger.error(f"Error processing AI question: {str(e)}")
+        track_ai_request(time.time() - start_time, False)
         return jsonify({
             'status': 'error',
             'message': f'Error processing your question: {str(e)}'
         }), 500
 
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_bp.route('/ask-ai/stream', methods=['POST'])
+def ask_ai_stream():
+    """
+    Streaming variant of /ask-ai: answer text is sent as SSE "chunk" events as
+    Gemini produces it, followed by a "done" (or "error") event
+    """
+    start_time = time.time()
+    try:
+        # Everything before the stream opens answers with the same JSON errors as /ask-ai
+        question, context_id, compact_context, error_response = validate_ask_ai_request(request.json)
+        if error_response:
+            return error_response
+        
+        cached_answer = get_cached_answer(question, context_id)
+        if cached_answer is not None:
+            def cached_stream():
+                yield format_sse('chunk', {'text': cached_answer})
+                yield format_sse('done', {'context_id': context_id, 'cached': True,
+                                          'ttft': round(time.time() - start_time, 3),
+                                          'total': round(time.time() - start_time, 3)})
+            return Response(cached_stream(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+        contents, generate_config = build_ask_ai_request(question, compact_context)
+        client = get_genai_client()
+        
+        def open_stream():
+            # Pull the first chunk inside the rate-limited call so a 429 is raised (and retried) there
+            stream = client.models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=contents,
+                config=generate_config
+            )
+            return stream, next(stream, None)
+        
+        stream, first_chunk = call_gemini(open_stream)
+    except AIRateLimitError as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        logger.error(f"Error starting AI answer stream: {str(e)}")
+        track_ai_request(time.time() - start_time, False)
+        return jsonify({
+            'status': 'error',
+            'message': f'Error processing your question: {str(e)}'
+        }), 500
+    time_to_first_token = time.time() - start_time
+    
+    def event_stream():
+        success = False
+        parts = []
+        try:
+            chunk = first_chunk
+            while chunk is not None:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield format_sse('chunk', {'text': chunk.text})
+                chunk = next(stream, None)
+            success = True
+            store_cached_answer(question, context_id, ''.join(parts).strip())
+            yield format_sse('done', {'context_id': context_id,
+                                      'ttft': round(time_to_first_token, 3),
+                                      'total': round(time.time() - start_time, 3)})
+        except Exception as e:
+            logger.error(f"Error streaming AI answer: {str(e)}")
+            yield format_sse('error', {'message': f'Error processing your question: {str(e)}'})
+        finally:
+            track_ai_request(time.time() - start_time, success, time_to_first_token=time_to_first_token)
+    
+    return Response(stream_with_context(event_stream()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api_bp.route('/parser-stats', methods=['GET'])
+def parser_stats():
+    """Per-parser upload counts and latency"""
+    try:
+        return jsonify({'status': 'success', 'parsers': get_parser_metrics()})
+    except Exception as e:
+        logger.error(f"Error getting parser stats: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @api_bp.route('/ai-chat-enabled', methods=['GET'])
 def ai_chat_enabled():
     enabled = os.environ.get('AI_CHAT_ENABLED', 'true').lower() == 'true'
@@ -4,20 +4,19 @@ This file contains all change management-related routes from app.py
 """
 from flask import Blueprint, request, jsonify, session, make_response, render_template
 from datetime import datetime
-import tempfile
-import os
-import time
 import logging
 import json
 import threading
 
-from ..config import temp_dir
 from ..utils.redis_client import redis_client
 from ..services.email_processor import FileProcessor
 from ..routes.auth import is_reauth_valid, validate_user_exists
-from ..services.ai_service import track_ai_request
+from ..services.upload_service import extract_email_data, parse_email_data, process_batch, spool_upload
+from ..config import BATCH_UPLOAD_MAX_FILES
+from ..services.job_service import enqueue_parse_job, get_parse_job
 from ..services.history_service import save_to_history
 from ..utils.helpers import history_cache
+from ..utils.validators import normalize_date, normalize_service, normalize_services
 from ..services.search_service import create_search_index
 
 logger = logging.getLogger(__name__)
@@ -44,6 +43,54 @@ def save_stored_data(data):
         logger.error(f"Error saving data to Redis: {str(e)}")
         return False
 
+def validate_document(data, default_priority='low'):
+    """
+    Normalize the services and dates of a posted document in place
+
+    Rows without a name are dropped silently, as the editor always did; returns the
+    field errors of the kept rows and of the document dates.
+    """
+    services, errors = normalize_services(data.get('services'), default_priority=default_priority)
+    data['services'] = services
+    errors = [error for error in errors if error['field'] != 'name']
+    for field in ('date', 'end_date'):
+        if field not in data:
+            continue
+        value, date_error = normalize_date(data[field])
+        if date_error:
+            errors.append({'index': None, 'service': None, 'field': field, 'value': data[field], 'message': date_error})
+        if value == '-':
+            # Blank document dates keep the stored (or default) date
+            del data[field]
+        else:
+            data[field] = value
+    return errors
+
+def invalid_services_response(errors):
+    """400 response listing per-field validation errors"""
+    first = errors[0]
+    detail = f"{first['service']}: {first['message']}" if first.get('service') else first['message']
+    return jsonify({
+        'status': 'error',
+        'message': f'Invalid service data ({detail})',
+        'errors': errors
+    }), 400
+
+def get_job_owner():
+    """Owner recorded on parse jobs; sessions without a username share the '' owner"""
+    return session.get('username') or ''
+
+def render_upload_error(message):
+    """Render the result page with an upload error and no services"""
+    return render_template('result.html', data={
+        'services': [],
+        'error': message,
+        'date': datetime.now().strftime('%Y-%m-%d'),
+        'end_date': datetime.now().strftime('%Y-%m-%d'),
+        'original_subject': '',
+        'original_body': ''
+    }, header_title='Change Weekend')
+
 # --- Routes ---
 @changes_bp.route('/', methods=['GET', 'POST'])
 def index():
@@ -112,71 +159,102 @@ def index():
             'original_body': ''
         }, header_title='Change Weekend')
 
-    temp_path = None
+    spool = None
     try:
-        # Get file extension for proper temp file naming
-        file_ext = os.path.splitext(file.filename.lower())[1]
-        with tempfile.NamedTemporaryFile(dir=temp_dir, suffix=file_ext, delete=False) as temp_file:
-            temp_path = temp_file.name
-            file.save(temp_path)
-            
-            if not os.path.exists(temp_path):
-                raise FileNotFoundError(f"Failed to save temporary file at {temp_path}")
-            
-            # Use the new FileProcessor to handle multiple formats
-            email_data = FileProcessor.process_file(temp_path, file.filename)
+        # Small uploads are parsed straight from memory; only large ones spill to TEMP_DIR
+        spool = spool_upload(file.stream)
+        email_data = extract_email_data(spool, file.filename)
 
-            # Use only AI processing with performance tracking
-            import ai_processor
-            start_time = time.time()
-            services_data = ai_processor.process_email_content(email_data)
-            end_time = time.time()
-            response_time = end_time - start_time
-            
-            # Track the request
-            success = 'error' not in services_data or not services_data['error']
-            track_ai_request(response_time, success)
-            
-            logger.info("Using AI processing for email content")
-            
-            if 'error' in services_data and services_data['error']:
-                return render_template('result.html', data={
-                    'services': [],
-                    'error': services_data['error'],
-                    'date': datetime.now().strftime('%Y-%m-%d'),
-                    'end_date': datetime.now().strftime('%Y-%m-%d'),
-                    'original_subject': '',
-                    'original_body': ''
-                }, header_title='Change Weekend')
-
-            try:
-                date_obj = datetime.strptime(services_data['date'], "%Y-%m-%d")
-                from calendar import month_name
-                header_title = f"{month_name[date_obj.month]} ChangeWeekend"
-            except:
-                header_title = "Change Weekend"
-            services_data['header_title'] = header_title
-            services_data['processing_method'] = 'AI'
-            
-            return render_template('result.html', data=services_data, header_title=header_title)
+        # force_reparse=true bypasses the parse result cache
+        force_reparse = request.form.get('force_reparse', 'false').lower() == 'true'
+        services_data = parse_email_data(email_data, force_reparse=force_reparse)
+        
+        if 'error' in services_data and services_data['error']:
+            return render_upload_error(services_data['error'])
+        
+        return render_template('result.html', data=services_data, header_title=services_data['header_title'])
 
     except Exception as e:
         logger.error(f"Error processing upload: {str(e)}")
-        return render_template('result.html', data={
-            'services': [],
-            'error': f'Error processing email: {str(e)}',
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'end_date': datetime.now().strftime('%Y-%m-%d'),
-            'original_subject': '',
-            'original_body': ''
-        }, header_title='Change Weekend')
+        return render_upload_error(f'Error processing email: {str(e)}')
 
     finally:
+        if spool is not None:
+            spool.close()
+
+@changes_bp.route('/upload-async', methods=['POST'])
+def upload_async():
+    """Queue an uploaded file for background parsing; progress and completion arrive over /events"""
+    if 'file' not in request.files:
+        return jsonify({'status': 'error', 'message': 'No file uploaded'}), 400
+    
+    file = request.files['file']
+    if file.filename == '' or not FileProcessor.can_process_file(file.filename):
+        supported_formats = ', '.join(FileProcessor.get_supported_extensions())
+        return jsonify({'status': 'error', 'message': f'Invalid file or no file selected. Supported formats: {supported_formats}'}), 400
+    
+    try:
+        force_reparse = request.form.get('force_reparse', 'false').lower() == 'true'
+        job_id = enqueue_parse_job(file.stream, file.filename, get_job_owner(), force_reparse=force_reparse)
+        return jsonify({'status': 'queued', 'job_id': job_id}), 202
+    except Exception as e:
+        logger.error(f"Error queuing upload: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Error queuing upload: {str(e)}'}), 500
+
+@changes_bp.route('/upload-batch', methods=['POST'])
+def upload_batch():
+    """Parse several change notices at once and merge their services into one document"""
+    uploads = [file for file in request.files.getlist('files') if file.filename]
+    if not uploads:
+        return jsonify({'status': 'error', 'message': 'No files uploaded'}), 400
+    if len(uploads) > BATCH_UPLOAD_MAX_FILES:
+        return jsonify({'status': 'error', 'message': f'Too many files (max {BATCH_UPLOAD_MAX_FILES})'}), 400
+    
+    try:
+        force_reparse = request.form.get('force_reparse', 'false').lower() == 'true'
+        files = [(file.filename, spool_upload(file.stream)) for file in uploads]
         try:
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
-        except Exception as e:
-            logger.warning(f"Could not remove temp file: {str(e)}")
+            document, statuses = process_batch(files, force_reparse=force_reparse)
+        finally:
+            for _, spool in files:
+                spool.close()
+        succeeded = sum(1 for status in statuses if status['status'] == 'success')
+        logger.info(f"Batch upload by {session.get('username')}: {succeeded}/{len(files)} files parsed")
+        
+        if document is None:
+            return jsonify({'status': 'error', 'message': 'No file could be processed', 'files': statuses}), 422
+        return jsonify({
+            'status': 'success' if succeeded == len(files) else 'partial',
+            'data': document,
+            'files': statuses
+        })
+    except Exception as e:
+        logger.error(f"Error processing batch upload: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Error processing batch upload: {str(e)}'}), 500
+
+@changes_bp.route('/jobs/<job_id>', methods=['GET'])
+def parse_job_status(job_id):
+    """Get the status of a background parse job (owner only)"""
+    job = get_parse_job(job_id)
+    if not job or job.get('username') != get_job_owner():
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    job.pop('result', None)
+    response = jsonify({'status': 'success', 'job': job})
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
+
+@changes_bp.route('/jobs/<job_id>/result', methods=['GET'])
+def parse_job_result(job_id):
+    """Render the parsed document of a completed job, like a synchronous upload would"""
+    job = get_parse_job(job_id)
+    if not job or job.get('username') != get_job_owner():
+        return render_upload_error('Upload job not found or expired')
+    if job.get('status') == 'failed':
+        return render_upload_error(job.get('error') or 'Error processing email')
+    if job.get('status') != 'completed':
+        return render_upload_error('Upload is still being processed')
+    services_data = job['result']
+    return render_template('result.html', data=services_data, header_title=services_data.get('header_title', 'Change Weekend'))
 
 @changes_bp.route('/sync-all-data', methods=['POST'])
 def sync_all_data():
@@ -185,8 +263,11 @@ def sync_all_data():
     """Save all data at once to Redis"""
     data = request.json
     
-    if not data or 'services' not in data:
+    if not isinstance(data, dict) or not isinstance(data.get('services'), list):
         return jsonify({'status': 'error', 'message': 'Invalid data structure'})
+    errors = validate_document(data)
+    if errors:
+        return invalid_services_response(errors)
     stored_data = get_stored_data() or {}
     for key in data:
         stored_data[key] = data[key]
@@ -229,35 +310,54 @@ def save_changes():
         }
     
     data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error', 'message': 'Invalid data structure'}), 400
+    
+    errors = {}
+    doc_date = None
+    if data.get('date'):
+        doc_date, date_error = normalize_date(data['date'])
+        if date_error:
+            errors['date'] = date_error
     
-    found = False
-    for service in stored_data['services']:
-        if service['name'] == data['service'] or (not service['name'] and not data['service']):
-            service['name'] = data['service']
-            service['start_date'] = data.get('start_date', stored_data['date'])
-            service['start_time'] = data['startTime']
-            service['end_time'] = data['endTime']
-            service['comments'] = data.get('comments', '')
-            service['priority'] = data.get('impactPriority', 'low')
-            service['end_date'] = data.get('endDate', stored_data['date'])
-            found = True
-            break
-    
-    if not found:
-        stored_data['services'].append({
-            'name': data['service'],
+    # A row without a name is dropped, as before, so only a named row is validated
+    name = data.get('service')
+    updated = None
+    if name is not None and str(name).strip():
+        updated, service_errors = normalize_service({
+            'name': name,
             'start_date': data.get('start_date', stored_data['date']),
-            'start_time': data['startTime'],
-            'end_time': data['endTime'],
+            'start_time': data.get('startTime'),
+            'end_time': data.get('endTime'),
             'end_date': data.get('endDate', stored_data['date']),
             'comments': data.get('comments', ''),
             'priority': data.get('impactPriority', 'low')
-        })
+        }, default_priority='low')
+        errors.update(service_errors)
+    if errors:
+        request_fields = {'name': 'service', 'start_time': 'startTime', 'end_time': 'endTime',
+                          'end_date': 'endDate', 'priority': 'impactPriority'}
+        return invalid_services_response([
+            {'index': None, 'service': name, 'field': field,
+             'value': data.get(request_fields.get(field, field)), 'message': message}
+            for field, message in errors.items()
+        ])
+    
+    if updated:
+        found = False
+        for service in stored_data['services']:
+            if service['name'] == updated['name']:
+                service.update(updated)
+                found = True
+                break
+        
+        if not found:
+            stored_data['services'].append(updated)
     
     stored_data['services'] = [s for s in stored_data['services'] if s['name'].strip()]
     
-    if 'date' in data and data['date']:
-        stored_data['date'] = data['date']
+    if doc_date and doc_date != '-':
+        stored_data['date'] = doc_date
     
     save_stored_data(stored_data)
     return jsonify({'status': 'success'})
@@ -294,6 +394,13 @@ def save_parsed_data():
         }
     
     data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get('services'), list):
+        return jsonify({'status': 'error', 'message': 'Invalid data structure'}), 400
+    
+    # Rows without a name are dropped, as in save_changes
+    errors = validate_document(data)
+    if errors:
+        return invalid_services_response(errors)
     
     stored_data['services'] = data['services']
     
@@ -335,8 +442,11 @@ def sync_to_history():
     """Save all data to Redis and also save to history"""
     data = request.json
     
-    if not data or 'services' not in data:
+    if not isinstance(data, dict) or not isinstance(data.get('services'), list):
         return jsonify({'status': 'error', 'message': 'Invalid data structure'})
+    errors = validate_document(data)
+    if errors:
+        return invalid_services_response(errors)
     
     stored_data = get_stored_data() or {}
     for key in data:
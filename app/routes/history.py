@@ -2,7 +2,7 @@
 History management routes
 This file contains all history-related routes from app.py
 """
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 import time
 import json
 import logging
@@ -11,9 +11,17 @@ import threading
 from ..utils.redis_client import history_redis, history_key_manager
 from ..utils.helpers import history_cache
 from ..utils.decorators import rate_limit
+from ..routes.auth import is_reauth_valid
+from ..services.history_service import (
+    format_history_timestamp, remove_history_items, query_history_filtered,
+    iter_history_export, import_history_lines, diff_history_items, clear_history_diff_cache
+)
 
 logger = logging.getLogger(__name__)
 
+# History items are immutable, so a diff for a given pair never changes
+HISTORY_DIFF_CACHE_TTL = 86400
+
 # Create blueprint
 history_bp = Blueprint('history', __name__)
 
@@ -77,7 +85,52 @@ def get_history_items_batch(timestamps):
         logger.error(f"Error getting batch history items: {str(e)}")
         return []
 
-def get_paginated_history_optimized(page, per_page):
+def get_history_summaries_batch(timestamps):
+    """Get list summaries for multiple history items with a single HMGET (no full snapshots)"""
+    if not timestamps:
+        return []
+    
+    try:
+        if not history_redis or not history_key_manager:
+            logger.error("History Redis client not available")
+            return []
+        
+        from ..services.history_service import build_history_summary
+        summary_key = history_key_manager.get_summary_key()
+        fields = [format_history_timestamp(timestamp) for timestamp in timestamps]
+        results = history_redis.hmget(summary_key, fields)
+        
+        summaries = {}
+        missing = []
+        for field, summary_data in zip(fields, results):
+            if summary_data:
+                try:
+                    summaries[field] = json.loads(summary_data)
+                    continue
+                except json.JSONDecodeError as e:
+                    logger.error(f"Error parsing history summary {field}: {str(e)}")
+            missing.append(field)
+        
+        # Entries saved before summaries existed: build them once from the full item and backfill
+        if missing:
+            backfill = {}
+            for item in get_history_items_batch(missing):
+                summary = build_history_summary(item)
+                field = format_history_timestamp(item.get('timestamp'))
+                summaries[field] = summary
+                backfill[field] = json.dumps(summary)
+            if backfill:
+                history_redis.hset(summary_key, mapping=backfill)
+                logger.info(f"Backfilled {len(backfill)} history summaries")
+        
+        # Maintain requested order, skipping entries that no longer exist
+        return [summaries[field] for field in fields if field in summaries]
+        
+    except Exception as e:
+        logger.error(f"Error getting batch history summaries: {str(e)}")
+        return []
+
+def get_paginated_history_optimized(page, per_page, summary=False):
     """Get paginated history using Redis ZREVRANGE for O(1) performance"""
     try:
         if not history_redis or not history_key_manager:
@@ -93,12 +146,14 @@ def get_paginated_history_optimized(page, per_page):
         start_idx = (page - 1) * per_page
         end_idx = start_idx + per_page - 1
         
-        # Get metadata for this page using ZREVRANGE (newest first)
-        metadata_items = history_redis.zrevrange(metadata_key, start_idx, end_idx, withscores=True)
+        # Get timestamps for this page using ZREVRANGE (newest first); members are timestamps
+        timestamps = history_redis.zrevrange(metadata_key, start_idx, end_idx)
         
         # OPTIMIZATION: Batch fetch all needed items instead of individual calls
-        timestamps = [timestamp for metadata_json, timestamp in metadata_items]
-        items = get_history_items_batch(timestamps)
+        if summary:
+            items = get_history_summaries_batch(timestamps)
+        else:
+            items = get_history_items_batch(timestamps)
         
         total_pages = (total_count + per_page - 1) // per_page
         
@@ -115,17 +170,85 @@ def get_paginated_history_optimized(page, per_page):
         logger.error(f"Error getting paginated history: {str(e)}")
         return [], {'current_page': page, 'per_page': per_page, 'total_items': 0, 'total_pages': 0, 'has_next': False, 'has_prev': False}
 
+def get_filtered_history(filters, page, per_page, summary=False):
+    """Get an exact, paginated history listing matching structured filters"""
+    empty_pagination = {'current_page': page, 'per_page': per_page, 'total_items': 0, 'total_pages': 0, 'has_next': False, 'has_prev': False}
+    try:
+        if not history_redis or not history_key_manager:
+            logger.error("History Redis client not available")
+            return [], empty_pagination
+        
+        timestamps, total_count = query_history_filtered(filters, page, per_page)
+        if summary:
+            items = get_history_summaries_batch(timestamps)
+        else:
+            items = get_history_items_batch(timestamps)
+        
+        total_pages = (total_count + per_page - 1) // per_page
+        return items, {
+            'current_page': page,
+            'per_page': per_page,
+            'total_items': total_count,
+            'total_pages': total_pages,
+            'has_next': page < total_pages,
+            'has_prev': page > 1
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting filtered history: {str(e)}")
+        return [], empty_pagination
+
+def parse_history_filters(args):
+    """Parse structured filter parameters for /get-history; returns (filters, error message)"""
+    filters = {}
+    try:
+        if args.get('from'):
+            filters['from_ts'] = float(args['from'])
+        if args.get('to'):
+            filters['to_ts'] = float(args['to'])
+        if args.get('min_services'):
+            filters['min_services'] = int(args['min_services'])
+    except ValueError:
+        return None, 'from/to must be Unix timestamps and min_services an integer'
+    
+    from ..services.history_service import maintenance_date_score
+    for name in ('maintenance_from', 'maintenance_to'):
+        value = args.get(name, '').strip()
+        if value:
+            if maintenance_date_score(value) is None:
+                return None, f'{name} must be a YYYY-MM-DD date'
+            filters[name] = value
+    
+    editor = args.get('editor', '').strip()
+    if editor:
+        filters['editor'] = editor
+    return filters, None
+
 # --- Routes ---
 @history_bp.route('/get-history', methods=['GET'])
 @rate_limit
 def get_history():
-    """Get the sync history with pagination and search"""
+    """Get the sync history with pagination and search
+    
+    view=summary returns only title, dates, editor and service count per entry;
+    full snapshots are only served by /load-from-history.
+    
+    Structured filters (from, to, editor, maintenance_from, maintenance_to,
+    min_services) give an exact paginated listing from the secondary indexes;
+    they apply to listings, not to free-text search.
+    """
     search = request.args.get('search', '').strip()
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)  # Changed to 10 for better UX
+    view = 'summary' if request.args.get('view') == 'summary' else 'full'
+    summary = view == 'summary'
+    
+    filters, filter_error = parse_history_filters(request.args)
+    if filter_error:
+        return jsonify({'status': 'error', 'message': filter_error}), 400
     
     # Generate cache key
-    cache_key = history_cache.get_cache_key(search, page, per_page)
+    cache_key = history_cache.get_cache_key(search, page, per_page, view, filters)
     
     # Check ETag from request
     if_none_match = request.headers.get('If-None-Match')
@@ -137,15 +260,18 @@ def get_history():
     # Generate new data
     if search:
         from ..services.search_service import search_history_redis_optimized
-        data = search_history_redis_optimized(search)
+        data = search_history_redis_optimized(search, summary=summary)
         is_empty = (len(data) == 0)
         response = jsonify({
             'items': data,
             'is_empty': is_empty
         })
     else:
-        # Use optimized pagination for O(1) performance
-        items, pagination = get_paginated_history_optimized(page, per_page)
+        if filters:
+            items, pagination = get_filtered_history(filters, page, per_page, summary=summary)
+        else:
+            # Use optimized pagination for O(1) performance
+            items, pagination = get_paginated_history_optimized(page, per_page, summary=summary)
         is_empty = (len(items) == 0)
         data = {
             'items': items,
@@ -167,6 +293,11 @@ def get_history():
 def load_from_history(timestamp):
     """Load data from a specific history point"""
     try:
+        try:
+            timestamp = format_history_timestamp(timestamp)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'History entry not found'})
+        
         # Get the specific history item
         history_item = get_history_item_by_timestamp(timestamp)
         
@@ -205,24 +336,20 @@ def delete_from_history(timestamp):
         if not history_redis or not history_key_manager:
             logger.error("History Redis client not available")
             return jsonify({'status': 'error', 'message': 'History service unavailable'}), 500
-        # Remove from metadata sorted set
-        metadata_key = history_key_manager.get_metadata_key()
-        all_timestamps = history_redis.zrevrange(metadata_key, 0, -1, withscores=True)
-        found = False
-        
-        for metadata_json, ts in all_timestamps:
-            if str(ts) == timestamp:
-                # Remove from metadata sorted set
-                history_redis.zrem(metadata_key, metadata_json)
-                # Remove the actual item
-                item_key = history_key_manager.get_history_item_key(ts)
-                history_redis.delete(item_key)
-                found = True
-                break
+        try:
+            member = format_history_timestamp(timestamp)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'History entry not found'})
+        
+        # Members are timestamps, so removal is a direct ZREM (O(log N)) instead of a scan
+        found = remove_history_items([member]) > 0
         
         if not found:
             return jsonify({'status': 'error', 'message': 'History entry not found'})
         
+        # A later import may reuse the timestamp, so cached diffs must not outlive the item
+        clear_history_diff_cache([member])
+        
         # Invalidate server-side cache
         history_cache.cache.clear()
         history_cache.etags.clear()
@@ -236,3 +363,89 @@ def delete_from_history(timestamp):
     except Exception as e:
         logger.error(f"Error deleting history entry: {str(e)}")
         return jsonify({'status': 'error', 'message': f'Error deleting entry: {str(e)}'}), 500
+
+@history_bp.route('/history/export', methods=['GET'])
+def export_history():
+    """Stream all history items as NDJSON (one item per line, oldest first)"""
+    if session.get('role') != 'admin':
+        return jsonify({'status': 'error', 'message': 'Admin only'}), 403
+    if not history_redis or not history_key_manager:
+        return jsonify({'status': 'error', 'message': 'History service unavailable'}), 500
+    
+    filename = f"history-export-{int(time.time())}.ndjson"
+    return Response(stream_with_context(iter_history_export()),
+                    mimetype='application/x-ndjson',
+                    headers={
+                        'Content-Disposition': f'attachment; filename={filename}',
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no'
+                    })
+
+@history_bp.route('/history/import', methods=['POST'])
+def import_history():
+    """Import history from an NDJSON body or an uploaded .ndjson file, streamed line by line"""
+    if session.get('role') != 'admin':
+        return jsonify({'status': 'error', 'message': 'Admin only'}), 403
+    if not is_reauth_valid():
+        return jsonify({'status': 'error', 'message': 'Re-authentication required'}), 401
+    
+    try:
+        if 'file' in request.files:
+            lines = request.files['file'].stream
+        else:
+            lines = request.stream
+        result = import_history_lines(lines)
+        
+        # Invalidate server-side cache
+        history_cache.cache.clear()
+        history_cache.etags.clear()
+        
+        logger.info(f"History import by {session.get('username')}: {result}")
+        return jsonify({'status': 'success', **result})
+        
+    except Exception as e:
+        logger.error(f"Error importing history: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Error importing history: {str(e)}'}), 500
+
+@history_bp.route('/history/diff', methods=['GET'])
+@rate_limit
+def diff_history():
+    """Service-level diff between two history snapshots (?from=<timestamp>&to=<timestamp>)"""
+    try:
+        if not history_redis or not history_key_manager:
+            logger.error("History Redis client not available")
+            return jsonify({'status': 'error', 'message': 'History service unavailable'}), 500
+        try:
+            from_ts = format_history_timestamp(request.args.get('from', ''))
+            to_ts = format_history_timestamp(request.args.get('to', ''))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'from and to must be history timestamps'}), 400
+        
+        # Check both entries still exist and look up the cached diff in one round trip
+        metadata_key = history_key_manager.get_metadata_key()
+        cache_key = history_key_manager.get_cache_key('diff', f"{from_ts}:{to_ts}")
+        with history_redis.pipeline() as pipe:
+            pipe.zscore(metadata_key, from_ts)
+            pipe.zscore(metadata_key, to_ts)
+            pipe.get(cache_key)
+            from_score, to_score, cached_diff = pipe.execute()
+        
+        if from_score is None or to_score is None:
+            return jsonify({'status': 'error', 'message': 'History entry not found'}), 404
+        
+        if cached_diff:
+            diff = json.loads(cached_diff)
+        else:
+            items = get_history_items_batch([from_ts, to_ts])
+            if len(items) != 2:
+                return jsonify({'status': 'error', 'message': 'History entry not found'}), 404
+            diff = diff_history_items(items[0], items[1])
+            history_redis.setex(cache_key, HISTORY_DIFF_CACHE_TTL, json.dumps(diff))
+        
+        response = jsonify({'status': 'success', 'diff': diff, 'cached': bool(cached_diff)})
+        response.headers['Cache-Control'] = 'private, max-age=3600'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error computing history diff: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Error computing diff: {str(e)}'}), 500
@@ -0,0 +1,107 @@
+"""
+AI answer cache service
+This file contains the Redis cache of /ask-ai answers, keyed by the normalized question,
+the document version (context_id) and the model, so a repeated question about an
+unchanged change document is answered without a Gemini call.
+"""
+import re
+import time
+import hashlib
+import logging
+import unicodedata
+
+from ..config import GEMINI_MODEL, AI_ANSWER_CACHE_TTL, AI_ANSWER_CACHE_MAX_ENTRIES
+from ..utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the chat prompt in build_ask_ai_request changes so stale answers are not reused
+ANSWER_PROMPT_VERSION = "1"
+AI_ANSWER_PREFIX = 'ai_answer:'
+AI_ANSWER_INDEX_KEY = 'ai_answer_index'
+AI_ANSWER_STATS_KEY = 'ai_answer_stats'
+
+APOSTROPHE_RE = re.compile(r"[‘’`´]")
+NON_WORD_RE = re.compile(r"[^\w\s']+")
+SPACE_RE = re.compile(r'\s+')
+
+def normalize_question(question):
+    """Case, punctuation and whitespace-insensitive form of a question"""
+    text = unicodedata.normalize('NFKC', question or '').casefold()
+    text = APOSTROPHE_RE.sub("'", text)
+    text = NON_WORD_RE.sub(' ', text)
+    return SPACE_RE.sub(' ', text).strip()
+
+def get_answer_key(question, context_id):
+    digest = hashlib.sha256()
+    for part in (GEMINI_MODEL, ANSWER_PROMPT_VERSION, context_id or '', normalize_question(question)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return f"{AI_ANSWER_PREFIX}{digest.hexdigest()}"
+
+def get_cached_answer(question, context_id):
+    """Return a cached answer or None, counting the hit or miss (cache errors never fail a question)"""
+    if AI_ANSWER_CACHE_TTL <= 0:
+        return None
+    try:
+        key = get_answer_key(question, context_id)
+        answer = redis_client.get(key)
+        pipe = redis_client.pipeline(transaction=False)
+        if answer is not None:
+            # Refresh recency so frequently asked questions survive trimming
+            pipe.zadd(AI_ANSWER_INDEX_KEY, {key: time.time()})
+            pipe.hincrby(AI_ANSWER_STATS_KEY, 'hits', 1)
+        else:
+            pipe.hincrby(AI_ANSWER_STATS_KEY, 'misses', 1)
+        pipe.execute()
+        return answer
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {str(e)}")
+        return None
+
+def store_cached_answer(question, context_id, answer):
+    """Store an answer with TTL and trim the cache to AI_ANSWER_CACHE_MAX_ENTRIES (LRU)"""
+    if AI_ANSWER_CACHE_TTL <= 0 or not answer:
+        return
+    try:
+        key = get_answer_key(question, context_id)
+        now = time.time()
+        with redis_client.pipeline() as pipe:
+            pipe.setex(key, AI_ANSWER_CACHE_TTL, answer)
+            pipe.zadd(AI_ANSWER_INDEX_KEY, {key: now})
+            # Drop index entries whose keys have already expired
+            pipe.zremrangebyscore(AI_ANSWER_INDEX_KEY, '-inf', now - AI_ANSWER_CACHE_TTL)
+            pipe.zcard(AI_ANSWER_INDEX_KEY)
+            entry_count = pipe.execute()[-1]
+        if entry_count > AI_ANSWER_CACHE_MAX_ENTRIES:
+            # Evict least recently used answers
+            evicted = redis_client.zrange(AI_ANSWER_INDEX_KEY, 0, entry_count - AI_ANSWER_CACHE_MAX_ENTRIES - 1)
+            if evicted:
+                with redis_client.pipeline() as pipe:
+                    pipe.delete(*evicted)
+                    pipe.zrem(AI_ANSWER_INDEX_KEY, *evicted)
+                    pipe.execute()
+    except Exception as e:
+        logger.warning(f"Answer cache store failed: {str(e)}")
+
+def get_answer_cache_metrics():
+    """Hits, misses, hit rate (%) and current entry count"""
+    try:
+        stats = redis_client.hgetall(AI_ANSWER_STATS_KEY)
+        hits = int(stats.get('hits', 0))
+        misses = int(stats.get('misses', 0))
+        lookups = hits + misses
+        return {
+            'enabled': AI_ANSWER_CACHE_TTL > 0,
+            'hits': hits,
+            'misses': misses,
+            'hitRate': round(hits / lookups * 100, 1) if lookups else None,
+            'entries': redis_client.zcard(AI_ANSWER_INDEX_KEY)
+        }
+    except Exception as e:
+        logger.error(f"Error reading answer cache metrics: {str(e)}")
+        return {'enabled': AI_ANSWER_CACHE_TTL > 0}
+
+def reset_answer_cache_stats():
+    """Clear the hit/miss counters (cached answers stay)"""
+    redis_client.delete(AI_ANSWER_STATS_KEY)
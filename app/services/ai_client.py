@@ -0,0 +1,72 @@
+"""
+AI client manager
+Process-wide Gemini client and keep-alive HTTP session shared by the email parser,
+the /ask-ai chat and the AI status checks, so each request reuses pooled connections
+instead of repeating TLS setup.
+"""
+import os
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config import (
+    GEMINI_API_KEY, GEMINI_API_BASE_URL, GEMINI_BASE_URL, GEMINI_DEFAULT_BASE_URL,
+    AI_HTTP_POOL_SIZE, AI_MAX_CONCURRENT_REQUESTS
+)
+from ..utils.lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+# threading.Lock is greenlet-aware once gevent has monkey-patched the worker
+_client_lock = threading.Lock()
+_genai_client = None
+_http_session = None
+_owner_pid = None
+
+# Bounds concurrent Gemini calls from this process (e.g. a batch upload fanning out)
+ai_request_slots = threading.BoundedSemaphore(AI_MAX_CONCURRENT_REQUESTS)
+
+def _reset_if_forked():
+    """Drop clients inherited from a parent process; pooled sockets must not be shared across forks"""
+    global _genai_client, _http_session, _owner_pid
+    if _owner_pid != os.getpid():
+        _genai_client = None
+        _http_session = None
+        _owner_pid = os.getpid()
+
+def get_genai_client():
+    """Return the process-wide Gemini client, creating it on first use"""
+    global _genai_client
+    with _client_lock:
+        _reset_if_forked()
+        if _genai_client is None:
+            genai = lazy_import('google.genai')
+            types = lazy_import('google.genai.types')
+            if GEMINI_BASE_URL != GEMINI_DEFAULT_BASE_URL:
+                # Alternate endpoint, e.g. the local mock used for load tests
+                _genai_client = genai.Client(api_key=GEMINI_API_KEY,
+                                             http_options=types.HttpOptions(base_url=GEMINI_BASE_URL))
+            else:
+                _genai_client = genai.Client(api_key=GEMINI_API_KEY)
+            logger.info("Created shared Gemini client")
+        return _genai_client
+
+def get_http_session():
+    """Return the process-wide keep-alive session for direct Gemini REST calls"""
+    global _http_session
+    with _client_lock:
+        _reset_if_forked()
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=AI_HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            if GEMINI_API_KEY:
+                session.headers['X-goog-api-key'] = GEMINI_API_KEY
+            _http_session = session
+        return _http_session
+
+def gemini_api_url(path=''):
+    """Build a Gemini REST URL (e.g. gemini_api_url('models'))"""
+    return f"{GEMINI_API_BASE_URL}/{path}" if path else GEMINI_API_BASE_URL
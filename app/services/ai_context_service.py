@@ -0,0 +1,93 @@
+"""
+AI context service
+This file contains the server-side store for /ask-ai page context: each version of a
+change is compacted once and later chat turns reference it by id.
+"""
+import json
+import hashlib
+import logging
+
+from ..config import AI_CONTEXT_TTL, AI_CONTEXT_MAX_EMAIL_CHARS
+from ..utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+AI_CONTEXT_PREFIX = 'ai_context:'
+
+# Page context field -> alternatives the client has sent over time
+SERVICE_FIELDS = [
+    ('start_date', ('start_date', 'startDate')),
+    ('start_time', ('start_time', 'startTime')),
+    ('end_date', ('end_date', 'endDate')),
+    ('end_time', ('end_time', 'endTime')),
+]
+
+def get_context_id(context):
+    """Document version id: hash of the canonical page context"""
+    canonical = json.dumps(context, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:24]
+
+def _service_line(service):
+    """One service per line, only fields that carry a value"""
+    parts = [str(service.get('name', '')).strip() or 'Unnamed']
+    for label, names in SERVICE_FIELDS:
+        value = next((str(service[name]).strip() for name in names if service.get(name)), '')
+        if value and value != '-':
+            parts.append(f"{label}={value}")
+    if service.get('priority'):
+        parts.append(f"priority={service['priority']}")
+    comments = str(service.get('comments', '')).strip()
+    if comments:
+        parts.append(f"comments={comments}")
+    return '; '.join(parts)
+
+def compact_context(context):
+    """Token-efficient text form of the page context for the chat prompt"""
+    import ai_processor
+
+    lines = [
+        f"Page Title: {context.get('pageTitle') or 'Change Management'}",
+        f"Header: {context.get('headerTitle') or 'Change Weekend'}",
+        f"Date: {context.get('date') or 'Not specified'}",
+    ]
+    services = context.get('services') or []
+    if services:
+        lines.append(f"Services ({len(services)}):")
+        lines.extend(f"- {_service_line(service)}" for service in services)
+    else:
+        lines.append("Services: none")
+
+    # Same clean-up as the parser: no quoted replies, signatures or disclaimers
+    email = ai_processor.preprocess_email_body(context.get('originalEmail') or '')
+    if len(email) > AI_CONTEXT_MAX_EMAIL_CHARS:
+        email = email[:AI_CONTEXT_MAX_EMAIL_CHARS] + ' [truncated]'
+    lines.append(f"Original Email Content: {email or 'No email content available'}")
+    return '\n'.join(lines)
+
+def store_context(context):
+    """Compact and store a page context once per version; returns (context_id, compact text)"""
+    context_id = get_context_id(context)
+    key = f"{AI_CONTEXT_PREFIX}{context_id}"
+    try:
+        existing = redis_client.get(key)
+        if existing is not None:
+            redis_client.expire(key, AI_CONTEXT_TTL)
+            return context_id, existing
+        compact = compact_context(context)
+        redis_client.setex(key, AI_CONTEXT_TTL, compact)
+        return context_id, compact
+    except Exception as e:
+        logger.error(f"Error storing AI context: {str(e)}")
+        return context_id, compact_context(context)
+
+def get_context(context_id):
+    """Return the stored compact context, or None if it has expired"""
+    try:
+        key = f"{AI_CONTEXT_PREFIX}{context_id}"
+        compact = redis_client.get(key)
+        if compact is not None:
+            redis_client.expire(key, AI_CONTEXT_TTL)
+        return compact
+    except Exception as e:
+        logger.error(f"Error reading AI context: {str(e)}")
+        return None
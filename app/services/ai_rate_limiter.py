@@ -0,0 +1,246 @@
+"""
+AI rate limiter
+This file contains the Redis-backed token bucket shared by all workers in front of
+every Gemini call, with a FIFO wait queue and a global Retry-After block.
+"""
+import os
+import re
+import time
+import uuid
+import logging
+
+from ..config import (
+    AI_RATE_LIMIT_PER_MINUTE, AI_RATE_LIMIT_BURST, AI_RATE_LIMIT_WAIT_TIMEOUT, AI_MAX_RETRIES
+)
+from ..utils.redis_client import redis_client
+from .ai_client import ai_request_slots
+
+logger = logging.getLogger(__name__)
+
+AI_RATE_BUCKET_KEY = 'ai_rate:bucket'
+AI_RATE_QUEUE_KEY = 'ai_rate:queue'
+AI_RATE_SEEN_KEY = 'ai_rate:queue_seen'
+AI_RATE_BLOCKED_KEY = 'ai_rate:blocked_until'
+AI_RATE_STATS_KEY = 'ai_rate:stats'
+
+# Waiters poll at least this often; a waiter not seen for QUEUE_STALE_MS (crashed worker)
+# is dropped so it can't hold the head of the queue
+QUEUE_POLL_MS = 1000
+QUEUE_STALE_MS = 10000
+# Backoff used when a 429 carries no retry hint
+DEFAULT_RETRY_DELAY = 5
+
+class AIRateLimitError(Exception):
+    """Raised when a Gemini call can't be made within the wait timeout or retries are exhausted"""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Returns 0 when a token was taken, otherwise milliseconds to wait before polling again.
+# Only the oldest live waiter may take a token, so waiters are served in arrival order
+# across all workers.
+ACQUIRE_SCRIPT = redis_client.register_script("""
+local bucket, queue, seen, blocked_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local member = ARGV[1]
+local rate_per_ms = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local stale_ms = tonumber(ARGV[4])
+local poll_ms = tonumber(ARGV[5])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local stale = redis.call('ZRANGEBYSCORE', seen, '-inf', now - stale_ms)
+for _, m in ipairs(stale) do
+    redis.call('ZREM', queue, m)
+    redis.call('ZREM', seen, m)
+end
+
+if not redis.call('ZSCORE', queue, member) then
+    redis.call('ZADD', queue, now, member)
+end
+redis.call('ZADD', seen, now, member)
+
+local blocked_until = tonumber(redis.call('GET', blocked_key) or '0')
+if blocked_until > now then
+    return math.min(blocked_until - now, poll_ms)
+end
+
+local head = redis.call('ZRANGE', queue, 0, 0)[1]
+if head ~= member then
+    return math.min(50, poll_ms)
+end
+
+local state = redis.call('HMGET', bucket, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate_per_ms)
+
+if tokens < 1 then
+    redis.call('HSET', bucket, 'tokens', tostring(tokens), 'ts', now)
+    return math.min(math.ceil((1 - tokens) / rate_per_ms), poll_ms)
+end
+
+redis.call('HSET', bucket, 'tokens', tostring(tokens - 1), 'ts', now)
+redis.call('PEXPIRE', bucket, math.ceil(capacity / rate_per_ms) + 60000)
+redis.call('ZREM', queue, member)
+redis.call('ZREM', seen, member)
+return 0
+""")
+
+# Extends the global block to now + ARGV[1] ms, never shortening an existing one
+BLOCK_SCRIPT = redis_client.register_script("""
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local until_ms = now + tonumber(ARGV[1])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if until_ms > current then
+    redis.call('SET', KEYS[1], until_ms, 'PX', tonumber(ARGV[1]))
+end
+return until_ms
+""")
+
+def acquire_ai_token(timeout=None):
+    """
+    Wait in the shared queue for a token
+
+    Fails open (returns immediately) if Redis is unavailable or limiting is disabled.
+
+    Raises:
+        AIRateLimitError: if no token was granted within the timeout
+    """
+    if AI_RATE_LIMIT_PER_MINUTE <= 0:
+        return
+
+    timeout = AI_RATE_LIMIT_WAIT_TIMEOUT if timeout is None else timeout
+    member = f"{os.getpid()}:{uuid.uuid4().hex}"
+    deadline = time.time() + timeout
+    rate_per_ms = AI_RATE_LIMIT_PER_MINUTE / 60000.0
+    waited = False
+
+    try:
+        while True:
+            wait_ms = ACQUIRE_SCRIPT(
+                keys=[AI_RATE_BUCKET_KEY, AI_RATE_QUEUE_KEY, AI_RATE_SEEN_KEY, AI_RATE_BLOCKED_KEY],
+                args=[member, rate_per_ms, AI_RATE_LIMIT_BURST, QUEUE_STALE_MS, QUEUE_POLL_MS]
+            )
+            if int(wait_ms) == 0:
+                if waited:
+                    redis_client.hincrby(AI_RATE_STATS_KEY, 'throttled', 1)
+                return
+            if time.time() + wait_ms / 1000.0 > deadline:
+                redis_client.hincrby(AI_RATE_STATS_KEY, 'timeouts', 1)
+                raise AIRateLimitError("Timed out waiting for an AI request slot",
+                                       retry_after=max(1, int(wait_ms / 1000)))
+            waited = True
+            time.sleep(wait_ms / 1000.0)
+    except AIRateLimitError:
+        _leave_queue(member)
+        raise
+    except Exception as e:
+        logger.warning(f"AI rate limiter unavailable, proceeding without it: {str(e)}")
+        _leave_queue(member)
+
+def _leave_queue(member):
+    """Remove a waiter that gave up so it doesn't block the queue head"""
+    try:
+        with redis_client.pipeline() as pipe:
+            pipe.zrem(AI_RATE_QUEUE_KEY, member)
+            pipe.zrem(AI_RATE_SEEN_KEY, member)
+            pipe.execute()
+    except Exception:
+        pass
+
+def block_ai_requests(seconds):
+    """Hold back every worker's Gemini calls for the given number of seconds"""
+    try:
+        BLOCK_SCRIPT(keys=[AI_RATE_BLOCKED_KEY], args=[max(1, int(seconds * 1000))])
+        redis_client.hincrby(AI_RATE_STATS_KEY, 'rate_limited', 1)
+    except Exception as e:
+        logger.warning(f"Could not record AI rate limit block: {str(e)}")
+
+def is_rate_limit_error(error):
+    """True for a Gemini 429 / RESOURCE_EXHAUSTED error"""
+    return getattr(error, 'code', None) == 429 or getattr(error, 'status', None) == 'RESOURCE_EXHAUSTED'
+
+def get_retry_after(error):
+    """
+    Seconds the API asked us to wait, from a Retry-After header or a RetryInfo
+    detail ("retryDelay": "17s"); None if the error carries no hint
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        retry_after = headers.get('retry-after')
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+
+    details = getattr(error, 'details', None)
+    if isinstance(details, dict):
+        details = details.get('error', details).get('details', [])
+    for detail in details if isinstance(details, list) else []:
+        if isinstance(detail, dict) and 'retryDelay' in detail:
+            match = re.match(r'^([\d.]+)s$', str(detail['retryDelay']))
+            if match:
+                return float(match.group(1))
+    return None
+
+def call_gemini(request_fn, max_retries=None):
+    """
+    Run a Gemini call behind the shared token bucket, retrying rate-limited calls
+
+    On a 429 every worker is blocked for the Retry-After delay (or an exponential
+    backoff when none is given) and the call rejoins the queue. Other errors are
+    raised unchanged.
+
+    Raises:
+        AIRateLimitError: if the call is still rate limited after max_retries attempts
+    """
+    max_retries = AI_MAX_RETRIES if max_retries is None else max_retries
+    backoff = DEFAULT_RETRY_DELAY
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            # Take the token only once this process has a free slot, so every token
+            # spent from the shared bucket becomes an API call straight away
+            with ai_request_slots:
+                acquire_ai_token()
+                return request_fn()
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+            delay = get_retry_after(e) or backoff
+            backoff *= 2
+            logger.warning(f"Gemini rate limit hit (attempt {attempt}/{max_retries}), "
+                           f"holding AI requests for {delay:.1f}s")
+            block_ai_requests(delay)
+            if attempt == max_retries:
+                raise AIRateLimitError("Gemini API rate limit exceeded after multiple retries",
+                                       retry_after=int(delay) + 1)
+
+def get_rate_limiter_metrics():
+    """Return queue depth, bucket level, active block and throttle counters"""
+    try:
+        with redis_client.pipeline() as pipe:
+            pipe.zcard(AI_RATE_QUEUE_KEY)
+            pipe.hget(AI_RATE_BUCKET_KEY, 'tokens')
+            pipe.pttl(AI_RATE_BLOCKED_KEY)
+            pipe.hgetall(AI_RATE_STATS_KEY)
+            queue_depth, tokens, blocked_ms, stats = pipe.execute()
+        return {
+            'enabled': AI_RATE_LIMIT_PER_MINUTE > 0,
+            'limitPerMinute': AI_RATE_LIMIT_PER_MINUTE,
+            'burst': AI_RATE_LIMIT_BURST,
+            'queueDepth': queue_depth,
+            'tokensAvailable': round(float(tokens), 2) if tokens is not None else AI_RATE_LIMIT_BURST,
+            'blockedFor': round(blocked_ms / 1000.0, 1) if blocked_ms and blocked_ms > 0 else 0,
+            'throttled': int(stats.get('throttled', 0)),
+            'rateLimited': int(stats.get('rate_limited', 0)),
+            'timeouts': int(stats.get('timeouts', 0))
+        }
+    except Exception as e:
+        logger.error(f"Error reading AI rate limiter metrics: {str(e)}")
+        return {'enabled': AI_RATE_LIMIT_PER_MINUTE > 0, 'error': str(e)}
@@ -5,144 +5,191 @@ This file contains AI-related functionality from app.py
 import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime
-from google import genai
-from google.genai import types
 
-from ..config import GEMINI_API_KEY, GEMINI_MODEL
+from ..config import GEMINI_API_KEY, GEMINI_MODEL, AI_HEALTH_CHECK_INTERVAL, AI_HEALTH_MAX_BACKOFF
 from ..utils.redis_client import redis_client
 
 logger = logging.getLogger(__name__)
 
-def get_ai_performance_stats():
-    """Get AI performance stats from Redis"""
-    try:
-        stats_data = redis_client.get('ai_performance_stats')
-        if stats_data:
-            stats = json.loads(stats_data)
-            # Convert datetime strings back to datetime objects
-            if stats.get('last_request_time'):
-                stats['last_request_time'] = datetime.fromisoformat(stats['last_request_time'])
-            if stats.get('daily_reset_date'):
-                stats['daily_reset_date'] = datetime.fromisoformat(stats['daily_reset_date']).date()
-            return stats
-        else:
-            # Return default stats if none exist
-            return {
-                'requests_today': 0,
-                'total_requests': 0,
-                'response_times': [],
-                'last_request_time': None,
-                'success_count': 0,
-                'error_count': 0,
-                'daily_reset_date': datetime.now().date()
-            }
-    except Exception as e:
-        logger.error(f"Error getting AI performance stats: {str(e)}")
-        return {
-            'requests_today': 0,
-            'total_requests': 0,
-            'response_times': [],
-            'last_request_time': None,
-            'success_count': 0,
-            'error_count': 0,
-            'daily_reset_date': datetime.now().date()
-        }
+# --- AI health monitor ---
+# One worker at a time probes the Gemini API in the background and publishes a snapshot;
+# /ai-status and the parse path only read it.
+AI_HEALTH_KEY = 'ai_health_status'
+AI_HEALTH_PROBE_LOCK_KEY = 'ai_health_probe_lock'
 
-def save_ai_performance_stats(stats):
-    """Save AI performance stats to Redis"""
+def probe_ai_health():
+    """Probe Gemini connectivity and model availability (network calls; background use only)"""
+    import ai_processor
+    
+    if not GEMINI_API_KEY:
+        return {'connected': False, 'model_available': False,
+                'error': 'GEMINI_API_KEY environment variable not set'}
+    connection_status = ai_processor.check_gemini_connection()
+    model_available = False
+    if connection_status['connected']:
+        model_available = ai_processor.check_model_availability(GEMINI_MODEL)
+    return {
+        'connected': connection_status['connected'],
+        'model_available': model_available,
+        'error': connection_status.get('error')
+    }
+
+def get_ai_health_snapshot():
+    """Return the latest AI health snapshot, or None if no probe has completed yet"""
     try:
-        # Convert datetime objects to strings for JSON serialization
-        stats_copy = stats.copy()
-        if stats_copy.get('last_request_time'):
-            stats_copy['last_request_time'] = stats_copy['last_request_time'].isoformat()
-        if stats_copy.get('daily_reset_date'):
-            stats_copy['daily_reset_date'] = stats_copy['daily_reset_date'].isoformat()
-        
-        redis_client.set('ai_performance_stats', json.dumps(stats_copy))
-        return True
+        snapshot = redis_client.get(AI_HEALTH_KEY)
+        return json.loads(snapshot) if snapshot else None
     except Exception as e:
-        logger.error(f"Error saving AI performance stats: {str(e)}")
-        return False
+        logger.error(f"Error reading AI health snapshot: {str(e)}")
+        return None
 
-def track_ai_request(response_time, success=True):
-    """Track AI API request performance"""
-    stats = get_ai_performance_stats()
-    
-    # Reset daily counters if it's a new day
-    current_date = datetime.now().date()
-    if stats['daily_reset_date'] != current_date:
-        stats['requests_today'] = 0
-        stats['daily_reset_date'] = current_date
-        logger.info("Reset daily request counter for new day")
+def run_ai_health_check():
+    """
+    Probe and store a snapshot if this worker wins the probe slot
     
-    # Update counters
-    stats['requests_today'] += 1
-    stats['total_requests'] += 1
-    stats['last_request_time'] = datetime.now()
+    The probe lock's expiry doubles as the schedule: it is held for the normal
+    interval after a success and for an exponentially growing backoff after
+    consecutive failures, so workers never probe more often than that.
+    """
+    if not redis_client.set(AI_HEALTH_PROBE_LOCK_KEY, '1', nx=True, ex=AI_HEALTH_CHECK_INTERVAL):
+        return None
     
-    if success:
-        stats['success_count'] += 1
-    else:
-        stats['error_count'] += 1
+    previous = get_ai_health_snapshot() or {}
+    try:
+        result = probe_ai_health()
+    except Exception as e:
+        result = {'connected': False, 'model_available': False, 'error': f'Unexpected error: {str(e)}'}
     
-    # Track response times (keep only last 100 for average)
-    stats['response_times'].append(response_time)
-    if len(stats['response_times']) > 100:
-        stats['response_times'] = stats['response_times'][-100:]
+    failures = 0 if result['connected'] else previous.get('consecutive_failures', 0) + 1
+    next_delay = min(AI_HEALTH_CHECK_INTERVAL * (2 ** failures), AI_HEALTH_MAX_BACKOFF) if failures else AI_HEALTH_CHECK_INTERVAL
+    snapshot = dict(result, checked_at=time.time(), consecutive_failures=failures, next_check_in=next_delay)
     
-    # Save to Redis
-    save_ai_performance_stats(stats)
+    with redis_client.pipeline() as pipe:
+        # Keep the snapshot past the next scheduled probe so readers always have one
+        pipe.setex(AI_HEALTH_KEY, next_delay + AI_HEALTH_CHECK_INTERVAL * 2, json.dumps(snapshot))
+        pipe.expire(AI_HEALTH_PROBE_LOCK_KEY, next_delay)
+        pipe.execute()
     
-    # Debug logging
-    logger.info(f"AI request tracked - Success: {success}, Response time: {response_time:.2f}s, Today's count: {stats['requests_today']}")
+    if failures:
+        logger.warning(f"AI health probe failed ({failures} in a row): {result.get('error')}; next probe in {next_delay}s")
+    return snapshot
+
+def ai_health_monitor_loop():
+    """Background loop: attempt a probe every few seconds; the Redis lock enforces the real interval"""
+    poll_interval = max(5, min(AI_HEALTH_CHECK_INTERVAL, 30))
+    while True:
+        try:
+            run_ai_health_check()
+        except Exception as e:
+            logger.error(f"AI health monitor error: {str(e)}")
+        time.sleep(poll_interval)
+
+def start_ai_health_monitor():
+    """Start the AI health monitor thread on app startup"""
+    monitor_thread = threading.Thread(target=ai_health_monitor_loop, daemon=True)
+    monitor_thread.start()
+    return monitor_thread
+
+# --- AI performance stats ---
+# Counters are updated with atomic Redis primitives so concurrent requests never lose
+# increments: all-time totals in a hash, per-day request counts in hashes that expire,
+# and the most recent latencies in a capped list used for averages and percentiles.
+AI_STATS_TOTALS_KEY = 'ai_stats:totals'
+AI_STATS_DAY_PREFIX = 'ai_stats:day:'
+AI_STATS_LATENCY_KEY = 'ai_stats:latencies'
+AI_STATS_TTFT_KEY = 'ai_stats:ttft'
+AI_STATS_LATENCY_SAMPLES = 500
+AI_STATS_DAY_TTL = 8 * 86400
+# Pre-hash JSON blob, removed on reset
+LEGACY_AI_STATS_KEY = 'ai_performance_stats'
+
+def _ai_stats_day_key(day=None):
+    return f"{AI_STATS_DAY_PREFIX}{(day or datetime.now().date()).isoformat()}"
+
+def track_ai_request(response_time, success=True, time_to_first_token=None):
+    """Track AI API request performance (time_to_first_token only for streamed answers)"""
+    try:
+        day_key = _ai_stats_day_key()
+        outcome = 'success_count' if success else 'error_count'
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(AI_STATS_TOTALS_KEY, 'total_requests', 1)
+            pipe.hincrby(AI_STATS_TOTALS_KEY, outcome, 1)
+            pipe.hset(AI_STATS_TOTALS_KEY, 'last_request_time', time.time())
+            pipe.hincrby(day_key, 'requests', 1)
+            pipe.hincrby(day_key, outcome, 1)
+            pipe.expire(day_key, AI_STATS_DAY_TTL)
+            pipe.lpush(AI_STATS_LATENCY_KEY, f"{response_time:.4f}")
+            pipe.ltrim(AI_STATS_LATENCY_KEY, 0, AI_STATS_LATENCY_SAMPLES - 1)
+            if time_to_first_token is not None:
+                pipe.lpush(AI_STATS_TTFT_KEY, f"{time_to_first_token:.4f}")
+                pipe.ltrim(AI_STATS_TTFT_KEY, 0, AI_STATS_LATENCY_SAMPLES - 1)
+            pipe.execute()
+        logger.debug(f"AI request tracked - Success: {success}, Response time: {response_time:.2f}s")
+    except Exception as e:
+        logger.error(f"Error tracking AI request: {str(e)}")
+
+def reset_ai_performance_stats():
+    """Clear all AI performance statistics"""
+    day_keys = list(redis_client.scan_iter(match=f"{AI_STATS_DAY_PREFIX}*", count=100))
+    redis_client.delete(AI_STATS_TOTALS_KEY, AI_STATS_LATENCY_KEY, AI_STATS_TTFT_KEY, LEGACY_AI_STATS_KEY, *day_keys)
+
+def _percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def _format_elapsed(seconds):
+    if seconds < 60:
+        return f"{int(seconds)}s ago"
+    elif seconds < 3600:
+        return f"{int(seconds / 60)}m ago"
+    elif seconds < 86400:
+        return f"{int(seconds / 3600)}h ago"
+    return f"{int(seconds / 86400)}d ago"
 
 def calculate_performance_metrics():
     """Calculate performance metrics from tracked data"""
-    stats = get_ai_performance_stats()
-    
-    # Debug logging
-    logger.info(f"Calculating metrics - Total requests today: {stats['requests_today']}, Success: {stats['success_count']}, Errors: {stats['error_count']}")
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(AI_STATS_TOTALS_KEY)
+            pipe.hget(_ai_stats_day_key(), 'requests')
+            pipe.lrange(AI_STATS_LATENCY_KEY, 0, -1)
+            pipe.lrange(AI_STATS_TTFT_KEY, 0, -1)
+            totals, requests_today, latencies, ttfts = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error getting AI performance stats: {str(e)}")
+        totals, requests_today, latencies, ttfts = {}, None, [], []
     
-    # Calculate average response time
-    if stats['response_times']:
-        avg_response_time = sum(stats['response_times']) / len(stats['response_times'])
-        response_time_str = f"{avg_response_time:.2f}s"
+    latencies = sorted(float(value) for value in latencies)
+    if latencies:
+        response_time_str = f"{sum(latencies) / len(latencies):.2f}s"
+        p50_str = f"{_percentile(latencies, 50):.2f}s"
+        p95_str = f"{_percentile(latencies, 95):.2f}s"
     else:
-        response_time_str = '--'
+        response_time_str = p50_str = p95_str = '--'
+    
+    ttfts = sorted(float(value) for value in ttfts)
+    ttft_str = f"{_percentile(ttfts, 50):.2f}s" if ttfts else '--'
     
-    # Calculate success rate
-    total_requests = stats['success_count'] + stats['error_count']
-    if total_requests > 0:
-        success_rate = (stats['success_count'] / total_requests) * 100
-        success_rate_str = f"{success_rate:.1f}%"
+    success_count = int(totals.get('success_count', 0))
+    error_count = int(totals.get('error_count', 0))
+    if success_count + error_count > 0:
+        success_rate_str = f"{success_count / (success_count + error_count) * 100:.1f}%"
     else:
         success_rate_str = '--'
     
-    # Format last request time
-    if stats['last_request_time']:
-        now = datetime.now()
-        time_diff = now - stats['last_request_time']
-        
-        if time_diff.total_seconds() < 60:
-            last_request_str = f"{int(time_diff.total_seconds())}s ago"
-        elif time_diff.total_seconds() < 3600:
-            last_request_str = f"{int(time_diff.total_seconds() / 60)}m ago"
-        elif time_diff.total_seconds() < 86400:
-            last_request_str = f"{int(time_diff.total_seconds() / 3600)}h ago"
-        else:
-            last_request_str = f"{int(time_diff.total_seconds() / 86400)}d ago"
-    else:
-        last_request_str = 'Never'
+    last_request_time = totals.get('last_request_time')
+    last_request_str = _format_elapsed(time.time() - float(last_request_time)) if last_request_time else 'Never'
     
-    metrics = {
+    return {
         'responseTime': response_time_str,
+        'p50ResponseTime': p50_str,
+        'p95ResponseTime': p95_str,
+        'timeToFirstToken': ttft_str,
         'successRate': success_rate_str,
-        'requestCount': stats['requests_today'],
+        'requestCount': int(requests_today or 0),
         'lastRequest': last_request_str
     }
-    
-    # Debug logging
-    logger.info(f"Calculated metrics: {metrics}")
-    
-    return metrics
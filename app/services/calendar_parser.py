@@ -0,0 +1,282 @@
+"""
+Calendar parser service
+This file contains a small iCalendar (.ics) reader: it unfolds content lines, collects
+the properties of each VEVENT and maps events (recurrences expanded) to service rows
+in the schema the AI parser produces, so calendar invites never need an AI call.
+"""
+import re
+import logging
+from datetime import datetime, timedelta, timezone
+
+from ..config import CALENDAR_TIMEZONE, CALENDAR_MAX_OCCURRENCES, CALENDAR_EXPANSION_DAYS
+from ..utils.lazy_imports import lazy_import
+from ..utils.validators import normalize_services
+
+logger = logging.getLogger(__name__)
+
+CONTENT_LINE_RE = re.compile(r'^(?P<name>[A-Za-z0-9-]+)(?P<params>(?:;[^:]*)?):(?P<value>.*)$')
+TEXT_ESCAPES = {'\\n': '\n', '\\N': '\n', '\\,': ',', '\\;': ';', '\\\\': '\\'}
+TEXT_ESCAPE_RE = re.compile(r'\\[nN,;\\]')
+ICAL_DATETIME_RE = re.compile(r'^(\d{4})(\d{2})(\d{2})(?:T(\d{2})(\d{2})(\d{2})?(Z)?)?$')
+DURATION_RE = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+UNTIL_UTC_RE = re.compile(r'UNTIL=(\d{8}T\d{6})Z', re.IGNORECASE)
+MAX_COMMENT_CHARS = 200
+
+def unfold_lines(text):
+    """Join folded content lines (continuations start with a space or tab)"""
+    lines = []
+    for line in text.splitlines():
+        if line[:1] in (' ', '\t') and lines:
+            lines[-1] += line[1:]
+        elif line.strip():
+            lines.append(line)
+    return lines
+
+def unescape_text(value):
+    return TEXT_ESCAPE_RE.sub(lambda match: TEXT_ESCAPES[match.group(0)], value)
+
+def _parse_params(params):
+    parsed = {}
+    for param in params.split(';'):
+        if '=' in param:
+            key, _, value = param.partition('=')
+            parsed[key.upper()] = value.strip('"')
+    return parsed
+
+def parse_calendar(text):
+    """
+    Parse iCalendar text
+
+    Returns (calendar properties, events); every property is a (value, params) tuple and
+    properties that can repeat (RDATE, EXDATE) are lists of them.
+    """
+    calendar = {}
+    events = []
+    stack = []
+    event = None
+    for line in unfold_lines(text):
+        match = CONTENT_LINE_RE.match(line)
+        if not match:
+            continue
+        name = match.group('name').upper()
+        value = match.group('value')
+        if name == 'BEGIN':
+            stack.append(value.upper())
+            if value.upper() == 'VEVENT':
+                event = {}
+            continue
+        if name == 'END':
+            if stack:
+                stack.pop()
+            if value.upper() == 'VEVENT' and event is not None:
+                events.append(event)
+                event = None
+            continue
+
+        prop = (value, _parse_params(match.group('params')[1:]))
+        if stack and stack[-1] == 'VEVENT' and event is not None:
+            if name in ('RDATE', 'EXDATE'):
+                event.setdefault(name, []).append(prop)
+            else:
+                event.setdefault(name, prop)
+        elif stack == ['VCALENDAR']:
+            calendar.setdefault(name, prop)
+    return calendar, events
+
+def event_text(event, name):
+    """Unescaped text value of an event property ('' if missing)"""
+    prop = event.get(name)
+    return unescape_text(prop[0]).strip() if prop else ''
+
+def format_events(events):
+    """Readable listing of the events, used as the body text of an .ics upload"""
+    blocks = []
+    for event in events:
+        lines = [f"Summary: {event_text(event, 'SUMMARY') or 'Untitled event'}"]
+        for label, name in (('Start', 'DTSTART'), ('End', 'DTEND'), ('Recurrence', 'RRULE'),
+                            ('Location', 'LOCATION'), ('Description', 'DESCRIPTION')):
+            value = event_text(event, name)
+            if value:
+                lines.append(f"{label}: {value}")
+        blocks.append('\n'.join(lines))
+    return '\n\n'.join(blocks)
+
+def _zone(name):
+    """zoneinfo for an IANA zone name, or None"""
+    if not name:
+        return None
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        # e.g. Outlook zone names ("W. Europe Standard Time") aren't IANA names
+        return None
+
+def parse_ical_datetime(prop):
+    """
+    Parse a DTSTART/DTEND/RDATE/EXDATE/RECURRENCE-ID value
+
+    Returns (naive wall-clock datetime, all_day, zone) where zone is UTC for "Z" times,
+    the TZID zone if it is a known IANA name, and None for floating times;
+    (None, False, None) if the value isn't a date.
+    """
+    value, params = prop
+    match = ICAL_DATETIME_RE.match(value.strip())
+    if not match:
+        return None, False, None
+    year, month, day, hour, minute, second, utc = match.groups()
+    if hour is None:
+        return datetime(int(year), int(month), int(day)), True, None
+    parsed = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
+    return parsed, False, timezone.utc if utc else _zone(params.get('TZID'))
+
+def convert_time(value, source_zone, target_zone):
+    """Wall-clock time in source_zone as wall-clock time in target_zone (unchanged if either is unknown)"""
+    if source_zone is None or target_zone is None:
+        return value
+    return value.replace(tzinfo=source_zone).astimezone(target_zone).replace(tzinfo=None)
+
+def _event_time(prop, event_zone):
+    """A date property of an event as wall-clock time in the event's DTSTART zone"""
+    parsed, _, zone = parse_ical_datetime(prop)
+    return convert_time(parsed, zone, event_zone) if parsed is not None else None
+
+def parse_duration(value):
+    """timedelta for an iCalendar DURATION such as PT2H30M or P1D"""
+    match = DURATION_RE.match((value or '').strip())
+    if not match:
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                         minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
+
+def _event_priority(event):
+    """RFC 5545 PRIORITY: 1-4 high, 5 medium, 6-9 low, 0/missing undefined (medium)"""
+    try:
+        priority = int(event_text(event, 'PRIORITY') or 0)
+    except ValueError:
+        return 'medium'
+    if 1 <= priority <= 4:
+        return 'high'
+    if priority >= 6:
+        return 'low'
+    return 'medium'
+
+def _event_comments(event):
+    description = ' '.join(event_text(event, 'DESCRIPTION').split())
+    location = event_text(event, 'LOCATION')
+    comments = description or (f"Location: {location}" if location else '') or 'Calendar event'
+    if len(comments) > MAX_COMMENT_CHARS:
+        comments = comments[:MAX_COMMENT_CHARS - 3].rstrip() + '...'
+    return comments
+
+def _rrule_in_zone(rule, event_zone):
+    """Rewrite a UTC UNTIL as wall-clock time in the event's zone so it compares with DTSTART"""
+    def local_until(match):
+        until, _, _ = parse_ical_datetime((match.group(1), {}))
+        if until is None:
+            return match.group(0)
+        return f"UNTIL={convert_time(until, timezone.utc, event_zone).strftime('%Y%m%dT%H%M%S')}"
+    return UNTIL_UTC_RE.sub(local_until, rule)
+
+def expand_occurrences(event, start, event_zone=None, excluded=()):
+    """
+    Start times of an event: DTSTART plus RRULE/RDATE expansions, minus EXDATEs
+
+    Expansion runs in the event's own wall-clock time, as RFC 5545 requires, so a
+    weekly 22:00 window stays at 22:00 across daylight-saving changes.
+    """
+    if 'RRULE' not in event and 'RDATE' not in event:
+        return [start]
+
+    rrule = lazy_import('dateutil.rrule')
+    rule_set = rrule.rruleset()
+    if 'RRULE' in event:
+        rule = _rrule_in_zone(event['RRULE'][0], event_zone)
+        rule_set.rrule(rrule.rrulestr(f"RRULE:{rule}", dtstart=start, ignoretz=True))
+    else:
+        rule_set.rdate(start)
+    for name, add in (('RDATE', rule_set.rdate), ('EXDATE', rule_set.exdate)):
+        for value, params in event.get(name, []):
+            for part in value.split(','):
+                parsed = _event_time((part, params), event_zone)
+                if parsed is not None:
+                    add(parsed)
+    for recurrence_id in excluded:
+        rule_set.exdate(recurrence_id)
+
+    horizon = start + timedelta(days=CALENDAR_EXPANSION_DAYS)
+    occurrences = []
+    for occurrence in rule_set:
+        if occurrence > horizon or len(occurrences) >= CALENDAR_MAX_OCCURRENCES:
+            break
+        occurrences.append(occurrence)
+    return occurrences
+
+def events_to_services(events):
+    """
+    Map VEVENTs to service rows (name, start_date, start_time, end_time, end_date,
+    comments, priority), one row per occurrence of a recurring event
+
+    Times are kept as written in the invite unless CALENDAR_TIMEZONE is set. Cancelled
+    events are skipped; an event with a RECURRENCE-ID replaces that single occurrence
+    of its series.
+    """
+    target_zone = _zone(CALENDAR_TIMEZONE)
+    if CALENDAR_TIMEZONE and target_zone is None:
+        logger.warning(f"Unknown CALENDAR_TIMEZONE {CALENDAR_TIMEZONE}; keeping event times as written")
+
+    # Occurrences replaced by RECURRENCE-ID overrides, per series UID (in series time)
+    overrides = {}
+    for event in events:
+        if 'RECURRENCE-ID' in event:
+            recurrence_id, _, zone = parse_ical_datetime(event['RECURRENCE-ID'])
+            if recurrence_id is not None:
+                overrides.setdefault(event_text(event, 'UID'), []).append((recurrence_id, zone))
+
+    services = []
+    for event in events:
+        if event_text(event, 'STATUS').upper() == 'CANCELLED' or 'DTSTART' not in event:
+            continue
+        start, all_day, event_zone = parse_ical_datetime(event['DTSTART'])
+        if start is None:
+            continue
+
+        end = _event_time(event['DTEND'], event_zone) if 'DTEND' in event else None
+        if end is not None:
+            duration = end - start
+        else:
+            duration = parse_duration(event_text(event, 'DURATION')) or (timedelta(days=1) if all_day else timedelta(0))
+
+        excluded = [] if 'RECURRENCE-ID' in event else [
+            convert_time(recurrence_id, zone, event_zone)
+            for recurrence_id, zone in overrides.get(event_text(event, 'UID'), [])
+        ]
+        name = event_text(event, 'SUMMARY') or 'Calendar event'
+        comments = _event_comments(event)
+        priority = _event_priority(event)
+
+        for occurrence in expand_occurrences(event, start, event_zone, excluded):
+            if all_day:
+                # All-day DTEND is exclusive
+                first_day = occurrence
+                last_day = max(occurrence, occurrence + duration - timedelta(days=1))
+                start_time, end_time = '-', '-'
+            else:
+                first_day = convert_time(occurrence, event_zone, target_zone)
+                last_day = convert_time(occurrence + duration, event_zone, target_zone)
+                start_time, end_time = first_day.strftime('%H:%M'), last_day.strftime('%H:%M')
+            services.append({
+                'name': name,
+                'start_date': first_day.strftime('%Y-%m-%d'),
+                'start_time': start_time,
+                'end_time': end_time,
+                'end_date': last_day.strftime('%Y-%m-%d'),
+                'comments': comments,
+                'priority': priority
+            })
+
+    services, _ = normalize_services(services)
+    services.sort(key=lambda x: (x['start_date'], x['start_time'], x['name']))
+    return services
@@ -2,11 +2,27 @@
 Email processing service
 This file contains the FileProcessor class and related functionality from app.py
 """
+import io
 import os
 import re
+import csv
+import time
+import logging
 from datetime import datetime
-import extract_msg
-from dateutil import parser
+
+from ..config import UPLOAD_SPOOL_MAX_MEMORY, EXTRACT_MAX_TEXT_CHARS
+from ..utils.lazy_imports import lazy_import, is_module_available
+from .text_extractor import read_text, extract_html, extract_mime, html_to_text
+from .calendar_parser import parse_calendar, format_events, event_text, events_to_services
+from .parser_registry import (
+    register_parser, get_parsers, parser_for_extension, sniff_parser, read_head, record_parse,
+    is_ole_file, is_pdf_file, is_icalendar, is_html, is_mime_message
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows of a .csv service list passed on as body text
+CSV_MAX_ROWS = 2000
 
 def extract_date_from_subject(subject):
     date_patterns = [
@@ -15,6 +31,7 @@ def extract_date_from_subject(subject):
         r'\d{4}-\d{2}-\d{2}'
     ]
     
+    parser = lazy_import('dateutil.parser')
     for pattern in date_patterns:
         match = re.search(pattern, subject)
         if match:
@@ -33,7 +50,7 @@ class FileProcessor:
     @staticmethod
     def get_supported_extensions():
         """Return list of supported file extensions"""
-        return ['.msg', '.txt', '.eml', '.html', '.htm']
+        return [ext for plugin in get_parsers() for ext in plugin.extensions]
     
     @staticmethod
     def can_process_file(filename):
@@ -44,46 +61,89 @@ class FileProcessor:
         return ext in FileProcessor.get_supported_extensions()
     
     @staticmethod
-    def process_file(file_path, filename):
-        """Process file and extract email-like data"""
-        ext = os.path.splitext(filename.lower())[1]
+    def process_file(source, filename):
+        """
+        Process file and extract email-like data
         
-        if ext == '.msg':
-            return FileProcessor._process_msg(file_path)
-        elif ext == '.txt':
-            return FileProcessor._process_txt(file_path)
-        elif ext == '.eml':
-            return FileProcessor._process_eml(file_path)
-        elif ext in ['.html', '.htm']:
-            return FileProcessor._process_html(file_path)
-        else:
+        source can be a file path, the file's bytes, or a readable file-like object
+        (e.g. the spooled upload from spool_upload). The parser is picked by sniffing
+        the first bytes (OLE, PDF, iCalendar, HTML, MIME headers) and falls back to the
+        filename's extension, so a misnamed file still reaches the right parser.
+        """
+        ext = os.path.splitext(filename.lower())[1]
+        by_extension = parser_for_extension(ext)
+        plugin = sniff_parser(read_head(source)) or by_extension
+        if plugin is None:
             raise ValueError(f"Unsupported file format: {ext}")
+        
+        rerouted = by_extension is not None and plugin is not by_extension
+        if rerouted:
+            logger.info(f"{filename} looks like {plugin.name} content; parsing it as {plugin.name}")
+        
+        started = time.perf_counter()
+        try:
+            data = plugin.parse(source)
+        except Exception:
+            record_parse(plugin.name, time.perf_counter() - started, success=False, rerouted=rerouted)
+            raise
+        record_parse(plugin.name, time.perf_counter() - started, rerouted=rerouted)
+        return data
     
     @staticmethod
-    def _process_msg(file_path):
+    def _msg_source(source):
+        """
+        extract_msg takes a path, the raw bytes or a file object; small uploads are
+        handed over as bytes, larger (already spooled to disk) ones as the file object
+        """
+        if hasattr(source, 'read'):
+            source.seek(0, os.SEEK_END)
+            size = source.tell()
+            source.seek(0)
+            return source.read() if size <= UPLOAD_SPOOL_MAX_MEMORY else source
+        return source
+    
+    @staticmethod
+    def _process_msg(source):
         """Process Outlook .msg file"""
-        msg = extract_msg.Message(file_path)
+        extract_msg = lazy_import('extract_msg')
+        msg = extract_msg.Message(FileProcessor._msg_source(source))
+        try:
+            return FileProcessor._msg_to_email_data(msg)
+        finally:
+            msg.close()
+    
+    @staticmethod
+    def _msg_to_email_data(msg):
+        """Map an open extract_msg message to email data"""
         maintenance_date = extract_date_from_subject(msg.subject)
         if not maintenance_date:
             if isinstance(msg.date, datetime):
                 msg_date = msg.date
             else:
-                msg_date = parser.parse(msg.date)
+                msg_date = lazy_import('dateutil.parser').parse(msg.date)
             maintenance_date = msg_date.strftime("%Y-%m-%d")
         
+        # HTML body kept for the rule-based table extractor
+        html_body = msg.htmlBody
+        if isinstance(html_body, bytes):
+            html_body = html_body.decode('utf-8', errors='ignore')
+        
+        # HTML-only messages have no plain body
+        body = (msg.body or '')[:EXTRACT_MAX_TEXT_CHARS] or html_to_text(html_body)
+        
         return {
             'subject': msg.subject,
             'sender': msg.sender,
             'date': maintenance_date,
-            'body': msg.body
+            'body': body,
+            'body_html': html_body or ''
         }
     
     @staticmethod
-    def _process_txt(file_path):
+    def _process_txt(source):
         """Process plain text file - minimal processing, let AI do the work"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            content = read_text(source)
             
             # Simple extraction - just get first line as potential subject
             lines = content.split('\n')
@@ -108,33 +168,18 @@ class FileProcessor:
             }
     
     @staticmethod
-    def _process_eml(file_path):
+    def _process_eml(source):
         """Process .eml file - minimal processing, let AI do the work"""
         try:
-            import email
-            from email import policy
-            
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                msg = email.message_from_file(f, policy=policy.default)
-            
-            subject = msg.get('subject', 'Email Content')
-            sender = msg.get('from', 'Unknown')
-            
-            # Extract body
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        body = part.get_content()
-                        break
-            else:
-                body = msg.get_content()
+            # Headers and the first text parts only; attachments past the scan limit are skipped
+            data = extract_mime(source)
             
             return {
-                'subject': subject,
-                'sender': sender,
+                'subject': data['subject'] or 'Email Content',
+                'sender': data['sender'] or 'Unknown',
                 'date': datetime.now().strftime("%Y-%m-%d"),
-                'body': body
+                'body': data['body'],
+                'body_html': data['body_html']
             }
         except Exception as e:
             return {
@@ -145,33 +190,134 @@ class FileProcessor:
             }
     
     @staticmethod
-    def _process_html(file_path):
+    def _process_html(source):
         """Process HTML file - minimal processing, let AI do the work"""
         try:
-            from bs4 import BeautifulSoup
+            # Streamed: script/style dropped, reading stops at the text size limit
+            title, body, content = extract_html(source)
+            subject = title or "HTML Content"
             
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            return {
+                'subject': subject,
+                'sender': 'Unknown',
+                'date': datetime.now().strftime("%Y-%m-%d"),
+                'body': body,
+                'body_html': content
+            }
+        except Exception as e:
+            return {
+                'subject': 'HTML Content',
+                'sender': 'Unknown',
+                'date': datetime.now().strftime("%Y-%m-%d"),
+                'body': 'Error reading HTML content'
+            }
+    
+    @staticmethod
+    def _process_pdf(source):
+        """Process PDF file - text layer only (pypdf)"""
+        try:
+            pypdf = lazy_import('pypdf')
+            if isinstance(source, (bytes, bytearray)):
+                source = io.BytesIO(source)
+            elif hasattr(source, 'seek'):
+                source.seek(0)
+            reader = pypdf.PdfReader(source)
             
-            soup = BeautifulSoup(content, 'html.parser')
+            pages = []
+            length = 0
+            for page in reader.pages:
+                text = page.extract_text() or ''
+                pages.append(text)
+                length += len(text)
+                if length >= EXTRACT_MAX_TEXT_CHARS:
+                    break
+            body = '\n'.join(pages)[:EXTRACT_MAX_TEXT_CHARS]
             
-            # Extract title/subject
-            title = soup.find('title')
-            subject = title.get_text() if title else "HTML Content"
+            title = reader.metadata.title if reader.metadata else None
+            first_line = next((line.strip() for line in body.splitlines() if line.strip()), '')
             
-            # Extract body text
-            body = soup.get_text()
+            return {
+                'subject': title or first_line or 'PDF Content',
+                'sender': 'Unknown',
+                'date': datetime.now().strftime("%Y-%m-%d"),
+                'body': body
+            }
+        except Exception as e:
+            logger.error(f"Error reading PDF content: {str(e)}")
+            return {
+                'subject': 'PDF Content',
+                'sender': 'Unknown',
+                'date': datetime.now().strftime("%Y-%m-%d"),
+                'body': 'Error reading PDF content'
+            }
+    
+    @staticmethod
+    def _process_ics(source):
+        """Process iCalendar (.ics) invite - events mapped straight to service rows"""
+        try:
+            calendar, events = parse_calendar(read_text(source))
+            services = events_to_services(events)
+            
+            subject = (event_text(calendar, 'X-WR-CALNAME')
+                       or (event_text(events[0], 'SUMMARY') if events else '')
+                       or 'Calendar Invite')
             
             return {
                 'subject': subject,
+                'sender': event_text(events[0], 'ORGANIZER').replace('mailto:', '') if events else 'Unknown',
+                'date': services[0]['start_date'] if services else datetime.now().strftime("%Y-%m-%d"),
+                'body': format_events(events),
+                # Parsed rows; upload_service uses them instead of the rules/AI parsers
+                'calendar_services': services
+            }
+        except Exception as e:
+            logger.error(f"Error reading calendar content: {str(e)}")
+            return {
+                'subject': 'Calendar Invite',
                 'sender': 'Unknown',
                 'date': datetime.now().strftime("%Y-%m-%d"),
-                'body': body
+                'body': 'Error reading calendar content'
+            }
+    
+    @staticmethod
+    def _process_csv(source):
+        """Process .csv service list - rows as pipe-separated lines for the table extractors"""
+        try:
+            content = read_text(source)
+            try:
+                dialect = csv.Sniffer().sniff(content[:4096], delimiters=',;\t|')
+            except csv.Error:
+                dialect = csv.excel
+            
+            lines = []
+            for row in csv.reader(io.StringIO(content), dialect):
+                cells = [cell.strip() for cell in row]
+                if any(cells):
+                    lines.append(' | '.join(cells))
+                if len(lines) >= CSV_MAX_ROWS:
+                    break
+            
+            return {
+                'subject': 'Service List',
+                'sender': 'Unknown',
+                'date': datetime.now().strftime("%Y-%m-%d"),
+                'body': '\n'.join(lines)
             }
         except Exception as e:
+            logger.error(f"Error reading CSV content: {str(e)}")
             return {
-                'subject': 'HTML Content',
+                'subject': 'Service List',
                 'sender': 'Unknown',
                 'date': datetime.now().strftime("%Y-%m-%d"),
-                'body': 'Error reading HTML content'
+                'body': 'Error reading CSV content'
             }
+
+# Parser plugins; content sniffers are tried in this order before the extension is used
+register_parser('msg', ['.msg'], FileProcessor._process_msg, sniff=is_ole_file)
+register_parser('pdf', ['.pdf'], FileProcessor._process_pdf, sniff=is_pdf_file,
+                available=lambda: is_module_available('pypdf'))
+register_parser('ics', ['.ics'], FileProcessor._process_ics, sniff=is_icalendar)
+register_parser('html', ['.html', '.htm'], FileProcessor._process_html, sniff=is_html)
+register_parser('eml', ['.eml'], FileProcessor._process_eml, sniff=is_mime_message)
+register_parser('txt', ['.txt'], FileProcessor._process_txt)
+register_parser('csv', ['.csv'], FileProcessor._process_csv)
@@ -9,9 +9,253 @@ from datetime import datetime
 
 from ..config import HISTORY_LIMIT
 from ..utils.redis_client import history_redis, history_key_manager
+from ..utils.validators import normalize_services
 
 logger = logging.getLogger(__name__)
 
+# Version 2: metadata zset members are timestamps, metadata lives in the summary hash
+# Version 3: secondary indexes by editor, maintenance date and service count
+HISTORY_INDEX_VERSION = 3
+
+def format_history_timestamp(timestamp):
+    """Canonical string form of a history timestamp (zset member, hash field, item key suffix)"""
+    return str(float(timestamp))
+
+def build_history_summary(history_item):
+    """Build the lightweight summary shown in the history list (no services or email body)"""
+    data = history_item.get('data') or {}
+    return {
+        'timestamp': history_item.get('timestamp'),
+        'date': history_item.get('date', ''),
+        'title': history_item.get('title', 'Change Weekend'),
+        'maintenance_date': data.get('date', ''),
+        'service_count': len(data.get('services', [])),
+        'last_edited_by': data.get('last_edited_by') or ''
+    }
+
+def normalize_editor(editor):
+    """Normalize an editor name for the per-editor index"""
+    return (editor or '').strip().lower()
+
+def maintenance_date_score(date_str):
+    """Score a YYYY-MM-DD maintenance date as YYYYMMDD so ranges are numeric; None if unparseable"""
+    try:
+        return int(datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y%m%d'))
+    except (TypeError, ValueError):
+        return None
+
+def queue_history_index_write(pipe, timestamp, summary):
+    """Queue the secondary index entries (editor, maintenance date, service count) for one item"""
+    editor = normalize_editor(summary.get('last_edited_by'))
+    if editor:
+        pipe.zadd(history_key_manager.get_editor_index_key(editor), {timestamp: float(timestamp)})
+    date_score = maintenance_date_score(summary.get('maintenance_date'))
+    if date_score is not None:
+        pipe.zadd(history_key_manager.get_maintenance_date_index_key(), {timestamp: date_score})
+    pipe.zadd(history_key_manager.get_service_count_index_key(), {timestamp: summary.get('service_count', 0)})
+
+def queue_history_index_removal(pipe, timestamp, summary):
+    """Queue the removal of the secondary index entries recorded for one item's summary"""
+    editor = normalize_editor(summary.get('last_edited_by'))
+    if editor:
+        pipe.zrem(history_key_manager.get_editor_index_key(editor), timestamp)
+    pipe.zrem(history_key_manager.get_maintenance_date_index_key(), timestamp)
+    pipe.zrem(history_key_manager.get_service_count_index_key(), timestamp)
+
+def queue_history_item_write(pipe, history_item):
+    """Queue the writes that store and index one history item on a pipeline"""
+    timestamp = format_history_timestamp(history_item['timestamp'])
+    summary = build_history_summary(history_item)
+    # Store individual item
+    pipe.set(history_key_manager.get_history_item_key(timestamp), json.dumps(history_item))
+    # Store the list summary so /get-history never has to load full snapshots
+    pipe.hset(history_key_manager.get_summary_key(), timestamp, json.dumps(summary))
+    # Index the timestamp in the sorted set for efficient pagination; the member is the
+    # timestamp itself so identical metadata can never collide
+    pipe.zadd(history_key_manager.get_metadata_key(), {timestamp: float(timestamp)})
+    queue_history_index_write(pipe, timestamp, summary)
+
+def remove_history_items(timestamps):
+    """
+    Remove history items and all of their index entries
+    
+    Summaries are read first (one HMGET) so the per-editor index entry can be
+    removed directly. Returns the number of items that were indexed.
+    """
+    if not timestamps:
+        return 0
+    timestamps = [format_history_timestamp(timestamp) for timestamp in timestamps]
+    summary_key = history_key_manager.get_summary_key()
+    summaries = history_redis.hmget(summary_key, timestamps)
+    editor_keys = {}
+    for timestamp, summary_data in zip(timestamps, summaries):
+        if summary_data:
+            try:
+                editor = normalize_editor(json.loads(summary_data).get('last_edited_by'))
+                if editor:
+                    editor_keys.setdefault(history_key_manager.get_editor_index_key(editor), []).append(timestamp)
+            except json.JSONDecodeError:
+                logger.warning(f"Could not parse summary for history item {timestamp}")
+    with history_redis.pipeline() as pipe:
+        pipe.zrem(history_key_manager.get_metadata_key(), *timestamps)
+        pipe.delete(*[history_key_manager.get_history_item_key(timestamp) for timestamp in timestamps])
+        pipe.hdel(summary_key, *timestamps)
+        pipe.zrem(history_key_manager.get_maintenance_date_index_key(), *timestamps)
+        pipe.zrem(history_key_manager.get_service_count_index_key(), *timestamps)
+        for editor_key, editor_timestamps in editor_keys.items():
+            pipe.zrem(editor_key, *editor_timestamps)
+        results = pipe.execute()
+    return results[0]
+
+def trim_history(pending=0):
+    """Remove the oldest entries beyond HISTORY_LIMIT (pending counts items about to be added)"""
+    metadata_key = history_key_manager.get_metadata_key()
+    total_items = history_redis.zcard(metadata_key) + pending
+    if total_items <= HISTORY_LIMIT:
+        return 0
+    items_to_remove = total_items - HISTORY_LIMIT
+    oldest_timestamps = history_redis.zrange(metadata_key, 0, items_to_remove - 1)
+    return remove_history_items(oldest_timestamps)
+
+def clear_history_diff_cache(timestamps=None):
+    """
+    Delete cached /history/diff results that involve the given timestamps (all when None)
+    
+    Diffs are cached on the assumption that items never change, so anything that
+    overwrites or removes an item has to drop the diffs it appears in.
+    Returns the number of keys deleted.
+    """
+    if timestamps is None:
+        patterns = [history_key_manager.get_cache_key('diff', '*')]
+    else:
+        patterns = []
+        for timestamp in timestamps:
+            timestamp = format_history_timestamp(timestamp)
+            patterns.append(history_key_manager.get_cache_key('diff', f"{timestamp}:*"))
+            patterns.append(history_key_manager.get_cache_key('diff', f"*:{timestamp}"))
+    deleted = 0
+    for pattern in patterns:
+        cursor = 0
+        while True:
+            cursor, keys = history_redis.scan(cursor, match=pattern, count=500)
+            if keys:
+                deleted += history_redis.delete(*keys)
+            if cursor == 0:
+                break
+    return deleted
+
+def query_history_filtered(filters, page, per_page):
+    """
+    Exact filtered history listing backed by score-range queries on the indexes
+    
+    Args:
+        filters: Dictionary with any of from_ts/to_ts (save timestamp), editor,
+                 maintenance_from/maintenance_to (YYYY-MM-DD) and min_services
+    
+    Time ranges are score ranges on the metadata zset, or on the editor's zset when
+    an editor is given; alone they page directly with ZREVRANGEBYSCORE. Maintenance
+    date and service count filters add one ZRANGEBYSCORE each over their own index
+    and the candidate sets are intersected. Only the requested page is loaded.
+    
+    Returns:
+        (timestamps for the page newest first, total matching count)
+    """
+    time_min = filters.get('from_ts')
+    time_max = filters.get('to_ts')
+    time_min = '-inf' if time_min is None else time_min
+    time_max = '+inf' if time_max is None else time_max
+    start_idx = (page - 1) * per_page
+    
+    if filters.get('editor'):
+        time_index_key = history_key_manager.get_editor_index_key(normalize_editor(filters['editor']))
+    else:
+        time_index_key = history_key_manager.get_metadata_key()
+    has_time_filter = any(filters.get(name) is not None for name in ('from_ts', 'to_ts', 'editor'))
+    has_date_filter = bool(filters.get('maintenance_from') or filters.get('maintenance_to'))
+    has_count_filter = filters.get('min_services') is not None
+    
+    # Time/editor only: the index is already ordered by timestamp, so page directly
+    if not has_date_filter and not has_count_filter:
+        with history_redis.pipeline() as pipe:
+            pipe.zcount(time_index_key, time_min, time_max)
+            pipe.zrevrangebyscore(time_index_key, time_max, time_min, start=start_idx, num=per_page)
+            total_count, timestamps = pipe.execute()
+        return timestamps, total_count
+    
+    with history_redis.pipeline() as pipe:
+        if has_time_filter:
+            pipe.zrangebyscore(time_index_key, time_min, time_max)
+        if has_date_filter:
+            date_min = maintenance_date_score(filters.get('maintenance_from')) or '-inf'
+            date_max = maintenance_date_score(filters.get('maintenance_to')) or '+inf'
+            pipe.zrangebyscore(history_key_manager.get_maintenance_date_index_key(), date_min, date_max)
+        if has_count_filter:
+            pipe.zrangebyscore(history_key_manager.get_service_count_index_key(), filters['min_services'], '+inf')
+        results = pipe.execute()
+    
+    # Intersect smallest first so the work is bounded by the most selective filter
+    results.sort(key=len)
+    matches = set(results[0])
+    for members in results[1:]:
+        matches.intersection_update(members)
+    
+    ordered = sorted(matches, key=float, reverse=True)
+    return ordered[start_idx:start_idx + per_page], len(ordered)
+
+def _service_diff_key(service, seen):
+    """Key a service row by normalized name, numbering repeated names in order"""
+    name = (service.get('name') or '').strip().lower()
+    seen[name] = seen.get(name, 0) + 1
+    return name if seen[name] == 1 else f"{name}#{seen[name]}"
+
+def diff_history_items(from_item, to_item):
+    """
+    Compute a service-level diff between two history snapshots
+    
+    Rows are matched by service name (case-insensitive, repeated names matched in
+    order). Returns added and removed rows, changed rows with per-field before/after
+    values, and changes to the document header fields.
+    """
+    from_data = from_item.get('data') or {}
+    to_data = to_item.get('data') or {}
+    
+    seen = {}
+    from_services = {_service_diff_key(service, seen): service for service in from_data.get('services', [])}
+    seen = {}
+    to_services = {_service_diff_key(service, seen): service for service in to_data.get('services', [])}
+    
+    added = [service for key, service in to_services.items() if key not in from_services]
+    removed = [service for key, service in from_services.items() if key not in to_services]
+    changed = []
+    unchanged_count = 0
+    for key, before in from_services.items():
+        after = to_services.get(key)
+        if after is None:
+            continue
+        fields = {}
+        for field in sorted(set(before) | set(after)):
+            if before.get(field) != after.get(field):
+                fields[field] = {'from': before.get(field), 'to': after.get(field)}
+        if fields:
+            changed.append({'name': after.get('name', before.get('name', '')), 'fields': fields})
+        else:
+            unchanged_count += 1
+    
+    header = {}
+    for field in ('header_title', 'date', 'end_date', 'last_edited_by'):
+        if from_data.get(field) != to_data.get(field):
+            header[field] = {'from': from_data.get(field), 'to': to_data.get(field)}
+    
+    return {
+        'from': build_history_summary(from_item),
+        'to': build_history_summary(to_item),
+        'header': header,
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'unchanged_count': unchanged_count
+    }
+
 def save_to_history(data):
     """Save current data to history with individual Redis keys for better performance"""
     try:
@@ -28,33 +272,12 @@ def save_to_history(data):
             'data': data
         }
         
-        # Use pipelining for bulk operations
+        # Cleanup old entries (keep only HISTORY_LIMIT most recent, including the one being added)
+        trim_history(pending=1)
+        
+        # Use pipelining for bulk operations, executed in a single network round trip
         with history_redis.pipeline() as pipe:
-            # Store individual item
-            item_key = history_key_manager.get_history_item_key(current_timestamp)
-            pipe.set(item_key, json.dumps(history_item))
-            
-            # Store metadata in sorted set for efficient pagination
-            metadata = {
-                'title': data.get('header_title', 'Change Weekend'),
-                'date': data.get('date', ''),
-                'service_count': len(data.get('services', []))
-            }
-            metadata_key = history_key_manager.get_metadata_key()
-            # Ensure timestamp is stored as float for proper sorting
-            pipe.zadd(metadata_key, {json.dumps(metadata): float(current_timestamp)})
-            
-            # Cleanup old entries (keep only HISTORY_LIMIT most recent)
-            total_items = history_redis.zcard(metadata_key)
-            if total_items > HISTORY_LIMIT:
-                # Remove oldest items
-                items_to_remove = total_items - HISTORY_LIMIT
-                oldest_timestamps = history_redis.zrange(metadata_key, 0, items_to_remove - 1)
-                for timestamp in oldest_timestamps:
-                    pipe.delete(history_key_manager.get_history_item_key(timestamp))
-                pipe.zremrangebyrank(metadata_key, 0, items_to_remove - 1)
-            
-            # Execute all operations in single network round trip
+            queue_history_item_write(pipe, history_item)
             pipe.execute()
         
         # Update search index for new data (async)
@@ -65,6 +288,124 @@ def save_to_history(data):
         logger.error(f"Error saving to history: {str(e)}")
         return False
 
+def iter_history_export(batch_size=500):
+    """
+    Yield every history item as one NDJSON line, oldest first
+    
+    Pages through the metadata zset by score (so concurrent saves or deletes don't
+    shift the cursor) and fetches each page with one pipelined batch of GETs, keeping
+    memory constant regardless of history size.
+    """
+    if not history_redis or not history_key_manager:
+        logger.error("History Redis client not available")
+        return
+    metadata_key = history_key_manager.get_metadata_key()
+    min_score = '-inf'
+    exported = 0
+    while True:
+        page = history_redis.zrangebyscore(metadata_key, min_score, '+inf', start=0, num=batch_size, withscores=True)
+        if not page:
+            break
+        with history_redis.pipeline() as pipe:
+            for timestamp, _ in page:
+                pipe.get(history_key_manager.get_history_item_key(timestamp))
+            results = pipe.execute()
+        for item_data in results:
+            if item_data:
+                exported += 1
+                yield item_data + '\n'
+        min_score = f'({page[-1][1]}'
+    logger.info(f"Exported {exported} history items")
+
+def import_history_lines(lines, chunk_size=500):
+    """
+    Import history items from NDJSON lines
+    
+    Writes are pipelined in chunks of chunk_size; trimming to HISTORY_LIMIT and the
+    search index rebuild happen once at the end. Existing items with the same
+    timestamp are overwritten (their old index entries removed first), so re-importing
+    an export is idempotent. Service rows go through the shared validator like every
+    other ingest path: nameless rows are dropped and unreadable fields are stored as
+    "-" and counted.
+    
+    Returns:
+        Dictionary with imported/skipped/invalid_fields counts
+    """
+    if not history_redis or not history_key_manager:
+        raise RuntimeError("History Redis client not available")
+    
+    imported = 0
+    skipped = 0
+    invalid_fields = 0
+    chunk = []
+    
+    def flush(items):
+        # The last line wins when a chunk repeats a timestamp
+        by_timestamp = {format_history_timestamp(item['timestamp']): item for item in items}
+        timestamps = list(by_timestamp)
+        existing = history_redis.hmget(history_key_manager.get_summary_key(), timestamps)
+        with history_redis.pipeline(transaction=False) as pipe:
+            for timestamp, summary_data in zip(timestamps, existing):
+                if not summary_data:
+                    continue
+                try:
+                    # An overwritten item may change editor or maintenance date
+                    queue_history_index_removal(pipe, timestamp, json.loads(summary_data))
+                except json.JSONDecodeError:
+                    logger.warning(f"Could not parse summary for history item {timestamp}")
+            for history_item in by_timestamp.values():
+                queue_history_item_write(pipe, history_item)
+            pipe.execute()
+    
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            history_item = json.loads(line)
+            # Stored as a float so the item key, summary and search index all agree
+            history_item['timestamp'] = float(history_item['timestamp'])
+            if not isinstance(history_item.get('data'), dict):
+                raise ValueError("missing data")
+            if not isinstance(history_item['data'].get('services', []), list):
+                raise ValueError("services is not a list")
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping invalid history import line {line_number}: {str(e)}")
+            skipped += 1
+            continue
+        services, errors = normalize_services(history_item['data'].get('services'), default_priority='low')
+        errors = [error for error in errors if error['field'] != 'name']
+        if errors:
+            invalid_fields += len(errors)
+            logger.warning(f"History import line {line_number}: {len(errors)} invalid fields stored as '-' "
+                           f"(first: {errors[0]['message']})")
+        history_item['data']['services'] = services
+        history_item.setdefault('title', history_item['data'].get('header_title', 'Change Weekend'))
+        history_item.setdefault('date', '')
+        chunk.append(history_item)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            imported += len(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+        imported += len(chunk)
+    
+    trimmed = trim_history() if imported else 0
+    if imported:
+        # Imported items may overwrite existing timestamps; too many to match one by one
+        clear_history_diff_cache()
+    
+    if imported:
+        from .search_service import create_search_index
+        threading.Thread(target=create_search_index, daemon=True).start()
+    
+    logger.info(f"Imported {imported} history items ({skipped} skipped, {trimmed} trimmed, "
+                f"{invalid_fields} invalid fields)")
+    return {'imported': imported, 'skipped': skipped, 'trimmed': trimmed, 'invalid_fields': invalid_fields}
+
 def migrate_history_to_redis():
     """Migrate all history-related keys from main Redis to history Redis with hash tags"""
     try:
@@ -160,3 +501,133 @@ def migrate_history_to_redis():
     except Exception as e:
         logger.error(f"Error migrating history: {str(e)}")
         return False
+
+def migrate_history_index():
+    """
+    Migrate the history indexes to HISTORY_INDEX_VERSION
+    
+    Older releases stored json.dumps(metadata) as the zset member, so two syncs with the
+    same title, date and service count shared one member and the first item key was
+    orphaned. This rewrites every member to its timestamp, backfills the summary hash,
+    re-indexes orphaned item keys found by SCAN and builds the secondary indexes used by
+    filtered listings. All steps are idempotent; later boots only read the version flag.
+    """
+    try:
+        if not history_redis or not history_key_manager:
+            logger.error("History Redis client not available")
+            return False
+        
+        version_key = history_key_manager.get_index_version_key()
+        current_version = history_redis.get(version_key)
+        if current_version and int(current_version) >= HISTORY_INDEX_VERSION:
+            return True
+        
+        # Only one worker performs the migration
+        lock_key = f"{version_key}:lock"
+        if not history_redis.set(lock_key, '1', nx=True, ex=600):
+            logger.info("History index migration already running in another worker, skipping...")
+            return True
+        
+        try:
+            metadata_key = history_key_manager.get_metadata_key()
+            summary_key = history_key_manager.get_summary_key()
+            
+            # Step 1: rewrite JSON members to timestamp members
+            rewritten = 0
+            legacy_members = []
+            cursor = 0
+            while True:
+                cursor, members = history_redis.zscan(metadata_key, cursor=cursor, count=500)
+                for member, score in members:
+                    if member != format_history_timestamp(score):
+                        legacy_members.append((member, score))
+                if cursor == 0:
+                    break
+            
+            for i in range(0, len(legacy_members), 500):
+                batch = legacy_members[i:i + 500]
+                with history_redis.pipeline() as pipe:
+                    for member, score in batch:
+                        pipe.zrem(metadata_key, member)
+                        pipe.zadd(metadata_key, {format_history_timestamp(score): float(score)})
+                    pipe.execute()
+                rewritten += len(batch)
+            
+            # Step 2: re-index item keys orphaned by colliding members
+            recovered = 0
+            item_prefix = history_key_manager.get_history_item_key('')
+            cursor = 0
+            while True:
+                cursor, keys = history_redis.scan(cursor, match=f"{item_prefix}*", count=500)
+                if keys:
+                    timestamps = [key[len(item_prefix):] for key in keys]
+                    with history_redis.pipeline() as pipe:
+                        for timestamp in timestamps:
+                            pipe.zscore(metadata_key, timestamp)
+                        scores = pipe.execute()
+                    orphaned = {}
+                    for timestamp, score in zip(timestamps, scores):
+                        if score is None:
+                            try:
+                                orphaned[timestamp] = float(timestamp)
+                            except ValueError:
+                                logger.warning(f"Skipping history item with invalid timestamp: {timestamp}")
+                    if orphaned:
+                        history_redis.zadd(metadata_key, orphaned)
+                        recovered += len(orphaned)
+                if cursor == 0:
+                    break
+            
+            # Step 3: backfill summaries for every indexed entry
+            backfilled = 0
+            total_count = history_redis.zcard(metadata_key)
+            for start in range(0, total_count, 500):
+                timestamps = history_redis.zrange(metadata_key, start, start + 499)
+                existing = history_redis.hmget(summary_key, timestamps)
+                missing = [ts for ts, summary in zip(timestamps, existing) if not summary]
+                if not missing:
+                    continue
+                with history_redis.pipeline() as pipe:
+                    for timestamp in missing:
+                        pipe.get(history_key_manager.get_history_item_key(timestamp))
+                    results = pipe.execute()
+                mapping = {}
+                for timestamp, item_data in zip(missing, results):
+                    if item_data:
+                        try:
+                            mapping[timestamp] = json.dumps(build_history_summary(json.loads(item_data)))
+                        except json.JSONDecodeError as e:
+                            logger.error(f"Error parsing history item {timestamp}: {str(e)}")
+                if mapping:
+                    history_redis.hset(summary_key, mapping=mapping)
+                    backfilled += len(mapping)
+            
+            # Step 4: build the secondary indexes from the summaries
+            indexed = 0
+            cursor = 0
+            while True:
+                cursor, summaries = history_redis.hscan(summary_key, cursor=cursor, count=500)
+                if summaries:
+                    with history_redis.pipeline(transaction=False) as pipe:
+                        for timestamp, summary_data in summaries.items():
+                            try:
+                                queue_history_index_write(pipe, timestamp, json.loads(summary_data))
+                                indexed += 1
+                            except json.JSONDecodeError as e:
+                                logger.error(f"Error parsing history summary {timestamp}: {str(e)}")
+                        pipe.execute()
+                if cursor == 0:
+                    break
+            
+            history_redis.set(version_key, HISTORY_INDEX_VERSION)
+            logger.info(f"History index migrated to version {HISTORY_INDEX_VERSION}: "
+                        f"{rewritten} members rewritten, {recovered} orphaned items recovered, "
+                        f"{backfilled} summaries backfilled, {indexed} items indexed")
+        finally:
+            history_redis.delete(lock_key)
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error migrating history index: {str(e)}")
+        return False
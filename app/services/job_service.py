@@ -0,0 +1,158 @@
+"""
+Parse job service
+Redis-backed queue for upload parsing. The upload route saves the file to TEMP_DIR,
+enqueues a job and returns immediately; a pool of worker threads (in each web worker,
+or a dedicated process via run_worker.py sharing the same TEMP_DIR) extracts the file,
+runs the AI parse and reports progress to the uploading user over the /events SSE stream.
+"""
+import os
+import json
+import time
+import shutil
+import secrets
+import logging
+import threading
+
+from ..config import temp_dir, PARSE_WORKER_THREADS, PARSE_JOB_TTL
+from ..utils.redis_client import redis_client
+from .sse_service import publish_sse_event
+from .upload_service import extract_email_data, parse_email_data
+
+logger = logging.getLogger(__name__)
+
+PARSE_JOB_QUEUE_KEY = 'parse_jobs:queue'
+PARSE_JOB_PREFIX = 'parse_job:'
+PARSE_JOB_EVENT = 'parse-job'
+
+def get_job_key(job_id):
+    return f"{PARSE_JOB_PREFIX}{job_id}"
+
+def get_job_file_path(job_id):
+    """Where a job's upload waits in TEMP_DIR; derived from the id so it can be removed after the record expires"""
+    return os.path.join(temp_dir, f"parse_job_{job_id}")
+
+def _remove_job_file(job_id):
+    try:
+        os.unlink(get_job_file_path(job_id))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove upload of parse job {job_id}: {str(e)}")
+
+def enqueue_parse_job(stream, filename, username, force_reparse=False):
+    """
+    Copy the upload stream to TEMP_DIR in chunks, create the job record and queue it;
+    returns the job id. Only the file's path goes through Redis.
+    """
+    job_id = secrets.token_hex(16)
+    job_key = get_job_key(job_id)
+    file_path = get_job_file_path(job_id)
+    with open(file_path, 'wb') as f:
+        shutil.copyfileobj(stream, f, 64 * 1024)
+    try:
+        with redis_client.pipeline() as pipe:
+            pipe.hset(job_key, mapping={
+                'status': 'queued',
+                'progress': 0,
+                'message': 'Waiting for a parse worker',
+                'filename': filename,
+                'username': username or '',
+                'force_reparse': '1' if force_reparse else '0',
+                'created_at': time.time(),
+                'file_path': file_path
+            })
+            pipe.expire(job_key, PARSE_JOB_TTL)
+            pipe.lpush(PARSE_JOB_QUEUE_KEY, job_id)
+            pipe.execute()
+    except Exception:
+        _remove_job_file(job_id)
+        raise
+    _publish_job_update(job_id, username, 'queued', 0, 'Waiting for a parse worker')
+    logger.info(f"Queued parse job {job_id} for {filename} (user {username})")
+    return job_id
+
+def get_parse_job(job_id):
+    """Return the public view of a job (without the file path), or None if unknown/expired"""
+    job = redis_client.hgetall(get_job_key(job_id))
+    if not job:
+        return None
+    job.pop('file_path', None)
+    job['progress'] = int(job.get('progress', 0))
+    if job.get('result'):
+        job['result'] = json.loads(job['result'])
+    return job
+
+def _publish_job_update(job_id, username, status, progress, message, error=None):
+    if not username:
+        # SSE channels are per user; without one the client relies on polling /jobs/<id>
+        return
+    publish_sse_event(username, PARSE_JOB_EVENT, {
+        'job_id': job_id,
+        'status': status,
+        'progress': progress,
+        'message': message,
+        'error': error
+    })
+
+def _update_job(job_id, username, status, progress, message, **fields):
+    redis_client.hset(get_job_key(job_id), mapping=dict(fields, status=status, progress=progress, message=message))
+    _publish_job_update(job_id, username, status, progress, message, fields.get('error'))
+
+def process_parse_job(job_id):
+    """Run one queued parse job: extract the file, parse it with AI, store the result"""
+    job_key = get_job_key(job_id)
+    with redis_client.pipeline() as pipe:
+        pipe.hgetall(job_key)
+        # Removing the path claims the job, so only one worker processes it
+        pipe.hdel(job_key, 'file_path')
+        job, claimed = pipe.execute()
+    if not job or not claimed:
+        logger.warning(f"Parse job {job_id} expired or already taken")
+        if not job:
+            _remove_job_file(job_id)
+        return
+    
+    username = job.get('username')
+    filename = job.get('filename', '')
+    try:
+        _update_job(job_id, username, 'processing', 10, 'Reading file')
+        email_data = extract_email_data(job['file_path'], filename)
+        # The upload isn't needed once extracted; free TEMP_DIR before the AI call
+        _remove_job_file(job_id)
+        
+        _update_job(job_id, username, 'processing', 40, 'Extracting services with AI')
+        services_data = parse_email_data(email_data, force_reparse=job.get('force_reparse') == '1')
+        
+        if services_data.get('error'):
+            _update_job(job_id, username, 'failed', 100, 'Processing failed', error=services_data['error'])
+        else:
+            _update_job(job_id, username, 'completed', 100, 'Processing complete',
+                        result=json.dumps(services_data), completed_at=time.time())
+    except Exception as e:
+        logger.error(f"Error processing parse job {job_id}: {str(e)}")
+        _update_job(job_id, username, 'failed', 100, 'Processing failed', error=f'Error processing email: {str(e)}')
+    finally:
+        _remove_job_file(job_id)
+
+def parse_worker_loop():
+    """Block on the job queue and process jobs one at a time"""
+    while True:
+        try:
+            # Short BRPOP timeout stays below the Redis socket timeout
+            item = redis_client.brpop(PARSE_JOB_QUEUE_KEY, timeout=2)
+            if item:
+                process_parse_job(item[1])
+        except Exception as e:
+            logger.error(f"Parse worker error: {str(e)}")
+            time.sleep(1)
+
+def start_parse_workers(count=PARSE_WORKER_THREADS):
+    """Start the background parse worker threads (count=0 leaves parsing to run_worker.py)"""
+    threads = []
+    for _ in range(count):
+        worker_thread = threading.Thread(target=parse_worker_loop, daemon=True)
+        worker_thread.start()
+        threads.append(worker_thread)
+    if count:
+        logger.info(f"Started {count} parse worker threads")
+    return threads
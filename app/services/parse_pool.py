@@ -0,0 +1,194 @@
+"""
+Parse pool service
+Runs FileProcessor.process_file in a small pool of separate processes, so CPU-bound
+.msg and HTML parsing never blocks the gevent event loop (and every SSE stream) of
+the web worker. Each parse has a timeout and each child a memory limit; a child that
+times out is killed and replaced, and children are recycled after a number of tasks.
+"""
+import os
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+
+from ..config import (
+    temp_dir, PARSE_POOL_WORKERS, PARSE_POOL_TIMEOUT, PARSE_POOL_MEMORY_LIMIT_MB, PARSE_POOL_MAX_TASKS_PER_CHILD,
+    UPLOAD_SPOOL_MAX_MEMORY
+)
+
+logger = logging.getLogger(__name__)
+
+# spawn, not fork: a forked child would inherit the gevent hub, Redis sockets and locks
+_mp_context = multiprocessing.get_context('spawn')
+
+class ParseTimeoutError(Exception):
+    """Raised when a file takes longer than PARSE_POOL_TIMEOUT seconds to parse"""
+
+def _worker_main(conn, memory_limit_mb):
+    """Child process loop: receive (source, filename), send back ('ok', data) or ('error', message)"""
+    if memory_limit_mb:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            logger.warning(f"Could not set parse worker memory limit: {str(e)}")
+
+    from .email_processor import FileProcessor
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        source, filename = job
+        try:
+            conn.send(('ok', FileProcessor.process_file(source, filename)))
+        except MemoryError:
+            conn.send(('error', f'File needs more than {memory_limit_mb} MB to parse'))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+class _PoolWorker:
+    """One child process and the parent's end of its pipe"""
+    def __init__(self):
+        self.conn, child_conn = _mp_context.Pipe()
+        self.process = _mp_context.Process(target=_worker_main, args=(child_conn, PARSE_POOL_MEMORY_LIMIT_MB),
+                                           daemon=True, name='parse-pool-worker')
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def run(self, source, filename, timeout):
+        self.tasks += 1
+        self.conn.send((source, filename))
+        # Connection.poll goes through select, which gevent makes cooperative, so only
+        # this greenlet waits while the child parses
+        if not self.conn.poll(timeout):
+            raise ParseTimeoutError(f"Parsing {filename} took longer than {timeout}s")
+        status, payload = self.conn.recv()
+        if status != 'ok':
+            raise ValueError(payload)
+        return payload
+
+    def stop(self, kill=False):
+        try:
+            if not self.process.is_alive():
+                # Already gone (e.g. daemon children are reaped at interpreter exit)
+                self.process.join(timeout=1)
+            elif kill:
+                self.process.kill()
+            else:
+                self.conn.send(None)
+            self.process.join(timeout=5)
+        except Exception as e:
+            logger.warning(f"Error stopping parse worker {self.process.pid}: {str(e)}")
+        finally:
+            self.conn.close()
+
+# Idle workers; the semaphore bounds concurrent parses to the pool size
+_idle_workers = []
+_idle_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, PARSE_POOL_WORKERS))
+_owner_pid = None
+
+def _checkout():
+    global _owner_pid
+    with _idle_lock:
+        if _owner_pid != os.getpid():
+            # Workers belong to the process that started them
+            _idle_workers.clear()
+            _owner_pid = os.getpid()
+        while _idle_workers:
+            worker = _idle_workers.pop()
+            if worker.process.is_alive():
+                return worker
+            worker.conn.close()
+    return _PoolWorker()
+
+def _checkin(worker):
+    if PARSE_POOL_MAX_TASKS_PER_CHILD and worker.tasks >= PARSE_POOL_MAX_TASKS_PER_CHILD:
+        # Recycle long-lived children so fragmented parser memory is returned
+        worker.stop()
+        return
+    with _idle_lock:
+        _idle_workers.append(worker)
+
+def _picklable_source(source):
+    """
+    What to send to the child for a source, without loading large files in the parent
+
+    Paths and bytes go as they are and small file objects as their bytes. A file with a
+    path on disk (an upload spooled to TEMP_DIR) is sent by path; any other large file
+    object is copied in chunks to a temp file. Returns (payload, copy_path) where
+    copy_path is that copy, which the caller removes.
+    """
+    if isinstance(source, (str, bytes, bytearray, os.PathLike)):
+        return source, None
+    path = getattr(source, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        source.flush()
+        return path, None
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    if size <= UPLOAD_SPOOL_MAX_MEMORY:
+        return source.read(), None
+    with tempfile.NamedTemporaryFile(dir=temp_dir, prefix='parse_', delete=False) as copy:
+        shutil.copyfileobj(source, copy, 64 * 1024)
+    source.seek(0)
+    return copy.name, copy.name
+
+def process_file_in_pool(source, filename, timeout=PARSE_POOL_TIMEOUT):
+    """
+    Run FileProcessor.process_file(source, filename) in a pool process
+
+    With PARSE_POOL_WORKERS=0 the file is parsed inline instead.
+
+    Raises:
+        ParseTimeoutError: if parsing took longer than timeout (the child is killed)
+        ValueError: if the child reported a parse error
+    """
+    if PARSE_POOL_WORKERS <= 0:
+        from .email_processor import FileProcessor
+        return FileProcessor.process_file(source, filename)
+
+    payload, copy_path = _picklable_source(source)
+    try:
+        with _slots:
+            worker = _checkout()
+            try:
+                result = worker.run(payload, filename, timeout)
+            except ParseTimeoutError:
+                logger.warning(f"Parse of {filename} timed out after {timeout}s; killing worker {worker.process.pid}")
+                worker.stop(kill=True)
+                raise
+            except (EOFError, OSError) as e:
+                # Child died mid-parse (e.g. killed by the OOM killer)
+                worker.stop(kill=True)
+                raise ValueError(f"Parse worker exited while parsing {filename}") from e
+            except Exception:
+                _checkin(worker)
+                raise
+            _checkin(worker)
+            return result
+    finally:
+        if copy_path:
+            try:
+                os.unlink(copy_path)
+            except OSError as e:
+                logger.warning(f"Could not remove parse copy {copy_path}: {str(e)}")
+
+def shutdown_parse_pool():
+    """Stop idle pool workers (busy ones exit when their parent does)"""
+    with _idle_lock:
+        workers = list(_idle_workers)
+        _idle_workers.clear()
+    for worker in workers:
+        worker.stop()
+
+atexit.register(shutdown_parse_pool)
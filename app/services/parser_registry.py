@@ -0,0 +1,164 @@
+"""
+Parser registry service
+This file contains the registry of file parser plugins used by FileProcessor. Each
+plugin declares its extensions and an optional content sniffer, so misnamed files are
+routed by their content without trial parsing, and parse latency is recorded per parser.
+"""
+import re
+import logging
+
+from ..utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+PARSER_STATS_KEY = 'parser_stats'
+PARSER_LATENCY_PREFIX = 'parser_latencies:'
+PARSER_LATENCY_SAMPLES = 200
+SNIFF_BYTES = 4096
+
+# Compound File Binary (OLE2) signature used by Outlook .msg files
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+UTF8_BOM = b'\xef\xbb\xbf'
+HTML_START_RE = re.compile(rb'^\s*(?:<\?xml[^>]*>\s*)?(?:<!--.*?-->\s*)*<(?:!doctype\s+html|html|head|body)\b',
+                           re.IGNORECASE | re.DOTALL)
+HEADER_LINE_RE = re.compile(rb'^([A-Za-z][A-Za-z0-9-]*):')
+MIME_HEADER_NAMES = {
+    b'from', b'to', b'cc', b'subject', b'date', b'received', b'return-path', b'message-id',
+    b'mime-version', b'content-type', b'reply-to', b'sender', b'delivered-to'
+}
+
+class ParserPlugin:
+    """A file format FileProcessor can parse"""
+    def __init__(self, name, extensions, parse, sniff=None, available=None):
+        self.name = name
+        self.extensions = [ext.lower() for ext in extensions]
+        self.parse = parse
+        self.sniff = sniff
+        self.available = available
+
+    def is_available(self):
+        """False when an optional dependency of the parser is not installed"""
+        return self.available() if self.available else True
+
+_plugins = []
+
+def register_parser(name, extensions, parse, sniff=None, available=None):
+    """
+    Register (or replace) a parser plugin
+
+    parse(source) returns email-like data; sniff(head) gets the first SNIFF_BYTES of the
+    file and returns True if the content is unmistakably this format. Sniffers are tried
+    in registration order.
+    """
+    plugin = ParserPlugin(name, extensions, parse, sniff, available)
+    _plugins[:] = [existing for existing in _plugins if existing.name != name]
+    _plugins.append(plugin)
+    return plugin
+
+def get_parsers():
+    """Registered parsers whose dependencies are installed"""
+    return [plugin for plugin in _plugins if plugin.is_available()]
+
+def parser_for_extension(ext):
+    ext = (ext or '').lower()
+    return next((plugin for plugin in get_parsers() if ext in plugin.extensions), None)
+
+def sniff_parser(head):
+    """Return the parser whose sniffer recognizes the content, or None"""
+    for plugin in get_parsers():
+        if plugin.sniff is None:
+            continue
+        try:
+            if plugin.sniff(head):
+                return plugin
+        except Exception as e:
+            logger.warning(f"Sniffer for {plugin.name} failed: {str(e)}")
+    return None
+
+def read_head(source, size=SNIFF_BYTES):
+    """First bytes of a path, bytes or file-like source; file objects are rewound"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:size])
+    if hasattr(source, 'read'):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        head = source.read(size)
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return head
+    with open(source, 'rb') as f:
+        return f.read(size)
+
+# --- Sniffers ---
+def is_ole_file(head):
+    return head.startswith(OLE_MAGIC)
+
+def is_pdf_file(head):
+    # The header may follow a few bytes of junk, but must be within the first 1 KB
+    return b'%PDF-' in head[:1024]
+
+def is_icalendar(head):
+    return head.lstrip(UTF8_BOM).lstrip().upper().startswith(b'BEGIN:VCALENDAR')
+
+def is_html(head):
+    return bool(HTML_START_RE.match(head.lstrip(UTF8_BOM)))
+
+def is_mime_message(head):
+    """A block of RFC 5322 header lines with at least two well-known headers"""
+    lines = head.lstrip(UTF8_BOM).splitlines()
+    if lines and lines[0].startswith(b'From '):
+        # mbox separator line
+        lines = lines[1:]
+    known = 0
+    for line in lines[:100]:
+        if not line.strip():
+            break
+        if line[:1] in (b' ', b'\t'):
+            continue
+        match = HEADER_LINE_RE.match(line)
+        if not match:
+            return False
+        if match.group(1).lower() in MIME_HEADER_NAMES:
+            known += 1
+    return known >= 2
+
+# --- Metrics ---
+def record_parse(name, elapsed, success=True, rerouted=False):
+    """Record one parse: count, errors, content-based reroutes and latency samples"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(PARSER_STATS_KEY, f"{name}:count", 1)
+        if not success:
+            pipe.hincrby(PARSER_STATS_KEY, f"{name}:errors", 1)
+        if rerouted:
+            pipe.hincrby(PARSER_STATS_KEY, f"{name}:rerouted", 1)
+        pipe.hincrbyfloat(PARSER_STATS_KEY, f"{name}:total_ms", elapsed * 1000)
+        pipe.lpush(f"{PARSER_LATENCY_PREFIX}{name}", round(elapsed * 1000, 1))
+        pipe.ltrim(f"{PARSER_LATENCY_PREFIX}{name}", 0, PARSER_LATENCY_SAMPLES - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error recording parser metrics: {str(e)}")
+
+def get_parser_metrics():
+    """Per parser: requests, errors, reroutes, average and p50/p95 latency (ms)"""
+    try:
+        stats = redis_client.hgetall(PARSER_STATS_KEY)
+        metrics = {}
+        for plugin in _plugins:
+            count = int(stats.get(f"{plugin.name}:count", 0))
+            samples = sorted(float(value) for value in
+                             redis_client.lrange(f"{PARSER_LATENCY_PREFIX}{plugin.name}", 0, -1))
+            metrics[plugin.name] = {
+                'extensions': plugin.extensions,
+                'available': plugin.is_available(),
+                'count': count,
+                'errors': int(stats.get(f"{plugin.name}:errors", 0)),
+                'rerouted': int(stats.get(f"{plugin.name}:rerouted", 0)),
+                'avg_ms': round(float(stats.get(f"{plugin.name}:total_ms", 0)) / count, 1) if count else None,
+                'p50_ms': samples[int(0.5 * (len(samples) - 1))] if samples else None,
+                'p95_ms': samples[int(0.95 * (len(samples) - 1))] if samples else None
+            }
+        return metrics
+    except Exception as e:
+        logger.error(f"Error reading parser metrics: {str(e)}")
+        return {}
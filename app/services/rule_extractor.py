@@ -0,0 +1,330 @@
+"""
+Rule-based extractor
+This file contains the deterministic fast path for structured change notices:
+service tables (HTML or pipe/tab separated text) and "Service: date time-range"
+lines are parsed with regex grammars, so templated vendor notices skip Gemini.
+"""
+import re
+import logging
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+
+from ..config import RULE_EXTRACTOR_ENABLED, RULE_EXTRACTOR_MIN_CONFIDENCE
+from .email_processor import extract_date_from_subject
+from ..utils.validators import MONTHS, normalize_time, normalize_services
+
+logger = logging.getLogger(__name__)
+
+MONTH_NAME = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?'
+
+# Date grammar: ISO, numeric (month first, as extract_date_from_subject), and month names
+# with an optional day range ("Dec 20-24", "20 December 2024", "Saturday, June 14")
+ISO_DATE_RE = re.compile(r'\b\d{4}-\d{1,2}-\d{1,2}\b')
+NUMERIC_DATE_RE = re.compile(r'\b\d{1,2}[/.-]\d{1,2}[/.-]\d{4}\b')
+MONTH_FIRST_RE = re.compile(
+    rf'\b(?P<month>{MONTH_NAME})\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?'
+    rf'(?:\s*[-–]\s*(?P<day2>\d{{1,2}})(?:st|nd|rd|th)?)?(?:,?\s+(?P<year>\d{{4}}))?\b', re.IGNORECASE)
+DAY_FIRST_RE = re.compile(
+    rf'\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<month>{MONTH_NAME})(?:,?\s+(?P<year>\d{{4}}))?\b', re.IGNORECASE)
+
+# Time grammar: 22:00, 14.00, 2:30pm, 2 PM, 1400hrs
+TIME_RE = re.compile(
+    r'\b(?:(?P<h1>\d{1,2})[:.](?P<m1>[0-5]\d)\s*(?P<ap1>[ap]\.?m\.?)?'
+    r'|(?P<h2>\d{1,2})\s*(?P<ap2>[ap]\.?m\.?)'
+    r'|(?P<h3>[01]\d|2[0-3])(?P<m3>[0-5]\d)\s*(?:hrs|h)\b)', re.IGNORECASE)
+
+# Header cell -> service field
+HEADER_FIELDS = [
+    ('start_date', re.compile(r'start\s*date|from\s*date|begin\s*date')),
+    ('end_date', re.compile(r'end\s*date|to\s*date|finish\s*date')),
+    ('start_time', re.compile(r'start(\s*time)?$|from(\s*time)?$|begin')),
+    ('end_time', re.compile(r'end(\s*time)?$|to(\s*time)?$|finish|until')),
+    ('window', re.compile(r'window|schedule|date|time|when|duration')),
+    ('priority', re.compile(r'priority|severity|risk')),
+    ('comments', re.compile(r'description|comment|detail|impact|note|activity|summary|reason')),
+    ('name', re.compile(r'service|system|application|component|item|name|change|title|host|environment')),
+]
+TEMPORAL_FIELDS = ('start_date', 'end_date', 'start_time', 'end_time', 'window')
+
+# "Service name: <date/time ...>" or "Service name - <date/time ...>"
+LINE_RE = re.compile(r'^\s*(?:[-*•]\s*)?(?P<name>[A-Za-z][^:|\t]{1,80}?)\s*(?::|\s[-–]\s)\s*(?P<rest>.+)$')
+
+# Line labels that introduce prose or email headers rather than a service
+GENERIC_LINE_LABELS = {
+    'note', 'notes', 'nb', 'ps', 'fyi', 'info', 'important', 'attention', 'warning', 'reminder',
+    'update', 'status', 'meeting', 'call', 'event', 'deadline', 'date', 'time', 'when', 'where',
+    'schedule', 'window', 'duration', 'start', 'end', 'from', 'to', 'sent', 'cc', 'subject',
+    're', 'fw', 'fwd', 'reason', 'impact', 'description', 'details', 'summary', 'comments',
+}
+
+class _TableCollector(HTMLParser):
+    """Collect the text of every table cell, grouped by table and row"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables = []
+        self._stack = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._stack.append([])
+        elif tag == 'tr' and self._stack:
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th') and self._cell is not None:
+            self._row.append(' '.join(''.join(self._cell).split()))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            if any(self._row):
+                self._stack[-1].append(self._row)
+            self._row = None
+        elif tag == 'table' and self._stack:
+            self.tables.append(self._stack.pop())
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+def find_html_tables(html):
+    """Return tables as lists of rows of cell text"""
+    collector = _TableCollector()
+    try:
+        collector.feed(html)
+        collector.close()
+    except Exception as e:
+        logger.debug(f"HTML table scan failed: {str(e)}")
+    return collector.tables
+
+def find_text_tables(text):
+    """Return runs of pipe- or tab-separated lines (3+ columns) as tables"""
+    tables = []
+    current = []
+    for line in (text or '').splitlines():
+        separator = '|' if line.count('|') >= 2 else '\t' if line.count('\t') >= 2 else None
+        cells = [cell.strip() for cell in line.strip().strip('|').split(separator)] if separator else []
+        # Skip markdown-style rule lines such as |---|---|
+        if cells and all(re.fullmatch(r':?-{2,}:?', cell) for cell in cells if cell):
+            continue
+        if len(cells) >= 3:
+            current.append(cells)
+        elif current:
+            tables.append(current)
+            current = []
+    if current:
+        tables.append(current)
+    return tables
+
+def _date_str(year, month, day):
+    try:
+        return datetime(int(year), int(month), int(day)).strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def find_dates(text, default_year):
+    """Return (dates in order as YYYY-MM-DD, character spans of the date matches)"""
+    found = []
+    for pattern in (ISO_DATE_RE, NUMERIC_DATE_RE):
+        for match in pattern.finditer(text):
+            # Numeric dates are month first, as in extract_date_from_subject; invalid ones
+            # (2024-13-45) become None and are dropped below
+            parts = re.split(r'[/.-]', match.group(0))
+            if pattern is ISO_DATE_RE:
+                year, month, day = parts
+            else:
+                month, day, year = parts
+            found.append((match.start(), match.end(), [_date_str(year, month, day)]))
+    for match in MONTH_FIRST_RE.finditer(text):
+        month = MONTHS.get(match.group('month')[:3].lower())
+        year = match.group('year') or default_year
+        values = [_date_str(year, month, match.group('day'))]
+        if match.group('day2'):
+            values.append(_date_str(year, month, match.group('day2')))
+        found.append((match.start(), match.end(), values))
+    for match in DAY_FIRST_RE.finditer(text):
+        month = MONTHS.get(match.group('month')[:3].lower())
+        found.append((match.start(), match.end(),
+                      [_date_str(match.group('year') or default_year, month, match.group('day'))]))
+
+    # Keep the longest of overlapping matches and drop invalid dates
+    dates = []
+    spans = []
+    last_end = -1
+    for start, end, values in sorted(found, key=lambda item: (item[0], -item[1])):
+        if start < last_end:
+            continue
+        last_end = end
+        spans.append((start, end))
+        dates.extend(value for value in values if value)
+    return dates, spans
+
+def find_times(text, date_spans=()):
+    """Return the times in text, in order, as 24-hour HH:MM (date spans are ignored)"""
+    times = []
+    for match in TIME_RE.finditer(text):
+        if any(start <= match.start() < end for start, end in date_spans):
+            continue
+        value, error = normalize_time(match.group(0))
+        if not error:
+            times.append(value)
+    return times
+
+def parse_priority(text):
+    text = (text or '').lower()
+    if re.search(r'high|critical|major|urgent|p1\b', text):
+        return 'high'
+    if re.search(r'low|minor|p4\b', text):
+        return 'low'
+    return 'medium'
+
+def _map_header(row):
+    """
+    Map fields to header column indexes; None if the row doesn't look like a service
+    table header. Several columns can feed one field (e.g. "Date" and "Window").
+    """
+    columns = {}
+    for index, cell in enumerate(row):
+        label = cell.strip().lower()
+        for field, pattern in HEADER_FIELDS:
+            if pattern.search(label):
+                if field != 'name' or field not in columns:
+                    columns.setdefault(field, []).append(index)
+                break
+    if 'name' not in columns or not any(field in columns for field in TEMPORAL_FIELDS):
+        return None
+    return columns
+
+def build_service(name, window_text, default_year, start_text='', end_text='',
+                  priority_text='', comments=''):
+    """
+    Build a service row from its schedule text
+
+    window_text holds a whole range ("Dec 20 22:00 - 02:00"); start_text/end_text
+    come from separate start and end columns and take precedence.
+    """
+    window_dates, window_spans = find_dates(window_text, default_year)
+    window_times = find_times(window_text, window_spans)
+    start_dates, start_spans = find_dates(start_text, default_year)
+    start_times = find_times(start_text, start_spans)
+    end_dates, end_spans = find_dates(end_text, default_year)
+    end_times = find_times(end_text, end_spans)
+
+    start_date = (start_dates or window_dates or ['-'])[0]
+    end_date = (end_dates or window_dates[1:] or [start_date])[-1]
+    start_time = (start_times or window_times or ['-'])[0]
+    end_time = (end_times or window_times[1:] or ['-'])[0]
+
+    # Overnight window with no explicit end date ends the next day
+    if (not end_dates and len(window_dates) < 2 and start_date != '-'
+            and start_time != '-' and end_time != '-' and end_time < start_time):
+        end_date = (datetime.strptime(start_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    return {
+        'name': name.strip(),
+        'start_date': start_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'end_date': end_date,
+        'comments': comments.strip() or 'Scheduled maintenance',
+        'priority': parse_priority(priority_text)
+    }
+
+def _row_confidence(service):
+    """1 for a full window, 0.5 when the end time is missing, 0 without a name or start"""
+    if not service['name'] or (service['start_date'] == '-' and service['start_time'] == '-'):
+        return 0.0
+    return 1.0 if service['end_time'] != '-' else 0.5
+
+def extract_from_table(table, default_year):
+    """Return (services, confidence) for a table, or ([], 0) if it has no recognizable header"""
+    for header_index, row in enumerate(table[:3]):
+        columns = _map_header(row)
+        if columns:
+            break
+    else:
+        return [], 0.0
+
+    def cell(row, field):
+        return ' '.join(row[index] for index in columns.get(field, []) if index < len(row))
+
+    services = []
+    for row in table[header_index + 1:]:
+        if not any(row):
+            continue
+        services.append(build_service(
+            cell(row, 'name'), cell(row, 'window'), default_year,
+            start_text=f"{cell(row, 'start_date')} {cell(row, 'start_time')}",
+            end_text=f"{cell(row, 'end_date')} {cell(row, 'end_time')}",
+            priority_text=cell(row, 'priority'), comments=cell(row, 'comments')
+        ))
+
+    if not services:
+        return [], 0.0
+    scores = [_row_confidence(service) for service in services]
+    complete = [service for service, score in zip(services, scores) if score]
+    return complete, sum(scores) / len(services)
+
+def extract_from_lines(text, default_year):
+    """
+    Return (services, confidence) from "Name: date time-range" lines
+
+    A line counts only with a date and a full start-end time range, and not under
+    a generic label ("Note:", "Reminder:"), so prose lines don't pass as a template.
+    """
+    services = []
+    for line in (text or '').splitlines():
+        match = LINE_RE.match(line)
+        if not match or match.group('name').strip().lower() in GENERIC_LINE_LABELS:
+            continue
+        rest = match.group('rest')
+        dates, date_spans = find_dates(rest, default_year)
+        times = find_times(rest, date_spans)
+        # The value must start with the schedule, otherwise this is prose ("DNS: reboot on ...")
+        first = min([start for start, _ in date_spans] + [m.start() for m in TIME_RE.finditer(rest)] or [len(rest)])
+        if not dates or len(times) < 2 or first > 12:
+            continue
+        services.append(build_service(match.group('name'), rest, default_year))
+    # A single matching line is as likely to be prose as a template
+    return services, (1.0 if len(services) >= 2 else 0.5 if services else 0.0)
+
+def extract_with_rules(email_data):
+    """
+    Parse a structured notice without the LLM
+
+    Returns a document in the same shape as the AI parser (with processing_method
+    'Rules' and a confidence score), or None when no template matched with at least
+    RULE_EXTRACTOR_MIN_CONFIDENCE.
+    """
+    if not RULE_EXTRACTOR_ENABLED:
+        return None
+
+    subject = email_data.get('subject') or ''
+    body = email_data.get('body') or ''
+    doc_date = extract_date_from_subject(subject) or email_data.get('date') or datetime.now().strftime('%Y-%m-%d')
+    default_year = doc_date[:4] if re.match(r'^\d{4}', doc_date) else datetime.now().year
+
+    candidates = []
+    if email_data.get('body_html'):
+        candidates.extend(extract_from_table(table, default_year) for table in find_html_tables(email_data['body_html']))
+    candidates.extend(extract_from_table(table, default_year) for table in find_text_tables(body))
+    candidates.append(extract_from_lines(body, default_year))
+
+    candidates = [c for c in candidates if c[0] and c[1] >= RULE_EXTRACTOR_MIN_CONFIDENCE]
+    if not candidates:
+        return None
+    services, confidence = max(candidates, key=lambda c: (c[1], len(c[0])))
+
+    services, _ = normalize_services(services)
+    logger.info(f"Rule-based extraction matched {len(services)} services (confidence {confidence:.2f})")
+    return {
+        'date': doc_date,
+        'services': sorted(services, key=lambda x: x['name']),
+        'confidence': round(confidence, 2),
+        'original_subject': subject,
+        'original_body': body
+    }
@@ -197,12 +197,11 @@ def create_search_index():
             page_size = 500
             for start in range(0, total_count, page_size):
                 end = min(start + page_size - 1, total_count - 1)
-                page = history_redis.zrevrange(metadata_key, start, end, withscores=True)
-                if not page:
+                timestamps = history_redis.zrevrange(metadata_key, start, end)
+                if not timestamps:
                     continue
 
                 # OPTIMIZATION: Batch fetch all items for this page
-                timestamps = [score for metadata_json, score in page]
                 from ..routes.history import get_history_items_batch
                 items = get_history_items_batch(timestamps)
                 
@@ -294,8 +293,12 @@ def create_search_index():
             except Exception as e:
                 logger.warning(f"Could not clear Redis search index busy flag: {str(e)}")
 
-def search_history_redis_optimized(search_term):
-    """Hybrid search: Redis filtering + intelligent scoring with failed search cache"""
+def search_history_redis_optimized(search_term, summary=False):
+    """Hybrid search: Redis filtering + intelligent scoring with failed search cache
+    
+    With summary=True, candidates are scored and returned as list summaries
+    instead of full history snapshots.
+    """
     try:
         if not history_redis or not history_key_manager:
             logger.error("History Redis client not available")
@@ -331,7 +334,7 @@ def search_history_redis_optimized(search_term):
         
         if not all_matches:
             # Try Redis-based partial matching (O(k) instead of O(n))
-            partial_results = search_history_redis_partial(search_lower)
+            partial_results = search_history_redis_partial(search_lower, summary=summary)
             return partial_results
         
         # NEW: Define limits for exact matches (mirroring partial path)
@@ -343,8 +346,11 @@ def search_history_redis_optimized(search_term):
         
         # Step 2: OPTIMIZATION - Batch fetch all matching entries, then apply scoring
         # Import here to avoid circular dependency
-        from ..routes.history import get_history_items_batch
-        entries = get_history_items_batch(sorted_matches)
+        from ..routes.history import get_history_items_batch, get_history_summaries_batch
+        if summary:
+            entries = get_history_summaries_batch(sorted_matches)
+        else:
+            entries = get_history_items_batch(sorted_matches)
         
         matching_entries = []
         for entry in entries:
@@ -380,6 +386,9 @@ def apply_search_scoring(entry, search_lower):
     last_edited_by = ''
     if entry.get('data') and entry['data'].get('last_edited_by'):
         last_edited_by = entry['data']['last_edited_by'].lower()
+    elif entry.get('last_edited_by'):
+        # History list summaries carry the editor at the top level
+        last_edited_by = entry['last_edited_by'].lower()
     
     # Define search field configurations
     search_fields = [
@@ -483,7 +492,7 @@ def apply_search_scoring(entry, search_lower):
     
     return None
 
-def search_history_redis_partial(search_lower):
+def search_history_redis_partial(search_lower, summary=False):
     """Redis-based partial matching for when exact matches fail (title/date/editor) using SCAN."""
     try:
         if not history_redis or not history_key_manager:
@@ -498,6 +507,8 @@ def search_history_redis_partial(search_lower):
 
         # Check partial search cache
         partial_cache_key = f'{history_key_manager.history_prefix}:cache:partial:{search_lower}'
+        if summary:
+            partial_cache_key = f'{history_key_manager.history_prefix}:cache:partial:summary:{search_lower}'
         cached_result = history_redis.get(partial_cache_key)
         if cached_result:
             logger.debug(f"Returning cached partial search result for: {search_lower}")
@@ -559,8 +570,11 @@ def search_history_redis_partial(search_lower):
         sorted_matches = sorted(list(all_matches), key=lambda ts: float(ts), reverse=True)[:PROCESS_BUFFER]
 
         # OPTIMIZATION: Batch fetch all matching entries
-        from ..routes.history import get_history_items_batch
-        entries = get_history_items_batch(sorted_matches)
+        from ..routes.history import get_history_items_batch, get_history_summaries_batch
+        if summary:
+            entries = get_history_summaries_batch(sorted_matches)
+        else:
+            entries = get_history_items_batch(sorted_matches)
         
         matching_entries = []
         for entry in entries:
@@ -0,0 +1,204 @@
+"""
+Text extractor service
+This file contains streaming, size-bounded text extraction for HTML and MIME (.eml)
+content, so multi-megabyte notices with embedded images are never parsed whole.
+"""
+import re
+import codecs
+from html.parser import HTMLParser
+from email import policy
+from email.parser import BytesFeedParser
+
+from ..config import EXTRACT_MAX_TEXT_CHARS, EXTRACT_MAX_SCAN_BYTES
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Elements whose content is never visible text
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template'}
+# Elements that start a new line, so paragraphs and table rows stay apart
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'tr', 'li', 'ul', 'ol', 'table', 'thead', 'tbody', 'section', 'article',
+    'header', 'footer', 'blockquote', 'pre', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'
+}
+CELL_TAGS = {'td', 'th'}
+
+WHITESPACE_RE = re.compile(r'[ \t\r\f\v\n]+')
+BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n+')
+LINE_SPACE_RE = re.compile(r'[ ]*([\n\t])[ ]*')
+
+def iter_chunks(source, max_bytes=None):
+    """Yield the content of a path, bytes or file-like source in chunks, up to max_bytes"""
+    remaining = max_bytes if max_bytes else float('inf')
+    if isinstance(source, (bytes, bytearray)):
+        data = memoryview(source)
+        for start in range(0, min(len(data), remaining), READ_CHUNK_SIZE):
+            yield bytes(data[start:min(start + READ_CHUNK_SIZE, remaining)])
+        return
+
+    handle = source if hasattr(source, 'read') else open(source, 'rb')
+    try:
+        if handle is source and hasattr(source, 'seek'):
+            source.seek(0)
+        while remaining > 0:
+            chunk = handle.read(int(min(READ_CHUNK_SIZE, remaining)))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        if handle is not source:
+            handle.close()
+
+def read_text(source, max_chars=EXTRACT_MAX_TEXT_CHARS):
+    """Decode a source as UTF-8, stopping after max_chars characters"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    parts = []
+    length = 0
+    for chunk in iter_chunks(source, EXTRACT_MAX_SCAN_BYTES):
+        text = decoder.decode(chunk)
+        parts.append(text)
+        length += len(text)
+        if length >= max_chars:
+            break
+    return ''.join(parts)[:max_chars]
+
+class HTMLTextExtractor(HTMLParser):
+    """Incremental HTML to text: drops script/style, keeps the title and table cells apart"""
+    def __init__(self, max_chars=EXTRACT_MAX_TEXT_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.title_parts = []
+        self.in_title = False
+        self.skip_depth = 0
+        self.full = False
+
+    def _append(self, text):
+        if self.full or not text:
+            return
+        if text == '\n' and (not self.parts or self.parts[-1].endswith('\n')):
+            # Nested blocks (table > tr) would otherwise split table rows with blank lines
+            return
+        if self.length + len(text) >= self.max_chars:
+            text = text[:self.max_chars - self.length]
+            self.full = True
+        self.parts.append(text)
+        self.length += len(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag == 'title':
+            self.in_title = True
+        elif tag in BLOCK_TAGS:
+            self._append('\n')
+        elif tag in CELL_TAGS:
+            self._append('\t')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in ('br', 'hr'):
+            self._append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == 'title':
+            self.in_title = False
+        elif tag in BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.in_title:
+            self.title_parts.append(data)
+            return
+        text = WHITESPACE_RE.sub(' ', data)
+        if text.strip():
+            self._append(text)
+
+    @property
+    def title(self):
+        return WHITESPACE_RE.sub(' ', ''.join(self.title_parts)).strip()
+
+    @property
+    def text(self):
+        text = LINE_SPACE_RE.sub(r'\1', ''.join(self.parts))
+        # A leading cell separator on each row would add an empty first column
+        text = re.sub(r'\n\t', '\n', text)
+        return BLANK_LINES_RE.sub('\n\n', text).strip()
+
+def extract_html(source, max_chars=EXTRACT_MAX_TEXT_CHARS):
+    """
+    Stream an HTML source through HTMLTextExtractor
+
+    Reading stops once max_chars of text were collected or EXTRACT_MAX_SCAN_BYTES were read.
+    Returns (title, text, html) where html is the markup that was read.
+    """
+    extractor = HTMLTextExtractor(max_chars)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    html_parts = []
+    for chunk in iter_chunks(source, EXTRACT_MAX_SCAN_BYTES):
+        markup = decoder.decode(chunk)
+        html_parts.append(markup)
+        extractor.feed(markup)
+        if extractor.full:
+            break
+    extractor.close()
+    return extractor.title, extractor.text, ''.join(html_parts)
+
+def html_to_text(html, max_chars=EXTRACT_MAX_TEXT_CHARS):
+    """Visible text of an HTML string"""
+    extractor = HTMLTextExtractor(max_chars)
+    extractor.feed(html or '')
+    extractor.close()
+    return extractor.text
+
+def _part_text(part, max_chars):
+    try:
+        content = part.get_content()
+    except (LookupError, ValueError):
+        # Unknown charset or broken transfer encoding
+        payload = part.get_payload(decode=True) or b''
+        content = payload.decode('utf-8', errors='ignore')
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='ignore')
+    return content[:max_chars]
+
+def extract_mime(source, max_chars=EXTRACT_MAX_TEXT_CHARS):
+    """
+    Extract headers and the first text/plain and text/html parts of a MIME message
+
+    At most EXTRACT_MAX_SCAN_BYTES of the message are parsed; notices put their text
+    before inline images and attachments, so only trailing binary parts are dropped.
+    Parts are walked lazily and the walk stops once both bodies are found.
+    Returns a dict with subject, sender, body and body_html.
+    """
+    parser = BytesFeedParser(policy=policy.default)
+    for chunk in iter_chunks(source, EXTRACT_MAX_SCAN_BYTES):
+        parser.feed(chunk)
+    msg = parser.close()
+
+    body = ''
+    body_html = ''
+    for part in msg.walk():
+        if part.is_multipart() or part.is_attachment():
+            continue
+        content_type = part.get_content_type()
+        if content_type == 'text/plain' and not body:
+            body = _part_text(part, max_chars)
+        elif content_type == 'text/html' and not body_html:
+            body_html = _part_text(part, EXTRACT_MAX_SCAN_BYTES)
+        if body and body_html:
+            break
+
+    if not body and body_html:
+        body = html_to_text(body_html, max_chars)
+
+    return {
+        'subject': str(msg.get('subject', '') or ''),
+        'sender': str(msg.get('from', '') or ''),
+        'body': body,
+        'body_html': body_html
+    }
@@ -0,0 +1,212 @@
+"""
+Upload service
+This file contains the upload parsing pipeline shared by the synchronous upload
+route, the background parse job workers and batch uploads
+"""
+import io
+import os
+import time
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from calendar import month_name
+
+from ..config import (
+    temp_dir, BATCH_EXTRACT_WORKERS, AI_MAX_CONCURRENT_REQUESTS, UPLOAD_SPOOL_MAX_MEMORY, TEMP_FILE_MAX_AGE
+)
+from .email_processor import FileProcessor
+from .parse_pool import process_file_in_pool
+from .ai_service import track_ai_request
+from .rule_extractor import extract_with_rules
+
+logger = logging.getLogger(__name__)
+
+def spool_upload(stream, chunk_size=64 * 1024):
+    """
+    Copy an upload stream into a buffer that stays in memory up to
+    UPLOAD_SPOOL_MAX_MEMORY bytes and only rolls over to a named file in TEMP_DIR
+    above that, so the parse pool can hand large uploads to its children by path.
+    The caller closes it, which also removes any rolled-over file.
+    """
+    spool = io.BytesIO()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(spool, io.BytesIO) and spool.tell() + len(chunk) > UPLOAD_SPOOL_MAX_MEMORY:
+            rolled = tempfile.NamedTemporaryFile(dir=temp_dir, prefix='upload_')
+            rolled.write(spool.getbuffer())
+            spool = rolled
+        spool.write(chunk)
+    spool.flush()
+    spool.seek(0)
+    return spool
+
+def extract_email_data(source, filename):
+    """
+    Extract email-like data (subject, sender, date, body) from an uploaded file
+    (path, bytes or file object); parsing runs in the parse process pool
+    """
+    return process_file_in_pool(source, filename)
+
+def cleanup_temp_dir(max_age=TEMP_FILE_MAX_AGE):
+    """
+    Remove files left in TEMP_DIR by killed workers
+    
+    Only files older than max_age are removed so uploads in flight in other
+    workers are not touched. Returns the number of files removed.
+    """
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        with os.scandir(temp_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove stale temp file {entry.name}: {str(e)}")
+    except OSError as e:
+        logger.warning(f"Could not scan temp dir {temp_dir}: {str(e)}")
+    if removed:
+        logger.info(f"Removed {removed} stale temp files from {temp_dir}")
+    return removed
+
+def build_header_title(date_str):
+    """Header title for a parsed document, e.g. 'March ChangeWeekend'"""
+    try:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        return f"{month_name[date_obj.month]} ChangeWeekend"
+    except (TypeError, ValueError):
+        return "Change Weekend"
+
+def parse_email_data(email_data, force_reparse=False):
+    """
+    Turn extracted email data into a change document
+    
+    Calendar invites already carry their service rows and templated notices are
+    parsed by the rule-based extractor; everything else (and any forced re-parse)
+    goes to AI processing. Returns the parsed document; on failure it carries an
+    'error' key.
+    """
+    if not force_reparse and email_data.get('calendar_services'):
+        logger.info(f"Using {len(email_data['calendar_services'])} services from calendar invite, skipping AI")
+        return {
+            'date': email_data.get('date'),
+            'services': email_data['calendar_services'],
+            'original_subject': email_data.get('subject', ''),
+            'original_body': email_data.get('body', ''),
+            'header_title': build_header_title(email_data.get('date')),
+            'processing_method': 'Calendar'
+        }
+    
+    if not force_reparse:
+        start_time = time.time()
+        try:
+            services_data = extract_with_rules(email_data)
+        except Exception as e:
+            # The rules are only a shortcut; anything they trip over goes to the AI
+            logger.warning(f"Rule-based extraction failed, falling back to AI: {str(e)}")
+            services_data = None
+        if services_data:
+            logger.info(f"Parsed with rules in {(time.time() - start_time) * 1000:.1f}ms, skipping AI")
+            services_data['header_title'] = build_header_title(services_data.get('date'))
+            services_data['processing_method'] = 'Rules'
+            return services_data
+    
+    # AI processing with performance tracking
+    import ai_processor
+    start_time = time.time()
+    services_data = ai_processor.process_email_content(email_data, bypass_cache=force_reparse)
+    response_time = time.time() - start_time
+    
+    # Track the request (cache hits never reached the API)
+    success = 'error' not in services_data or not services_data['error']
+    if not services_data.get('from_cache'):
+        track_ai_request(response_time, success)
+    
+    logger.info("Using AI processing for email content")
+    
+    if 'error' in services_data and services_data['error']:
+        return services_data
+    
+    services_data['header_title'] = build_header_title(services_data.get('date'))
+    services_data['processing_method'] = 'AI'
+    return services_data
+
+def process_batch(files, force_reparse=False):
+    """
+    Parse several uploaded notices and merge them into one document
+    
+    Files are extracted in a bounded thread pool, then parsed concurrently; the
+    number of in-flight Gemini calls is bounded by the shared AI request slots.
+    A failing file is reported in its status entry and does not fail the batch.
+    
+    Args:
+        files: List of (filename, source) tuples; source is bytes or a file object
+    
+    Returns:
+        (merged document or None if nothing parsed, list of per-file status dicts)
+    """
+    import ai_processor
+    
+    statuses = [{'filename': filename, 'status': 'pending'} for filename, _ in files]
+    
+    def extract(index):
+        filename, source = files[index]
+        if not FileProcessor.can_process_file(filename):
+            raise ValueError(f"Unsupported file format: {os.path.splitext(filename)[1] or filename}")
+        return extract_email_data(source, filename)
+    
+    def parse(index, email_data):
+        return parse_email_data(email_data, force_reparse=force_reparse)
+    
+    extracted = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_EXTRACT_WORKERS, len(files)))) as pool:
+        futures = {index: pool.submit(extract, index) for index in range(len(files))}
+        for index, future in futures.items():
+            try:
+                extracted[index] = future.result()
+            except Exception as e:
+                logger.warning(f"Batch upload: could not extract {files[index][0]}: {str(e)}")
+                statuses[index].update(status='error', error=f'Error reading file: {str(e)}')
+    
+    parsed = {}
+    if extracted:
+        with ThreadPoolExecutor(max_workers=max(1, min(AI_MAX_CONCURRENT_REQUESTS, len(extracted)))) as pool:
+            futures = {index: pool.submit(parse, index, email_data) for index, email_data in extracted.items()}
+            for index, future in futures.items():
+                try:
+                    services_data = future.result()
+                except Exception as e:
+                    services_data = {'error': f'Error processing email: {str(e)}'}
+                if services_data.get('error'):
+                    statuses[index].update(status='error', error=services_data['error'])
+                else:
+                    parsed[index] = services_data
+                    statuses[index].update(status='success', service_count=len(services_data.get('services', [])),
+                                           from_cache=bool(services_data.get('from_cache')),
+                                           processing_method=services_data.get('processing_method'))
+    
+    if not parsed:
+        return None, statuses
+    
+    documents = [parsed[index] for index in sorted(parsed)]
+    # One method if every file went the same way (AI, Rules, Calendar), else Mixed
+    methods = {doc.get('processing_method') or 'AI' for doc in documents}
+    valid_dates = sorted(doc['date'] for doc in documents if doc.get('date') and doc['date'] != '-')
+    date = valid_dates[0] if valid_dates else datetime.now().strftime('%Y-%m-%d')
+    merged = {
+        'date': date,
+        'end_date': valid_dates[-1] if valid_dates else date,
+        'services': ai_processor.merge_services(doc.get('services', []) for doc in documents),
+        'original_subject': '; '.join(doc.get('original_subject', '') for doc in documents if doc.get('original_subject')),
+        'original_body': '\n\n'.join(
+            f"----- {files[index][0]} -----\n{parsed[index].get('original_body', '')}" for index in sorted(parsed)
+        ),
+        'header_title': build_header_title(date),
+        'processing_method': methods.pop() if len(methods) == 1 else 'Mixed'
+    }
+    return merged, statuses
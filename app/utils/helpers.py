@@ -11,11 +11,14 @@ class HistoryCache:
         self.cache = {}
         self.etags = {}
     
-    def get_cache_key(self, search_term=None, page=None, per_page=None):
+    def get_cache_key(self, search_term=None, page=None, per_page=None, view='full', filters=None):
         if search_term:
-            return f"search_{hashlib.md5(search_term.encode()).hexdigest()}"
+            return f"search_{view}_{hashlib.md5(search_term.encode()).hexdigest()}"
+        elif filters:
+            filter_key = '&'.join(f"{name}={filters[name]}" for name in sorted(filters))
+            return f"filter_{view}_{page}_{per_page}_{hashlib.md5(filter_key.encode()).hexdigest()}"
         else:
-            return f"page_{page}_{per_page}"
+            return f"page_{view}_{page}_{per_page}"
     
     def get_etag(self, cache_key):
         return self.etags.get(cache_key, "0")
@@ -0,0 +1,88 @@
+"""
+Lazy import utilities
+This file contains the registry of heavy parser and AI backend modules. They are
+imported on first use instead of at worker boot, and their import cost is recorded
+for the startup report.
+"""
+import sys
+import time
+import logging
+import importlib
+import importlib.util
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Module -> what it backs; only modules listed here go through lazy_import
+LAZY_MODULES = {
+    'extract_msg': 'parser: Outlook .msg files',
+    'dateutil.parser': 'parser: free-form dates',
+    'dateutil.rrule': 'parser: .ics recurrence rules',
+    'pypdf': 'parser: PDF text',
+    'google.genai': 'ai: Gemini client',
+    'google.genai.types': 'ai: Gemini request types',
+}
+
+_import_times = {}
+_import_lock = threading.Lock()
+
+def lazy_import(name):
+    """Import a registered module on first use and record how long the import took"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if name not in LAZY_MODULES:
+        raise ValueError(f"{name} is not a registered lazy module")
+
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    with _import_lock:
+        _import_times.setdefault(name, elapsed)
+    logger.info(f"Lazily imported {name} in {elapsed * 1000:.0f}ms")
+    return module
+
+def is_module_available(name):
+    """True if a module can be imported, without importing it"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def get_import_report():
+    """Per registered module: whether it is loaded and what its import cost"""
+    report = {}
+    for name, purpose in LAZY_MODULES.items():
+        seconds = _import_times.get(name)
+        report[name] = {
+            'purpose': purpose,
+            'loaded': name in sys.modules,
+            'import_ms': round(seconds * 1000, 1) if seconds is not None else None
+        }
+    return report
+
+def log_import_report(preload=False):
+    """
+    Log the import state of the registered modules at startup
+
+    A module loaded without a recorded time was imported eagerly by some other code,
+    which defeats the lazy loading. With preload=True every module is imported now so
+    the log shows the cost each one would add to a worker's first request.
+    """
+    if preload:
+        for name in LAZY_MODULES:
+            try:
+                lazy_import(name)
+            except ImportError as e:
+                logger.warning(f"Could not import {name}: {str(e)}")
+
+    for name, entry in get_import_report().items():
+        if entry['import_ms'] is not None:
+            state = f"imported in {entry['import_ms']}ms"
+        elif entry['loaded']:
+            state = "loaded eagerly at startup"
+        else:
+            state = "deferred until first use"
+        logger.info(f"Import cost: {name} ({entry['purpose']}): {state}")
@@ -32,6 +32,21 @@ class OptimizedKeyManager:
     def get_metadata_key(self):
         return f"{self.history_prefix}:metadata"
     
+    def get_summary_key(self):
+        return f"{self.history_prefix}:summary"
+    
+    def get_index_version_key(self):
+        return f"{self.history_prefix}:index_version"
+    
+    def get_editor_index_key(self, editor):
+        return f"{self.history_prefix}:by_editor:{editor}"
+    
+    def get_maintenance_date_index_key(self):
+        return f"{self.history_prefix}:by_maintenance_date"
+    
+    def get_service_count_index_key(self):
+        return f"{self.history_prefix}:by_service_count"
+    
     def get_search_key(self, search_type, term):
         return f"{self.history_prefix}:search:{search_type}:{term}"
     
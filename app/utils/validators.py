@@ -1,2 +1,218 @@
-# Validation utilities
-# This file will contain validation functions from app.py
+"""
+Validation utilities
+This file contains the shared schema validation and normalization for service rows,
+used by every ingest path (AI parser, rule and calendar extractors, edit and sync
+endpoints, history import). Values that can be read ("2 PM", "14.00", "14 June 2025")
+are normalized instead of discarded; values that can't are reported per field.
+"""
+import re
+from datetime import datetime, timedelta
+
+EMPTY = '-'
+PRIORITIES = ('low', 'medium', 'high')
+PRIORITY_ALIASES = {
+    'critical': 'high', 'urgent': 'high', 'major': 'high', 'p1': 'high', 'p2': 'high',
+    'normal': 'medium', 'moderate': 'medium', 'p3': 'medium',
+    'minor': 'low', 'p4': 'low'
+}
+# Placeholders meaning "no value"; normalized to "-" without an error
+BLANK_VALUES = {'', '-', '--', 'n/a', 'na', 'none', 'tbd', 'tba', 'unknown', 'not specified'}
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+HHMM_RE = re.compile(r'^\d{2}:\d{2}$')
+ISO_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+TIME_RE = re.compile(
+    r'^(?P<hour>\d{1,2})(?:\s*[:.h]\s*(?P<minute>\d{2})(?::\d{2})?)?\s*'
+    r'(?P<meridiem>[ap]\.?\s?m\.?)?\s*(?P<suffix>hrs?|hours)?$', re.IGNORECASE)
+COMPACT_TIME_RE = re.compile(r'^(?P<hour>\d{2})(?P<minute>\d{2})\s*(?P<suffix>hrs?|hours|h)?$', re.IGNORECASE)
+TIME_ZONE_SUFFIX_RE = re.compile(
+    r'\s*\(?\b(?:UTC|GMT|CET|CEST|BST|EET|EEST|EST|EDT|CST|CDT|MST|MDT|PST|PDT|IST)'
+    r'(?:\s*[+-]\s*\d{1,2}(?::?\d{2})?)?\)?$', re.IGNORECASE)
+YEAR_FIRST_DATE_RE = re.compile(r'^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[T\s].*)?$')
+YEAR_LAST_DATE_RE = re.compile(r'^(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})$')
+DAY_MONTH_DATE_RE = re.compile(
+    r'^(?:[a-z]+,?\s+)?(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]{3,9})\.?,?\s+(\d{4})$', re.IGNORECASE)
+MONTH_DAY_DATE_RE = re.compile(
+    r'^(?:[a-z]+,?\s+)?([a-z]{3,9})\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})$', re.IGNORECASE)
+
+def _is_blank(value):
+    return value is None or str(value).strip().lower() in BLANK_VALUES
+
+def normalize_time(value):
+    """
+    Normalize a time to HH:MM
+
+    Accepts 22:00, 9:30, 14.00, 14h00, 1400hrs, 2 PM, 2:30 p.m., noon and midnight,
+    with an optional trailing zone abbreviation. Returns (value, error); blanks give
+    ("-", None) and unreadable values ("-", message). 24:00 is rejected here because
+    it means 00:00 of the next day; normalize_service accepts it as an end time.
+    """
+    if _is_blank(value):
+        return EMPTY, None
+    text = str(value).strip()
+    if HHMM_RE.match(text) and int(text[:2]) < 24 and int(text[3:]) < 60:
+        return text, None
+
+    lowered = TIME_ZONE_SUFFIX_RE.sub('', text).strip().lower()
+    if lowered in ('noon', 'midday', '12 noon'):
+        return '12:00', None
+    if lowered in ('midnight', '12 midnight'):
+        return '00:00', None
+
+    match = TIME_RE.match(lowered) or COMPACT_TIME_RE.match(lowered)
+    if not match:
+        return EMPTY, f"Unrecognized time '{text}'"
+    groups = match.groupdict()
+    hour = int(groups['hour'])
+    minute = int(groups['minute'] or 0)
+    meridiem = (groups.get('meridiem') or '').replace('.', '').replace(' ', '')
+
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return EMPTY, f"Invalid hour in '{text}'"
+        hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+    elif groups['minute'] is None and not groups['suffix']:
+        # A bare number ("14") is too ambiguous to read as a time
+        return EMPTY, f"Unrecognized time '{text}'"
+    elif hour == 24 and minute == 0:
+        return EMPTY, f"Invalid time '{text}' (use 00:00 of the next day)"
+
+    if hour > 23 or minute > 59:
+        return EMPTY, f"Invalid time '{text}'"
+    return f"{hour:02d}:{minute:02d}", None
+
+def is_end_of_day(value):
+    """True for an end-of-day time written as 24:00 (also 24.00, 2400hrs)"""
+    if _is_blank(value):
+        return False
+    text = TIME_ZONE_SUFFIX_RE.sub('', str(value).strip()).strip().lower()
+    match = TIME_RE.match(text) or COMPACT_TIME_RE.match(text)
+    return bool(match and match.group('hour') == '24' and match.group('minute') == '00')
+
+def _date_str(year, month, day):
+    try:
+        return datetime(int(year), int(month), int(day)).strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def normalize_date(value):
+    """
+    Normalize a date to YYYY-MM-DD
+
+    Accepts ISO dates (also with a time part or / . separators), numeric dates with
+    the year last read month first (MM/DD/YYYY, as in the subject-line parser) and
+    month names ("14 June 2025", "Sat, Jun 14th 2025"). Numeric dates that only make
+    sense day first (20/12/2024) are rejected rather than reinterpreted. Returns
+    (value, error) like normalize_time.
+    """
+    if _is_blank(value):
+        return EMPTY, None
+    text = str(value).strip()
+    if ISO_DATE_RE.match(text):
+        normalized = _date_str(text[:4], text[5:7], text[8:])
+        return (normalized, None) if normalized else (EMPTY, f"Invalid date '{text}'")
+
+    normalized = None
+    if YEAR_FIRST_DATE_RE.match(text):
+        normalized = _date_str(*YEAR_FIRST_DATE_RE.match(text).groups())
+    elif YEAR_LAST_DATE_RE.match(text):
+        month, day, year = YEAR_LAST_DATE_RE.match(text).groups()
+        if int(month) > 12:
+            return EMPTY, f"Day-first date '{text}' is not supported (use YYYY-MM-DD or MM/DD/YYYY)"
+        normalized = _date_str(year, month, day)
+    elif DAY_MONTH_DATE_RE.match(text):
+        day, month_name, year = DAY_MONTH_DATE_RE.match(text).groups()
+        normalized = _date_str(year, MONTHS.get(month_name.lower()[:3]), day)
+    elif MONTH_DAY_DATE_RE.match(text):
+        month_name, day, year = MONTH_DAY_DATE_RE.match(text).groups()
+        normalized = _date_str(year, MONTHS.get(month_name.lower()[:3]), day)
+
+    if normalized:
+        return normalized, None
+    return EMPTY, f"Unrecognized date '{text}'"
+
+def normalize_priority(value, default='medium'):
+    """low/medium/high, mapping common synonyms (critical, minor, P1...)"""
+    if _is_blank(value):
+        return default, None
+    text = str(value).strip().lower()
+    if text in PRIORITIES:
+        return text, None
+    if text in PRIORITY_ALIASES:
+        return PRIORITY_ALIASES[text], None
+    return default, f"Unknown priority '{value}'"
+
+def normalize_service(service, default_comments='', default_priority='medium'):
+    """
+    Normalize one service row to the schema
+
+    Returns (service, errors) where errors maps field name to message; a field with
+    an error holds the "-" placeholder (or the default priority).
+    """
+    errors = {}
+    if not isinstance(service, dict):
+        return None, {'service': 'Service must be an object'}
+
+    name = service.get('name')
+    name = '' if name is None else str(name).strip()
+    if not name:
+        errors['name'] = 'Service name is required'
+
+    normalized = {'name': name}
+    for field, normalize in (('start_date', normalize_date), ('start_time', normalize_time),
+                             ('end_time', normalize_time), ('end_date', normalize_date)):
+        normalized[field], error = normalize(service.get(field))
+        if error:
+            errors[field] = error
+
+    if is_end_of_day(service.get('end_time')) and not errors.get('end_date'):
+        # 24:00 ends the window at midnight, i.e. 00:00 on the day after end_date
+        end_date = normalized['end_date'] if normalized['end_date'] != EMPTY else normalized['start_date']
+        if end_date != EMPTY:
+            next_day = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+            normalized['end_time'] = '00:00'
+            normalized['end_date'] = next_day.strftime('%Y-%m-%d')
+            errors.pop('end_time', None)
+
+    comments = service.get('comments')
+    normalized['comments'] = str(comments).strip() if comments not in (None, '') else default_comments
+    normalized['priority'], error = normalize_priority(service.get('priority'), default_priority)
+    if error:
+        errors['priority'] = error
+
+    # Keep extra keys the caller added (e.g. UI state), schema fields win
+    for key, value in service.items():
+        if key not in normalized:
+            normalized[key] = value
+    return normalized, errors
+
+def normalize_services(services, default_comments='', default_priority='medium'):
+    """
+    Normalize a list of service rows; rows without a name are dropped
+
+    Returns (services, errors) where each error is a dict with index, service, field,
+    value and message. A dropped row only reports its missing name, so callers that
+    silently drop nameless rows can filter the 'name' errors out.
+    """
+    cleaned = []
+    errors = []
+    for index, service in enumerate(services or []):
+        normalized, service_errors = normalize_service(service, default_comments, default_priority)
+        kept = bool(normalized and normalized['name'])
+        for field, message in service_errors.items():
+            if not kept and field != 'name' and 'name' in service_errors:
+                continue
+            errors.append({
+                'index': index,
+                'service': normalized['name'] if normalized else None,
+                'field': field,
+                'value': service.get(field) if isinstance(service, dict) else service,
+                'message': message
+            })
+        if kept:
+            cleaned.append(normalized)
+    return cleaned, errors
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Entry point for a dedicated parse worker process
+Consumes upload parse jobs from Redis so web workers never run file parsing or AI
+calls. Run alongside the web app with PARSE_WORKER_THREADS=0 on the web side and the
+same TEMP_DIR, where uploads wait for their job.
+"""
+import logging
+
+from app.config import PARSE_WORKER_PROCESS_THREADS
+from app.services.job_service import start_parse_workers
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+if __name__ == '__main__':
+    threads = start_parse_workers(PARSE_WORKER_PROCESS_THREADS)
+    for worker_thread in threads:
+        worker_thread.join()
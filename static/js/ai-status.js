@@ -101,7 +101,8 @@ class AIStatusManager {
             if (response.ok) {
                 const data = await response.json();
                 this.updateStatusDisplay(data);
-                this.lastValidated = new Date();
+                // Status comes from the server's background probe; show when it actually ran
+                this.lastValidated = data.checkedAt ? new Date(data.checkedAt * 1000) : new Date();
                 this.hasInitialValidation = true;
                 this.updateValidationDisplay();
             } else {
@@ -485,38 +486,56 @@ class AIStatusManager {
             // Get page context
             const pageContext = this.getPageContext();
             
-            // Send to AI
-            const response = await fetch('/ask-ai', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    question: message,
-                    context: pageContext
-                })
-            });
-            
-            const result = await response.json();
-            
-            // Remove typing indicator
-            typingIndicator.remove();
+            // Send to AI; the answer streams in as server-sent events
+            const response = await this.postQuestion(message, pageContext);
             
             // Add AI response
             const aiMessage = document.createElement('div');
             aiMessage.className = 'message ai-message fade-in';
-            
-            // Convert markdown to HTML
-            const markdownResponse = result.response || 'Sorry, I could not process your request.';
-            const htmlResponse = marked.parse(markdownResponse);
-            
             aiMessage.innerHTML = `
                 <div class="message-content ai-bubble">
                     <i class="fas fa-robot"></i>
-                    <div class="ai-response-content">${htmlResponse}</div>
+                    <div class="ai-response-content"></div>
                 </div>
             `;
-            chatMessages.appendChild(aiMessage);
+            const responseContent = aiMessage.querySelector('.ai-response-content');
+            
+            let markdownResponse = '';
+            const contentType = response.headers.get('Content-Type') || '';
+            if (response.ok && contentType.includes('text/event-stream')) {
+                const done = await this.readAnswerStream(response, (text) => {
+                    if (!markdownResponse) {
+                        // First token: swap the typing indicator for the answer bubble
+                        typingIndicator.remove();
+                        chatMessages.appendChild(aiMessage);
+                    }
+                    markdownResponse += text;
+                    // Convert markdown to HTML
+                    responseContent.innerHTML = marked.parse(markdownResponse);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                });
+                if (done && done.context_id) {
+                    this.chatContextId = done.context_id;
+                }
+            } else {
+                // Validation and rate-limit errors come back as JSON
+                const result = await response.json();
+                markdownResponse = result.response || '';
+                if (!markdownResponse && result.message) {
+                    markdownResponse = result.message;
+                }
+            }
+            
+            // Remove typing indicator
+            typingIndicator.remove();
+            
+            if (!markdownResponse) {
+                markdownResponse = 'Sorry, I could not process your request.';
+            }
+            responseContent.innerHTML = marked.parse(markdownResponse);
+            if (!aiMessage.parentNode) {
+                chatMessages.appendChild(aiMessage);
+            }
             
             // Optionally, add a divider or timestamp between message groups
             // Example: Uncomment below to add a timestamp
@@ -552,6 +571,70 @@ class AIStatusManager {
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
+    async postQuestion(question, pageContext) {
+        // The server keeps a compacted copy of each page context version; while the
+        // page is unchanged only its id is sent with follow-up questions
+        const signature = JSON.stringify(pageContext);
+        const send = (payload) => fetch('/ask-ai/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(Object.assign({ question: question }, payload))
+        });
+        
+        if (this.chatContextId && this.chatContextSignature === signature) {
+            const response = await send({ context_id: this.chatContextId });
+            if (response.status !== 409) {
+                return response;
+            }
+            // Stored context expired; fall through and resend it in full
+        }
+        
+        this.chatContextId = null;
+        this.chatContextSignature = signature;
+        return send({ context: pageContext });
+    }
+
+    async readAnswerStream(response, onText) {
+        // Minimal SSE reader for a fetch() body: frames are separated by a blank line.
+        // Returns the payload of the final "done" event.
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let donePayload = null;
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (!data) continue;
+                
+                const payload = JSON.parse(data);
+                if (event === 'chunk') {
+                    onText(payload.text);
+                } else if (event === 'done') {
+                    donePayload = payload;
+                } else if (event === 'error') {
+                    throw new Error(payload.message);
+                }
+            }
+        }
+        return donePayload;
+    }
+
     getPageContext() {
         const context = {
             pageTitle: document.title,
@@ -2,14 +2,21 @@
 const { DateTime } = luxon || window.luxon;
 
 // File validation helper functions
+// The server renders the file input's accept list from its parser registry
+function getSupportedExtensions() {
+    const fileInput = document.getElementById('fileInput');
+    return fileInput && fileInput.accept ? fileInput.accept.split(',') : [];
+}
+
 function isValidFileType(filename) {
-    const supportedExtensions = ['.msg', '.txt', '.eml', '.html', '.htm'];
+    const supportedExtensions = getSupportedExtensions();
     const ext = filename.toLowerCase().substring(filename.lastIndexOf('.'));
-    return supportedExtensions.includes(ext);
+    // Without a list the server's own check decides
+    return supportedExtensions.length === 0 || supportedExtensions.includes(ext);
 }
 
 function getSupportedExtensionsText() {
-    return '.msg, .txt, .eml, .html, .htm';
+    return getSupportedExtensions().join(', ');
 }
 
 // Smart History Caching System
@@ -1123,7 +1130,10 @@ function showLoading() {
 }
 
 function hideLoading() {
-    document.querySelector('.loading-overlay').style.display = 'none';
+    const overlay = document.querySelector('.loading-overlay');
+    if (overlay) {
+        overlay.style.display = 'none';
+    }
 }
 
 function showError(message) {
@@ -1175,11 +1185,99 @@ function initializeFileUpload() {
                     showLoading(); // Fallback to the showLoading function if overlay doesn't exist
                 }
                 
-                uploadForm.submit();
+                submitUpload();
             }
         });
     }
 }
+
+// Upload through the background parse queue; the page stays responsive while the
+// server parses, and the result page opens when the job completes.
+// Falls back to a classic form post if the async endpoint is unavailable.
+async function submitUpload() {
+    const uploadForm = document.getElementById('uploadForm');
+    const fileInput = document.getElementById('fileInput');
+    if (!fileInput || fileInput.files.length === 0 || !window.fetch || !window.FormData) {
+        uploadForm.submit();
+        return;
+    }
+    
+    try {
+        const response = await fetch('/upload-async', {
+            method: 'POST',
+            body: new FormData(uploadForm),
+            credentials: 'same-origin'
+        });
+        const data = await response.json();
+        if (response.status !== 202 || !data.job_id) {
+            hideLoading();
+            clearAllNotifications();
+            showError(data.message || 'Error uploading file');
+            return;
+        }
+        waitForParseJob(data.job_id);
+    } catch (err) {
+        console.error('Async upload failed, falling back to form submit:', err);
+        uploadForm.submit();
+    }
+}
+
+// Wait for a parse job via the 'parse-job' SSE event, polling /jobs/<id> as a fallback
+function waitForParseJob(jobId) {
+    let finished = false;
+    let pollTimer = null;
+    
+    const finish = (job) => {
+        if (finished) return;
+        finished = true;
+        clearInterval(pollTimer);
+        if (window.mainSSE) {
+            window.mainSSE.removeEventListener('parse-job', onJobEvent);
+        }
+        if (job.status === 'completed') {
+            window.location.href = `/jobs/${jobId}/result`;
+        } else {
+            hideLoading();
+            clearAllNotifications();
+            showError(job.error || 'Error processing email');
+        }
+    };
+    
+    const onJobEvent = (e) => {
+        let data;
+        try {
+            data = JSON.parse(e.data);
+        } catch (err) {
+            return;
+        }
+        if (data.job_id !== jobId) return;
+        if (data.status === 'completed' || data.status === 'failed') {
+            finish(data);
+        }
+    };
+    
+    if (window.mainSSE) {
+        window.mainSSE.addEventListener('parse-job', onJobEvent);
+    }
+    
+    pollTimer = setInterval(async () => {
+        try {
+            const response = await fetch(`/jobs/${jobId}`, { cache: 'no-store', credentials: 'same-origin' });
+            if (response.status === 404) {
+                // Job expired or belongs to another session; stop waiting
+                finish({ status: 'failed', error: 'Upload job not found or expired' });
+                return;
+            }
+            if (!response.ok) return;
+            const data = await response.json();
+            if (data.job && (data.job.status === 'completed' || data.job.status === 'failed')) {
+                finish(data.job);
+            }
+        } catch (err) {
+            // Keep waiting; the SSE event may still arrive
+        }
+    }, 3000);
+}
 // New: update hidden input when AI processing checkbox toggles
 const useAiCheckbox = document.getElementById('useAiProcessing');
 if (useAiCheckbox) {
@@ -1259,7 +1357,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     const useAiCheckbox = document.getElementById('useAiProcessing');
                     document.getElementById('useAiInput').value = useAiCheckbox.checked;
                     
-                    document.getElementById('uploadForm').submit();
+                    submitUpload();
                 }
             }, 100);
         }
@@ -1292,7 +1390,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     const useAiCheckbox = document.getElementById('useAiProcessing');
                     document.getElementById('useAiInput').value = useAiCheckbox.checked;
                     
-                    document.getElementById('uploadForm').submit();
+                    submitUpload();
                 }
             }, 100);
         }
@@ -2276,6 +2374,8 @@ async function openHistoryModal(viewOnly = false, searchTerm = '', page = 1) {
                 params.append('page', page);
                 params.append('per_page', 10);  // Changed to 10 for better UX
             }
+            // List only needs summaries; full snapshots come from /load-from-history
+            params.append('view', 'summary');
             
             // Fetch history from server
             const response = await fetch(`/get-history?${params}`, {
@@ -2448,7 +2548,7 @@ function populateHistoryItems(history, viewOnly) {
         historyItem.className = 'history-item';
         historyItem.dataset.timestamp = item.timestamp;
         
-        const serviceCount = item.data?.services?.length || 0;
+        const serviceCount = item.service_count ?? item.data?.services?.length ?? 0;
         
         // Convert saved UTC date to local timezone
         let formattedDate = 'Unknown date';
@@ -2472,7 +2572,7 @@ function populateHistoryItems(history, viewOnly) {
         }
         
         // Get editor info
-        const editor = item.data?.last_edited_by || 'Unknown';
+        const editor = item.last_edited_by || item.data?.last_edited_by || 'Unknown';
         
         historyItem.innerHTML = `
             <div class="history-item-header" style="display:flex;justify-content:space-between;align-items:flex-start;gap:1.2rem;">
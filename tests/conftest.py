@@ -0,0 +1,34 @@
+"""
+Test configuration
+Every Redis connection pool the app creates is backed by one in-process fakeredis
+server, so the services run unchanged without a Redis instance. The pools are
+created when app.utils.redis_client is imported, so the patch happens here first.
+"""
+import os
+import tempfile
+
+import fakeredis
+import pytest
+import redis
+
+os.environ.setdefault('TEMP_DIR', tempfile.mkdtemp(prefix='change-tests-'))
+# The fake server has no password; app.config would otherwise default to one and AUTH fails
+os.environ['REDIS_PASSWORD'] = ''
+
+fake_server = fakeredis.FakeServer()
+FakeConnection = getattr(fakeredis, 'FakeRedisConnection', fakeredis.FakeConnection)
+
+class FakeConnectionPool(redis.ConnectionPool):
+    def __init__(self, **kwargs):
+        kwargs['connection_class'] = FakeConnection
+        kwargs['server'] = fake_server
+        super().__init__(**kwargs)
+
+redis.ConnectionPool = FakeConnectionPool
+
+@pytest.fixture(autouse=True)
+def flush_redis():
+    from app.utils.redis_client import redis_client
+    redis_client.flushall()
+    yield
+    redis_client.flushall()
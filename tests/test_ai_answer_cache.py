@@ -0,0 +1,22 @@
+from app.services.ai_answer_cache import (
+    get_answer_cache_metrics, get_answer_key, get_cached_answer, normalize_question, store_cached_answer
+)
+
+def test_questions_differing_in_case_punctuation_and_spacing_share_a_key():
+    assert normalize_question('  What time does DNS   maintenance start?? ') == 'what time does dns maintenance start'
+    assert normalize_question('Who’s affected?') == normalize_question("who's affected")
+    assert get_answer_key('When is the Billing window?', 'ctx-1') == get_answer_key('when is the billing window', 'ctx-1')
+
+def test_key_depends_on_the_document_version():
+    assert get_answer_key('When is the Billing window?', 'ctx-1') != get_answer_key('When is the Billing window?', 'ctx-2')
+    assert get_answer_key('When is the Billing window?', 'ctx-1') != get_answer_key('When is the DNS window?', 'ctx-1')
+
+def test_cached_answer_round_trip_counts_hits_and_misses():
+    assert get_cached_answer('When is the Billing window?', 'ctx-1') is None
+    store_cached_answer('When is the Billing window?', 'ctx-1', 'Saturday 22:00-02:00')
+
+    assert get_cached_answer('when is the billing window', 'ctx-1') == 'Saturday 22:00-02:00'
+    assert get_cached_answer('When is the Billing window?', 'ctx-2') is None
+
+    metrics = get_answer_cache_metrics()
+    assert (metrics['hits'], metrics['misses'], metrics['entries']) == (1, 2, 1)
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services import ai_rate_limiter
+from app.services.ai_rate_limiter import (
+    AI_RATE_BUCKET_KEY, AI_RATE_QUEUE_KEY, AIRateLimitError, acquire_ai_token, block_ai_requests, call_gemini
+)
+from app.config import AI_RATE_LIMIT_BURST
+from app.utils.redis_client import redis_client
+
+def test_bucket_allows_a_burst_then_times_out():
+    # The token bucket is a Lua script; fakeredis runs it through lupa
+    pytest.importorskip('lupa')
+    for _ in range(AI_RATE_LIMIT_BURST):
+        acquire_ai_token(timeout=0)
+    assert float(redis_client.hget(AI_RATE_BUCKET_KEY, 'tokens')) < 1
+
+    with pytest.raises(AIRateLimitError):
+        acquire_ai_token(timeout=0)
+    # A waiter that gives up leaves the queue so it can't block the head
+    assert redis_client.zcard(AI_RATE_QUEUE_KEY) == 0
+
+def test_block_holds_back_every_call():
+    pytest.importorskip('lupa')
+    block_ai_requests(30)
+    with pytest.raises(AIRateLimitError):
+        acquire_ai_token(timeout=0)
+
+def test_token_is_taken_inside_the_concurrency_slot(monkeypatch):
+    slots = ai_rate_limiter.ai_request_slots
+    free_slots = []
+    monkeypatch.setattr(ai_rate_limiter, 'acquire_ai_token', lambda: free_slots.append(slots._value))
+    before = slots._value
+
+    assert call_gemini(lambda: 'answer') == 'answer'
+    assert free_slots == [before - 1]
+
+def test_rate_limited_call_is_retried(monkeypatch):
+    class RateLimited(Exception):
+        code = 429
+    monkeypatch.setattr(ai_rate_limiter, 'acquire_ai_token', lambda: None)
+    monkeypatch.setattr(ai_rate_limiter, 'block_ai_requests', lambda seconds: None)
+    attempts = []
+    def request():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RateLimited()
+        return 'answer'
+
+    assert call_gemini(request, max_retries=3) == 'answer'
+    assert len(attempts) == 2
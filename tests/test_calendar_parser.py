@@ -0,0 +1,69 @@
+from app.services.calendar_parser import events_to_services, parse_calendar
+
+def make_calendar(*events):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+    for event in events:
+        lines += ['BEGIN:VEVENT'] + list(event) + ['END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines) + '\r\n'
+
+def services_for(*events):
+    _, parsed = parse_calendar(make_calendar(*events))
+    return events_to_services(parsed)
+
+def windows(services):
+    return [(s['start_date'], s['start_time'], s['end_date'], s['end_time']) for s in services]
+
+WEEKLY_PATCHING = (
+    'UID:patching-1',
+    'SUMMARY:Database patching',
+    'DTSTART;TZID=Europe/Stockholm:20240302T220000',
+    'DTEND;TZID=Europe/Stockholm:20240303T020000',
+    'RRULE:FREQ=WEEKLY;COUNT=4',
+)
+
+def test_weekly_rrule_expands_in_the_event_zone_across_dst():
+    # Stockholm moves to summer time on 2024-03-31; the window stays at 22:00 local time
+    assert windows(services_for(WEEKLY_PATCHING)) == [
+        ('2024-03-02', '22:00', '2024-03-03', '02:00'),
+        ('2024-03-09', '22:00', '2024-03-10', '02:00'),
+        ('2024-03-16', '22:00', '2024-03-17', '02:00'),
+        ('2024-03-23', '22:00', '2024-03-24', '02:00'),
+    ]
+
+def test_exdate_removes_an_occurrence():
+    services = services_for(WEEKLY_PATCHING + ('EXDATE;TZID=Europe/Stockholm:20240309T220000',))
+    assert [s['start_date'] for s in services] == ['2024-03-02', '2024-03-16', '2024-03-23']
+
+def test_exdate_in_utc_matches_the_local_occurrence():
+    # 21:00Z is 22:00 in Stockholm (CET)
+    services = services_for(WEEKLY_PATCHING + ('EXDATE:20240316T210000Z,20240323T210000Z',))
+    assert [s['start_date'] for s in services] == ['2024-03-02', '2024-03-09']
+
+def test_utc_until_is_compared_in_the_event_zone():
+    event = tuple(line for line in WEEKLY_PATCHING if not line.startswith('RRULE')) + (
+        'RRULE:FREQ=WEEKLY;UNTIL=20240316T210000Z',)
+    assert [s['start_date'] for s in services_for(event)] == ['2024-03-02', '2024-03-09', '2024-03-16']
+
+def test_recurrence_id_override_replaces_one_occurrence():
+    override = (
+        'UID:patching-1',
+        'SUMMARY:Database patching',
+        'RECURRENCE-ID;TZID=Europe/Stockholm:20240309T220000',
+        'DTSTART;TZID=Europe/Stockholm:20240310T010000',
+        'DTEND;TZID=Europe/Stockholm:20240310T030000',
+    )
+    assert windows(services_for(WEEKLY_PATCHING, override)) == [
+        ('2024-03-02', '22:00', '2024-03-03', '02:00'),
+        ('2024-03-10', '01:00', '2024-03-10', '03:00'),
+        ('2024-03-16', '22:00', '2024-03-17', '02:00'),
+        ('2024-03-23', '22:00', '2024-03-24', '02:00'),
+    ]
+
+def test_cancelled_events_and_all_day_events():
+    cancelled = ('UID:gone', 'SUMMARY:Cancelled work', 'STATUS:CANCELLED', 'DTSTART:20240302T220000')
+    all_day = ('UID:freeze', 'SUMMARY:Change freeze', 'DTSTART;VALUE=DATE:20240601',
+               'DTEND;VALUE=DATE:20240603', 'PRIORITY:1')
+    services = services_for(cancelled, all_day)
+    assert windows(services) == [('2024-06-01', '-', '2024-06-02', '-')]
+    assert services[0]['priority'] == 'high'
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from app.services import search_service
+from app.services.history_service import clear_history_diff_cache, import_history_lines
+from app.utils.redis_client import history_key_manager, history_redis
+
+@pytest.fixture(autouse=True)
+def no_search_rebuild(monkeypatch):
+    # The rebuild runs on a background thread; these tests only check the history keys
+    monkeypatch.setattr(search_service, 'create_search_index', lambda: True)
+
+def import_line(item):
+    return import_history_lines([json.dumps(item)])
+
+def test_integer_timestamp_is_stored_under_the_canonical_key():
+    result = import_line({'timestamp': 1700000000, 'title': 'Weekend',
+                          'data': {'last_edited_by': 'Alice', 'services': [{'name': 'DNS'}]}})
+    assert result['imported'] == 1
+
+    item = json.loads(history_redis.get(history_key_manager.get_history_item_key('1700000000.0')))
+    summary = json.loads(history_redis.hget(history_key_manager.get_summary_key(), '1700000000.0'))
+    # The search index is built from str(item['timestamp']), so it must match the key suffix
+    assert str(item['timestamp']) == str(summary['timestamp']) == '1700000000.0'
+    assert history_redis.zrange(history_key_manager.get_metadata_key(), 0, -1) == ['1700000000.0']
+
+def test_overwrite_moves_the_editor_index_entry():
+    import_line({'timestamp': 1700000000, 'data': {'last_edited_by': 'Alice', 'services': []}})
+    import_line({'timestamp': '1700000000.0', 'data': {'last_edited_by': 'Bob', 'services': []}})
+
+    assert history_redis.zrange(history_key_manager.get_editor_index_key('alice'), 0, -1) == []
+    assert history_redis.zrange(history_key_manager.get_editor_index_key('bob'), 0, -1) == ['1700000000.0']
+
+def test_invalid_lines_are_skipped():
+    result = import_history_lines(['not json', json.dumps({'timestamp': 'soon', 'data': {}}),
+                                   json.dumps({'timestamp': 1700000000})])
+    assert (result['imported'], result['skipped']) == (0, 3)
+
+def test_clearing_diff_cache_by_timestamp_only_drops_diffs_involving_it():
+    for pair in ['1.0:2.0', '2.0:3.0', '3.0:11.0']:
+        history_redis.set(history_key_manager.get_cache_key('diff', pair), '{}')
+
+    assert clear_history_diff_cache(['1']) == 1
+    assert clear_history_diff_cache([3.0]) == 2
+    assert history_redis.keys(history_key_manager.get_cache_key('diff', '*')) == []
+
+def test_import_drops_cached_diffs():
+    diff_key = history_key_manager.get_cache_key('diff', '1700000000.0:1700000100.0')
+    history_redis.set(diff_key, '{}')
+    import_line({'timestamp': 1700000000, 'data': {'services': []}})
+    assert history_redis.get(diff_key) is None
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from app.services import history_service
+from app.services.history_service import HISTORY_INDEX_VERSION, format_history_timestamp, migrate_history_index
+from app.utils.redis_client import history_key_manager, history_redis
+
+TIMESTAMPS = [1717000000.25, 1717100000.5, 1717200000.75]
+
+def history_item(timestamp, editor, maintenance_date, services=1):
+    return {
+        'timestamp': timestamp,
+        'date': '2024-06-01 10:00:00',
+        'title': 'June ChangeWeekend',
+        'data': {
+            'date': maintenance_date,
+            'last_edited_by': editor,
+            'services': [{'name': f'Service {i}'} for i in range(services)]
+        }
+    }
+
+def seed_legacy_history():
+    """
+    Version 1 layout: metadata members are json.dumps(metadata), so the last two syncs
+    (same title, date and service count) collided and the second item key is orphaned
+    """
+    items = [
+        history_item(TIMESTAMPS[0], 'Alice', '2024-06-01', services=2),
+        history_item(TIMESTAMPS[1], 'Bob', '2024-06-08'),
+        history_item(TIMESTAMPS[2], 'Bob', '2024-06-08'),
+    ]
+    for item in items:
+        history_redis.set(history_key_manager.get_history_item_key(format_history_timestamp(item['timestamp'])),
+                          json.dumps(item))
+    legacy_member = json.dumps({'title': 'June ChangeWeekend', 'date': '2024-06-01 10:00:00', 'service_count': 1})
+    history_redis.zadd(history_key_manager.get_metadata_key(), {
+        json.dumps({'title': 'June ChangeWeekend', 'date': '2024-06-01 10:00:00', 'service_count': 2}): TIMESTAMPS[0],
+        legacy_member: TIMESTAMPS[2],
+    })
+
+def snapshot():
+    """Every history key with its contents"""
+    state = {}
+    for key in history_redis.keys('*'):
+        key_type = history_redis.type(key)
+        if key_type == 'zset':
+            state[key] = history_redis.zrange(key, 0, -1, withscores=True)
+        elif key_type == 'hash':
+            state[key] = history_redis.hgetall(key)
+        else:
+            state[key] = history_redis.get(key)
+    return state
+
+def assert_migrated():
+    members = [format_history_timestamp(timestamp) for timestamp in TIMESTAMPS]
+    assert history_redis.zrange(history_key_manager.get_metadata_key(), 0, -1) == members
+    summaries = history_redis.hgetall(history_key_manager.get_summary_key())
+    assert sorted(summaries) == members
+    assert json.loads(summaries[members[0]])['service_count'] == 2
+    assert history_redis.zrange(history_key_manager.get_editor_index_key('alice'), 0, -1) == members[:1]
+    assert history_redis.zrange(history_key_manager.get_editor_index_key('bob'), 0, -1) == members[1:]
+    assert history_redis.zrange(history_key_manager.get_maintenance_date_index_key(), 0, -1, withscores=True) == [
+        (members[0], 20240601), (members[1], 20240608), (members[2], 20240608)]
+    assert int(history_redis.get(history_key_manager.get_index_version_key())) == HISTORY_INDEX_VERSION
+    assert history_redis.get(f"{history_key_manager.get_index_version_key()}:lock") is None
+
+def test_migration_rewrites_members_and_recovers_orphaned_items():
+    seed_legacy_history()
+    assert migrate_history_index() is True
+    assert_migrated()
+
+def test_migration_is_idempotent():
+    seed_legacy_history()
+    assert migrate_history_index() is True
+    migrated = snapshot()
+
+    assert migrate_history_index() is True
+    assert snapshot() == migrated
+
+    # Running every step again (version flag lost) changes nothing either
+    history_redis.delete(history_key_manager.get_index_version_key())
+    assert migrate_history_index() is True
+    assert snapshot() == migrated
+
+@pytest.mark.parametrize('failing_step', ['build_history_summary', 'queue_history_index_write'])
+def test_migration_resumes_after_interruption(monkeypatch, failing_step):
+    seed_legacy_history()
+    assert migrate_history_index() is True
+    expected = snapshot()
+    history_redis.flushdb()
+
+    seed_legacy_history()
+    original = getattr(history_service, failing_step)
+    calls = []
+    def fail_after_first_call(*args, **kwargs):
+        calls.append(args)
+        if len(calls) > 1:
+            raise RuntimeError('worker killed')
+        return original(*args, **kwargs)
+    monkeypatch.setattr(history_service, failing_step, fail_after_first_call)
+
+    assert migrate_history_index() is False
+    # Interrupted: no version flag, and the lock is released for the next boot
+    assert history_redis.get(history_key_manager.get_index_version_key()) is None
+    assert history_redis.get(f"{history_key_manager.get_index_version_key()}:lock") is None
+
+    monkeypatch.setattr(history_service, failing_step, original)
+    assert migrate_history_index() is True
+    assert_migrated()
+    assert snapshot() == expected
+
+def test_migration_skips_while_another_worker_holds_the_lock():
+    seed_legacy_history()
+    history_redis.set(f"{history_key_manager.get_index_version_key()}:lock", '1')
+    assert migrate_history_index() is True
+    assert history_redis.get(history_key_manager.get_index_version_key()) is None
@@ -0,0 +1,80 @@
+import sys
+
+from app.services.rule_extractor import extract_from_lines, extract_from_table, extract_with_rules, find_dates
+
+def windows(document):
+    return [(s['name'], s['start_date'], s['start_time'], s['end_date'], s['end_time'])
+            for s in document['services']]
+
+def test_pipe_table_with_separate_start_and_end_columns():
+    body = '\n'.join([
+        '| Service | Start Date | Start Time | End Time | Priority |',
+        '|---|---|---|---|---|',
+        '| Core DB | 12/14/2024 | 22:00 | 23:30 | High |',
+        '| Web | 12/14/2024 | 9 PM | 11 PM | Low |',
+    ])
+    document = extract_with_rules({'subject': 'Maintenance 2024-12-14', 'body': body})
+    assert windows(document) == [
+        ('Core DB', '2024-12-14', '22:00', '2024-12-14', '23:30'),
+        ('Web', '2024-12-14', '21:00', '2024-12-14', '23:00'),
+    ]
+    assert document['confidence'] == 1.0
+    assert [s['priority'] for s in document['services']] == ['high', 'low']
+
+def test_html_table_with_a_window_column():
+    html = ('<table><tr><th>System</th><th>Window</th></tr>'
+            '<tr><td>Billing</td><td>Dec 20 22:00 - 02:00</td></tr>'
+            '<tr><td>Mail</td><td>Dec 21 01:00 - 03:00</td></tr></table>')
+    document = extract_with_rules({'subject': 'Notice', 'body': '', 'body_html': html, 'date': '2024-12-01'})
+    assert windows(document) == [
+        ('Billing', '2024-12-20', '22:00', '2024-12-21', '02:00'),
+        ('Mail', '2024-12-21', '01:00', '2024-12-21', '03:00'),
+    ]
+
+def test_table_rows_without_an_end_time_lower_the_confidence():
+    table = [['Service', 'Date', 'Start'], ['Core DB', '12/14/2024', '22:00'], ['Web', '12/14/2024', '23:00']]
+    services, confidence = extract_from_table(table, '2024')
+    assert len(services) == 2
+    assert confidence == 0.5
+
+def test_service_lines_with_overnight_ranges():
+    body = 'Core DB: 2024-12-14 22:00 - 02:00\nWeb - 12/15/2024 1:00 AM - 3:00 AM'
+    document = extract_with_rules({'subject': 'Weekend work', 'body': body, 'date': '2024-12-01'})
+    assert windows(document) == [
+        ('Core DB', '2024-12-14', '22:00', '2024-12-15', '02:00'),
+        ('Web', '2024-12-15', '01:00', '2024-12-15', '03:00'),
+    ]
+
+def test_single_service_line_is_not_enough():
+    services, confidence = extract_from_lines('Core DB: 2024-12-14 22:00 - 02:00', '2024')
+    assert len(services) == 1
+    assert confidence < 0.9
+
+def test_prose_lines_with_generic_labels_fall_through_to_ai():
+    body = 'Note: 3 PM 12/05/2024 meeting\nReminder: 10:00 on 12/06/2024 call'
+    assert extract_from_lines(body, '2024') == ([], 0.0)
+    assert extract_with_rules({'subject': 'Hello', 'body': body}) is None
+
+def test_lines_without_an_end_time_are_ignored():
+    body = 'Core DB: 12/05/2024 3 PM\nWeb: 12/06/2024 10:00'
+    assert extract_from_lines(body, '2024') == ([], 0.0)
+
+def test_invalid_numeric_dates_are_dropped_instead_of_raising():
+    assert find_dates('2024-13-45 and 02/30/2024', '2024') == ([], [(0, 10), (15, 25)])
+    body = 'Core DB: 2024-13-45 22:00 - 02:00\nWeb: 2024-12-45 01:00 - 03:00'
+    assert extract_with_rules({'subject': 'Weekend', 'body': body}) is None
+
+def test_upload_falls_back_to_ai_when_the_rules_raise(monkeypatch):
+    from app.services import upload_service
+
+    def broken_rules(email_data):
+        raise ValueError('unconverted data remains')
+    class FakeAIProcessor:
+        @staticmethod
+        def process_email_content(email_data, bypass_cache=False):
+            return {'date': '2024-12-14', 'services': [], 'from_cache': True}
+    monkeypatch.setattr(upload_service, 'extract_with_rules', broken_rules)
+    monkeypatch.setitem(sys.modules, 'ai_processor', FakeAIProcessor)
+
+    document = upload_service.parse_email_data({'subject': 'Weekend', 'body': 'Core DB: soon'})
+    assert document['processing_method'] == 'AI'
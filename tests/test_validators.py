@@ -0,0 +1,108 @@
+import pytest
+
+from app.utils.validators import normalize_date, normalize_priority, normalize_service, normalize_services, normalize_time
+
+@pytest.mark.parametrize('value, expected', [
+    ('22:00', '22:00'),
+    ('9:30', '09:30'),
+    ('14.00', '14:00'),
+    ('14h00', '14:00'),
+    ('1400hrs', '14:00'),
+    ('2 PM', '14:00'),
+    ('2:30 p.m.', '14:30'),
+    ('12 AM', '00:00'),
+    ('12 PM', '12:00'),
+    ('11:59pm', '23:59'),
+    ('noon', '12:00'),
+    ('midnight', '00:00'),
+    ('22:00 CET', '22:00'),
+    ('06:00 (UTC+1)', '06:00'),
+])
+def test_normalize_time_accepts_12_and_24_hour_forms(value, expected):
+    assert normalize_time(value) == (expected, None)
+
+@pytest.mark.parametrize('value', ['13 PM', '0 AM', '25:00', '12:60', '14', 'soon'])
+def test_normalize_time_rejects_unreadable_values(value):
+    normalized, error = normalize_time(value)
+    assert normalized == '-'
+    assert error
+
+@pytest.mark.parametrize('value', [None, '', '-', 'TBD', 'n/a'])
+def test_blank_values_are_not_errors(value):
+    assert normalize_time(value) == ('-', None)
+    assert normalize_date(value) == ('-', None)
+
+def test_24_00_is_not_a_time_of_day():
+    normalized, error = normalize_time('24:00')
+    assert normalized == '-'
+    assert 'next day' in error
+
+@pytest.mark.parametrize('end_time', ['24:00', '24.00', '2400hrs'])
+def test_24_00_end_time_moves_to_midnight_of_the_next_day(end_time):
+    service, errors = normalize_service({
+        'name': 'Billing', 'start_date': '2024-12-31', 'start_time': '22:00',
+        'end_time': end_time, 'end_date': '2024-12-31'
+    })
+    assert errors == {}
+    assert (service['end_date'], service['end_time']) == ('2025-01-01', '00:00')
+
+def test_24_00_end_time_uses_the_start_date_without_an_end_date():
+    service, errors = normalize_service({'name': 'Billing', 'start_date': '2024-02-28', 'end_time': '24:00'})
+    assert errors == {}
+    assert (service['end_date'], service['end_time']) == ('2024-02-29', '00:00')
+
+def test_24_00_start_time_is_rejected():
+    _, errors = normalize_service({'name': 'Billing', 'start_date': '2024-12-31', 'start_time': '24:00'})
+    assert 'start_time' in errors
+
+def test_overnight_window_keeps_its_dates_and_times():
+    service, errors = normalize_service({
+        'name': 'Network', 'start_date': '2024-06-14', 'start_time': '10 PM',
+        'end_time': '02:00', 'end_date': '2024-06-15'
+    })
+    assert errors == {}
+    assert (service['start_date'], service['start_time']) == ('2024-06-14', '22:00')
+    assert (service['end_date'], service['end_time']) == ('2024-06-15', '02:00')
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-06-14', '2024-06-14'),
+    ('2024/06/14', '2024-06-14'),
+    ('2024-06-14T22:00:00Z', '2024-06-14'),
+    ('06/14/2024', '2024-06-14'),
+    ('05/06/2024', '2024-05-06'),
+    ('5.6.2024', '2024-05-06'),
+    ('14 June 2025', '2025-06-14'),
+    ('Sat, Jun 14th 2025', '2025-06-14'),
+    ('June 14, 2025', '2025-06-14'),
+])
+def test_normalize_date_reads_numeric_dates_month_first(value, expected):
+    assert normalize_date(value) == (expected, None)
+
+@pytest.mark.parametrize('value', ['20/12/2024', '31.01.2024'])
+def test_normalize_date_rejects_day_first_dates(value):
+    normalized, error = normalize_date(value)
+    assert normalized == '-'
+    assert 'Day-first' in error
+
+@pytest.mark.parametrize('value', ['2024-02-30', '02/30/2024', '14 Foo 2025', 'next Saturday'])
+def test_normalize_date_rejects_invalid_dates(value):
+    normalized, error = normalize_date(value)
+    assert normalized == '-'
+    assert error
+
+def test_normalize_priority_maps_synonyms_and_reports_unknown_values():
+    assert normalize_priority('Critical') == ('high', None)
+    assert normalize_priority('P4') == ('low', None)
+    assert normalize_priority('') == ('medium', None)
+    assert normalize_priority('whenever', default='low')[0] == 'low'
+    assert normalize_priority('whenever')[1]
+
+def test_normalize_services_drops_nameless_rows_and_only_reports_their_name():
+    services, errors = normalize_services([
+        {'name': '', 'start_time': 'garbage'},
+        {'name': 'DNS', 'start_time': 'garbage'},
+        {'name': 'Mail', 'start_time': '9 AM'},
+    ])
+    assert [service['name'] for service in services] == ['DNS', 'Mail']
+    assert [(error['index'], error['field']) for error in errors] == [(0, 'name'), (1, 'start_time')]
+    assert services[0]['start_time'] == '-'
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+AI load-test harness
+Drives uploads and /ask-ai through a running instance of the app and reports
+throughput, latency percentiles and error/429 counts. Run it against the app
+started with GEMINI_BASE_URL pointing at tools/mock_gemini.py for offline,
+reproducible numbers.
+
+Usage:
+    python tools/ai_benchmark.py --base-url http://localhost:5000 \\
+        --username admin --password adminpass --mode upload --concurrency 8 --requests 200
+    python tools/ai_benchmark.py --mode ask-stream --concurrency 16 --requests 300 \\
+        --mock-url http://localhost:8090
+
+Modes: upload (POST /), upload-async (POST /upload-async, then poll /jobs/<id>),
+ask (POST /ask-ai), ask-stream (POST /ask-ai/stream, also reports time to first chunk).
+Synthetic notices are unique per request so the parse cache is not hit; pass
+--same-content to measure the cached path instead. Ask modes repeat a few questions
+per context, so most of them are served by the answer cache; pass --unique-questions
+to make every question reach Gemini. Log in as an admin user: regular
+sessions time out after SESSION_TIMEOUT_SECONDS of inactivity.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+NOTICE_TEMPLATE = """Planned maintenance notice #{n}
+
+Hello team,
+
+We will be carrying out planned work on the {service} platform on {date}. The work is
+expected to start around {start} in the evening and should be finished roughly two hours
+later. During this period users may notice short interruptions. The {other} integration
+will also be restarted the following morning as a precaution.
+
+Regards,
+Infrastructure Operations
+"""
+SERVICES = ('Email', 'VPN', 'Payroll', 'CRM', 'Intranet', 'Data Warehouse', 'Backup', 'SSO')
+QUESTIONS = ('Which services are affected?', 'When does the maintenance start?',
+             'Is anything high priority?', 'Summarize the change window in one sentence.')
+
+def build_notice(n, same_content):
+    rng = random.Random(0 if same_content else n)
+    return NOTICE_TEMPLATE.format(
+        n=0 if same_content else n,
+        service=rng.choice(SERVICES),
+        other=rng.choice(SERVICES),
+        date=f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        start=f"{rng.randint(6, 11)} PM"
+    )
+
+def build_context(n):
+    rng = random.Random(n)
+    return {
+        'pageTitle': 'Change Management',
+        'headerTitle': 'Benchmark ChangeWeekend',
+        'date': '2025-06-14',
+        'services': [{'name': name, 'start_date': '2025-06-14', 'startTime': '22:00', 'endTime': '02:00',
+                      'endDate': '2025-06-15', 'comments': 'Benchmark row', 'priority': 'medium'}
+                     for name in rng.sample(SERVICES, 3)],
+        'originalEmail': build_notice(n, False)
+    }
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class Benchmark:
+    def __init__(self, options):
+        self.options = options
+        self.base_url = options.base_url.rstrip('/')
+        self.cookies = None
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.first_chunk = []
+        self.statuses = {}
+        self.errors = []
+
+    def login(self):
+        """Log in once and share the session cookie (the login route is rate limited)"""
+        response = requests.post(f"{self.base_url}/login", timeout=30,
+                                 json={'username': self.options.username, 'password': self.options.password})
+        if response.status_code != 200:
+            sys.exit(f"Login failed ({response.status_code}): {response.text[:200]}")
+        self.cookies = response.cookies
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.cookies.update(self.cookies)
+        return self.local.session
+
+    def record(self, status, latency, first_chunk=None, error=None):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if error:
+                self.errors.append(error)
+            else:
+                self.latencies.append(latency)
+                if first_chunk is not None:
+                    self.first_chunk.append(first_chunk)
+
+    def run_one(self, n):
+        mode = self.options.mode
+        start = time.time()
+        try:
+            if mode == 'upload':
+                self.upload(n, start)
+            elif mode == 'upload-async':
+                self.upload_async(n, start)
+            elif mode == 'ask':
+                self.ask(n, start)
+            else:
+                self.ask_stream(n, start)
+        except requests.RequestException as e:
+            self.record('exception', time.time() - start, error=str(e))
+
+    def _upload_files(self, n):
+        notice = build_notice(n, self.options.same_content)
+        return {'file': (f"notice-{n}.txt", notice.encode('utf-8'), 'text/plain')}
+
+    def upload(self, n, start):
+        response = self.session().post(f"{self.base_url}/", files=self._upload_files(n),
+                                       timeout=self.options.timeout)
+        ok = response.status_code == 200 and 'Error processing' not in response.text
+        self.record(response.status_code, time.time() - start,
+                    error=None if ok else f"upload {n}: HTTP {response.status_code}")
+
+    def upload_async(self, n, start):
+        session = self.session()
+        response = session.post(f"{self.base_url}/upload-async", files=self._upload_files(n),
+                                timeout=self.options.timeout)
+        if response.status_code != 202:
+            return self.record(response.status_code, time.time() - start,
+                               error=f"upload-async {n}: HTTP {response.status_code}")
+        job_id = response.json()['job_id']
+        while time.time() - start < self.options.timeout:
+            job = session.get(f"{self.base_url}/jobs/{job_id}", timeout=30).json()
+            state = job.get('job', job).get('status')
+            if state in ('completed', 'failed'):
+                return self.record(state, time.time() - start,
+                                   error=None if state == 'completed' else f"job {job_id} failed")
+            time.sleep(self.options.poll_interval)
+        self.record('timeout', time.time() - start, error=f"job {job_id} timed out")
+
+    def question(self, n):
+        question = QUESTIONS[n % len(QUESTIONS)]
+        return f"{question} (#{n})" if self.options.unique_questions else question
+
+    def ask(self, n, start):
+        response = self.session().post(f"{self.base_url}/ask-ai", timeout=self.options.timeout,
+                                       json={'question': self.question(n),
+                                             'context': build_context(n % self.options.contexts)})
+        self.record(response.status_code, time.time() - start,
+                    error=None if response.status_code == 200 else f"ask {n}: HTTP {response.status_code}")
+
+    def ask_stream(self, n, start):
+        response = self.session().post(f"{self.base_url}/ask-ai/stream", timeout=self.options.timeout,
+                                       stream=True,
+                                       json={'question': self.question(n),
+                                             'context': build_context(n % self.options.contexts)})
+        if response.status_code != 200:
+            return self.record(response.status_code, time.time() - start,
+                               error=f"ask-stream {n}: HTTP {response.status_code}")
+        first_chunk = None
+        failed = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event: chunk') and first_chunk is None:
+                first_chunk = time.time() - start
+            elif line.startswith('event: error'):
+                failed = f"ask-stream {n}: error event"
+        self.record(200, time.time() - start, first_chunk=first_chunk, error=failed)
+
+    def run(self):
+        self.login()
+        if self.options.mock_url:
+            requests.post(f"{self.options.mock_url.rstrip('/')}/__reset", timeout=10)
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.options.concurrency) as pool:
+            list(pool.map(self.run_one, range(self.options.requests)))
+        elapsed = time.time() - started
+        self.report(elapsed)
+
+    def report(self, elapsed):
+        latencies = sorted(self.latencies)
+        print(f"\nMode: {self.options.mode}  concurrency: {self.options.concurrency}  "
+              f"requests: {self.options.requests}  wall time: {elapsed:.1f}s")
+        print(f"Succeeded: {len(latencies)}  failed: {len(self.errors)}  "
+              f"throughput: {len(latencies) / elapsed if elapsed else 0:.2f} req/s")
+        print(f"Responses: {json.dumps(self.statuses, sort_keys=True, default=str)}")
+        if latencies:
+            print("Latency (s): " + '  '.join(
+                f"{label} {value:.3f}" for label, value in (
+                    ('p50', percentile(latencies, 50)), ('p95', percentile(latencies, 95)),
+                    ('p99', percentile(latencies, 99)), ('max', latencies[-1]))))
+        if self.first_chunk:
+            first_chunk = sorted(self.first_chunk)
+            print(f"First chunk (s): p50 {percentile(first_chunk, 50):.3f}  p95 {percentile(first_chunk, 95):.3f}")
+        for error in self.errors[:5]:
+            print(f"  error: {error}")
+
+        try:
+            status = self.session().get(f"{self.base_url}/ai-status", timeout=30).json()
+            print(f"App AI stats: {json.dumps(status.get('performance'))}")
+            print(f"App rate limiter: {json.dumps(status.get('rateLimiter'))}")
+            print(f"App answer cache: {json.dumps(status.get('answerCache'))}")
+        except (requests.RequestException, ValueError) as e:
+            print(f"Could not read /ai-status: {e}")
+        if self.options.mock_url:
+            try:
+                stats = requests.get(f"{self.options.mock_url.rstrip('/')}/__stats", timeout=10).json()
+                print(f"Mock Gemini: {json.dumps(stats, sort_keys=True)}")
+            except (requests.RequestException, ValueError) as e:
+                print(f"Could not read mock stats: {e}")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Load test the AI paths of the app')
+    arg_parser.add_argument('--base-url', default='http://localhost:5000')
+    arg_parser.add_argument('--username', default='admin')
+    arg_parser.add_argument('--password', default='adminpass')
+    arg_parser.add_argument('--mode', choices=('upload', 'upload-async', 'ask', 'ask-stream'), default='upload')
+    arg_parser.add_argument('--concurrency', type=int, default=4)
+    arg_parser.add_argument('--requests', type=int, default=50)
+    arg_parser.add_argument('--contexts', type=int, default=5, help='Distinct page contexts for ask modes')
+    arg_parser.add_argument('--same-content', action='store_true', help='Upload one notice repeatedly (cache path)')
+    arg_parser.add_argument('--unique-questions', action='store_true', help='Never repeat a question (bypasses the answer cache)')
+    arg_parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout in seconds')
+    arg_parser.add_argument('--poll-interval', type=float, default=0.5, help='Job polling interval (upload-async)')
+    arg_parser.add_argument('--mock-url', help='Mock Gemini URL; counters are reset before and printed after the run')
+    Benchmark(arg_parser.parse_args()).run()
+
+if __name__ == '__main__':
+    main()
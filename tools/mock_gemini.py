@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Local Gemini stand-in server
+Serves the subset of the Gemini REST API the app uses (model listing, generateContent
+and streamGenerateContent) with configurable latency, error rate and 429 injection,
+so the AI path can be load tested offline and reproducibly.
+
+Usage:
+    python tools/mock_gemini.py --port 8090 --latency-ms 800 --jitter-ms 300 \\
+        --error-rate 0.02 --rate-limit-rate 0.05 --rpm 120
+
+Point the app at it with GEMINI_BASE_URL=http://localhost:8090 (any GEMINI_API_KEY).
+GET /__stats returns request counters; POST /__reset clears them.
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODEL_PATH_RE = re.compile(r'^/v1beta/models/(?P<model>[^/:]+)(?::(?P<method>\w+))?$')
+SUBJECT_DATE_RE = re.compile(r'INPUT SUBJECT:.*?(\d{4}-\d{2}-\d{2})')
+CHAT_WORDS = ('The', 'change', 'window', 'covers', 'the', 'listed', 'services', 'and', 'should',
+              'complete', 'before', 'business', 'hours', 'on', 'Monday.')
+
+class MockState:
+    """Shared counters and the requests-per-minute window"""
+    def __init__(self, options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.random = random.Random(options.seed)
+        self.recent = deque()
+        self.stats = {}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def latency(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.options.jitter_ms, self.options.jitter_ms)
+        return max(0.0, (self.options.latency_ms + jitter) / 1000.0)
+
+    def over_quota(self):
+        """True if this request exceeds --rpm over the last 60 seconds"""
+        if not self.options.rpm:
+            return False
+        now = time.time()
+        with self.lock:
+            while self.recent and self.recent[0] < now - 60:
+                self.recent.popleft()
+            if len(self.recent) >= self.options.rpm:
+                return True
+            self.recent.append(now)
+            return False
+
+def build_parse_response(prompt):
+    """Deterministic change document derived from the prompt text"""
+    match = SUBJECT_DATE_RE.search(prompt)
+    date = match.group(1) if match else time.strftime('%Y-%m-%d')
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    services = []
+    for index in range(int(digest[0], 16) % 4 + 1):
+        hour = int(digest[index + 1], 16) % 20
+        services.append({
+            'name': f"Service {digest[index * 4:index * 4 + 4].upper()}",
+            'start_date': date,
+            'end_date': date,
+            'start_time': f"{hour:02d}:00",
+            'end_time': f"{hour + 2:02d}:00",
+            'comments': 'Mock maintenance window',
+            'priority': ('low', 'medium', 'high')[index % 3]
+        })
+    return json.dumps({'date': date, 'services': services})
+
+def build_chat_response(prompt):
+    """Fixed-length markdown-free chat answer (~45 words)"""
+    return ' '.join(CHAT_WORDS * 3)
+
+def candidate_payload(text, finish=True):
+    payload = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}]}
+    if finish:
+        payload['candidates'][0]['finishReason'] = 'STOP'
+        payload['usageMetadata'] = {'promptTokenCount': 0, 'candidatesTokenCount': len(text) // 4}
+    return payload
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        if not self.state.options.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, api_status, retry_after=None):
+        error = {'error': {'code': status, 'message': message, 'status': api_status}}
+        headers = {}
+        if retry_after is not None:
+            error['error']['details'] = [{
+                '@type': 'type.googleapis.com/google.rpc.RetryInfo',
+                'retryDelay': f"{retry_after}s"
+            }]
+            headers['Retry-After'] = str(retry_after)
+        self._send_json(status, error, headers)
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/__stats':
+            with self.state.lock:
+                return self._send_json(200, dict(self.state.stats))
+        if path == '/v1beta/models':
+            self.state.count('list_models')
+            return self._send_json(200, {'models': [{'name': f"models/{self.state.options.model}"}]})
+        match = MODEL_PATH_RE.match(path)
+        if match and not match.group('method'):
+            self.state.count('get_model')
+            return self._send_json(200, {'name': f"models/{match.group('model')}"})
+        self._send_error(404, 'Not found', 'NOT_FOUND')
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if path == '/__reset':
+            with self.state.lock:
+                self.state.stats.clear()
+                self.state.recent.clear()
+            return self._send_json(200, {'status': 'ok'})
+
+        match = MODEL_PATH_RE.match(path)
+        method = match.group('method') if match else None
+        if method not in ('generateContent', 'streamGenerateContent'):
+            return self._send_error(404, 'Not found', 'NOT_FOUND')
+
+        self.state.count(method)
+        options = self.state.options
+        if self.state.over_quota() or self.state.roll() < options.rate_limit_rate:
+            self.state.count('rate_limited')
+            return self._send_error(429, 'Resource has been exhausted (e.g. check quota).',
+                                    'RESOURCE_EXHAUSTED', retry_after=options.retry_after)
+        if self.state.roll() < options.error_rate:
+            self.state.count('errors')
+            time.sleep(self.state.latency() / 2)
+            return self._send_error(500, 'Internal error encountered.', 'INTERNAL')
+
+        try:
+            request = json.loads(body or b'{}')
+            prompt = ' '.join(part.get('text', '') for content in request.get('contents', [])
+                              for part in content.get('parts', []))
+        except (ValueError, AttributeError):
+            return self._send_error(400, 'Invalid JSON payload', 'INVALID_ARGUMENT')
+
+        text = build_parse_response(prompt) if 'OUTPUT JSON' in prompt else build_chat_response(prompt)
+        latency = self.state.latency()
+
+        if method == 'generateContent':
+            time.sleep(latency)
+            self.state.count('ok')
+            return self._send_json(200, candidate_payload(text))
+
+        # Streamed answer: first chunk after ~a third of the latency, the rest spread out
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        chunks = [text[i:i + options.chunk_chars] for i in range(0, len(text), options.chunk_chars)]
+        time.sleep(latency / 3)
+        try:
+            for index, chunk in enumerate(chunks):
+                payload = candidate_payload(chunk, finish=index == len(chunks) - 1)
+                self.wfile.write(f"data: {json.dumps(payload)}\r\n\r\n".encode('utf-8'))
+                self.wfile.flush()
+                if index < len(chunks) - 1:
+                    time.sleep(latency * 2 / 3 / max(1, len(chunks) - 1))
+        except (BrokenPipeError, ConnectionResetError):
+            self.state.count('client_disconnects')
+            return
+        self.state.count('ok')
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Local Gemini stand-in for load tests')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8090)
+    arg_parser.add_argument('--model', default='gemini-2.0-flash', help='Model name reported by /models')
+    arg_parser.add_argument('--latency-ms', type=float, default=800, help='Mean response latency')
+    arg_parser.add_argument('--jitter-ms', type=float, default=200, help='Uniform +/- latency jitter')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 500')
+    arg_parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    arg_parser.add_argument('--rpm', type=int, default=0, help='Answer 429 above this many requests per minute (0 = off)')
+    arg_parser.add_argument('--retry-after', type=int, default=2, help='Retry delay (seconds) sent with 429s')
+    arg_parser.add_argument('--chunk-chars', type=int, default=40, help='Characters per streamed chunk')
+    arg_parser.add_argument('--seed', type=int, default=1, help='Random seed for reproducible runs')
+    arg_parser.add_argument('--quiet', action='store_true', help='Do not log each request')
+    options = arg_parser.parse_args()
+
+    MockGeminiHandler.state = MockState(options)
+    server = ThreadingHTTPServer((options.host, options.port), MockGeminiHandler)
+    server.daemon_threads = True
+    print(f"Mock Gemini listening on http://{options.host}:{options.port} "
+          f"(latency {options.latency_ms}±{options.jitter_ms}ms, errors {options.error_rate:.0%}, "
+          f"429s {options.rate_limit_rate:.0%}, rpm {options.rpm or 'unlimited'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()